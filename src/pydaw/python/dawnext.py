@@ -28,8 +28,12 @@ from libpydaw import *
 from mkplugins import *
 
 from libpydaw import scales
+from libpydaw import pydaw_curves
+from libpydaw import pydaw_ui_messages
+from libpydaw.pydaw_codec import pydaw_round
 
 import math
+import numpy
 
 from libpydaw.pydaw_util import *
 from libpydaw.pydaw_widgets import *
@@ -1404,7 +1408,8 @@ class SequencerItem(pydaw_widgets.QGraphicsRectItemNDL):
                 if f_item.time_stretch_mode >= 3 and \
                 f_audio_item.orig_string != str(f_item):
                     f_was_stretching = True
-                    f_ts_result = libmk.PROJECT.timestretch_audio_item(f_item)
+                    f_ts_result = libmk.PROJECT.timestretch_audio_item(
+                        f_item, mk_project.TIMESTRETCH_PRIORITY_VISIBLE)
                     if f_ts_result is not None:
                         f_stretched_items.append(f_ts_result)
                 f_audio_item.setRect(0.0, 0.0, f_x, REGION_EDITOR_TRACK_HEIGHT)
@@ -1590,6 +1595,9 @@ class ItemSequencer(QGraphicsView):
         self.lfo_atm_action = self.atm_menu.addAction(_("LFO Tool..."))
         self.lfo_atm_action.triggered.connect(self.lfo_atm)
 
+        self.simplify_atm_action = self.atm_menu.addAction(_("Simplify..."))
+        self.simplify_atm_action.triggered.connect(self.simplify_atm)
+
         self.atm_menu.addSeparator()
 
         self.break_atm_action = self.atm_menu.addAction(
@@ -2768,9 +2776,10 @@ class ItemSequencer(QGraphicsView):
 
     def transform_atm_callback(self, a_add, a_mul):
         self.setUpdatesEnabled(False)
-        for f_point, f_val in zip(self.atm_selected, self.atm_selected_vals):
-            f_val = (f_val * a_mul) + a_add
-            f_val = pydaw_util.pydaw_clip_value(f_val, 0.0, 127.0, True)
+        f_vals = pydaw_round(
+            pydaw_curves.pydaw_curve_add_mul(
+                self.atm_selected_vals, a_add, a_mul, 0.0, 127.0), 6)
+        for f_point, f_val in zip(self.atm_selected, f_vals):
             f_point.item.cc_val = f_val
             f_point.setPos(self.get_pos_from_point(f_point.item))
         self.setUpdatesEnabled(True)
@@ -2803,45 +2812,31 @@ class ItemSequencer(QGraphicsView):
 
     def lfo_atm_callback(
             self, a_phase, a_start_freq, a_start_amp, a_start_center,
-            a_start_fade, a_end_fade, a_end_freq, a_end_amp, a_end_center):
+            a_start_fade, a_end_fade, a_end_freq, a_end_amp, a_end_center,
+            a_shape="sine"):
         a_phase, a_start_freq, a_start_fade, a_end_freq, a_end_fade = (
             x * 0.01 for x in
             (a_phase, a_start_freq, a_start_fade, a_end_freq, a_end_fade))
         a_phase *= math.pi
         f_start_beat, f_end_beat = self.get_loop_pos()
 
-        f_length_beats = f_end_beat - f_start_beat
         two_pi = 2.0 * math.pi
         f_start_radians_p64, f_end_radians_p64 = (
             (x * two_pi) / 8.0 for x in (a_start_freq, a_end_freq))
-        f_length_beats_recip = 1.0 / f_length_beats
+
+        f_vals = pydaw_curves.pydaw_curve_lfo(
+            [x.item.beat for x in self.atm_selected], f_start_beat,
+            f_end_beat, a_phase, f_start_radians_p64, a_start_amp,
+            a_start_center, a_start_fade, a_end_fade, f_end_radians_p64,
+            a_end_amp, a_end_center, a_shape)
+        f_vals = pydaw_round(numpy.clip(f_vals, 0.0, 127.0), 6)
 
         self.setUpdatesEnabled(False)
 
-        for f_point in self.atm_selected:
-            f_pos_beats = f_point.item.beat - f_start_beat
-            f_pos = f_pos_beats * f_length_beats_recip
-            f_center = pydaw_util.linear_interpolate(
-                a_start_center, a_end_center, f_pos)
-            f_amp = pydaw_util.linear_interpolate(
-                a_start_amp, a_end_amp, f_pos)
-
-            if f_pos < a_start_fade:
-                f_amp *= f_pos / a_start_fade
-            elif f_pos > a_end_fade:
-                f_amp *= 1.0 - (
-                    (f_pos - a_end_fade) / (1.0 - a_end_fade))
-
-            f_val = (math.sin(a_phase) * f_amp) + f_center
-            f_val = pydaw_util.pydaw_clip_value(f_val, 0.0, 127.0, True)
+        for f_point, f_val in zip(self.atm_selected, f_vals):
             f_point.item.cc_val = f_val
             f_point.setPos(self.get_pos_from_point(f_point.item))
 
-            a_phase += pydaw_util.linear_interpolate(
-                f_start_radians_p64, f_end_radians_p64, f_pos)
-            if a_phase >= two_pi:
-                a_phase -= two_pi
-
         self.setUpdatesEnabled(True)
         self.update()
 
@@ -2873,21 +2868,25 @@ class ItemSequencer(QGraphicsView):
             f_index, f_port, f_start_beat, f_end_beat)
         if f_old:
             self.automation_save_callback()
-        f_pos = f_start_beat
         self.scene.clearSelection()
-        self.atm_selected = []
 
-        for f_i in range(int((f_end_beat - f_start_beat) / f_step)):
-            f_point = project.pydaw_atm_point(
-                f_pos, f_port, 64.0, f_index, f_plugin)
-            ATM_REGION.add_point(f_point)
-            f_item = self.draw_point(f_point)
-            self.atm_selected.append(f_item)
-            f_pos += f_step
+        f_arr = numpy.zeros(
+            int((f_end_beat - f_start_beat) / f_step),
+            dtype=project.ATM_POINT_DTYPE)
+        f_arr["beat"] = pydaw_curves.pydaw_curve_grid(
+            f_start_beat, f_step, len(f_arr))
+        f_arr["port_num"] = f_port
+        f_arr["cc_val"] = 64.0
+        f_arr["index"] = f_index
+        f_arr["plugin_index"] = f_plugin
+        f_points = project.pydaw_atm_points_from_array(f_arr)
+        ATM_REGION.add_points(f_points)
+        self.atm_selected = [self.draw_point(x) for x in f_points]
 
         f_result = pydaw_widgets.lfo_dialog(
             self.lfo_atm_callback,
-            lambda : self.automation_save_callback(a_open=False))
+            lambda : self.automation_save_callback(a_open=False),
+            list(pydaw_curves.LFO_SHAPES))
 
         if not f_result:
             for f_point in self.atm_selected:
@@ -2899,6 +2898,68 @@ class ItemSequencer(QGraphicsView):
         else:
             self.open_region()
 
+    def simplify_atm(self):
+        """ Remove the automation points of the selection, or of the
+            current track's automation if nothing is selected, that don't
+            change the curve by more than the tolerance
+        """
+        if REGION_EDITOR_MODE != 1 or not self.current_coord:
+            return
+        f_ranges = {}
+        for f_point in self.get_selected_points():
+            f_point = f_point.item
+            f_key = (f_point.index, f_point.port_num)
+            if f_key in f_ranges:
+                f_start, f_end = f_ranges[f_key]
+                f_ranges[f_key] = (
+                    min(f_start, f_point.beat), max(f_end, f_point.beat))
+            else:
+                f_ranges[f_key] = (f_point.beat, f_point.beat)
+        if not f_ranges:
+            f_track = self.current_coord[0]
+            f_port, f_atm_uid = TRACK_PANEL.has_automation(f_track)
+            f_index, f_plugin = TRACK_PANEL.get_atm_params(f_track)
+            if f_index is None or f_port is None:
+                QMessageBox.warning(
+                    self, _("Error"), _("Track has no automation selected"))
+                return
+            f_ranges[(f_index, f_port)] = (None, None)
+
+        def ok_handler():
+            f_count = 0
+            for (f_index, f_port), (f_start, f_end) in f_ranges.items():
+                f_count += ATM_REGION.simplify(
+                    f_index, f_port, f_tolerance.value(), f_start, f_end)
+            f_window.close()
+            if f_count:
+                self.automation_save_callback()
+
+        def cancel_handler():
+            f_window.close()
+
+        f_window = QDialog(MAIN_WINDOW)
+        f_window.setWindowTitle(_("Simplify"))
+        f_layout = QGridLayout()
+        f_window.setLayout(f_layout)
+        f_tolerance = QDoubleSpinBox()
+        f_tolerance.setRange(0.01, 64.0)
+        f_tolerance.setSingleStep(0.1)
+        f_tolerance.setValue(
+            project.AUTOMATION_SIMPLIFY_TOLERANCE
+            if project.AUTOMATION_SIMPLIFY_TOLERANCE > 0.0 else 0.5)
+        f_tolerance.setToolTip(
+            _("The maximum change to the automation curve when removing "
+            "points, 0 to 127"))
+        f_layout.addWidget(QLabel(_("Tolerance")), 0, 0)
+        f_layout.addWidget(f_tolerance, 0, 1)
+        f_ok = QPushButton(_("OK"))
+        f_ok.pressed.connect(ok_handler)
+        f_layout.addWidget(f_ok, 1, 0)
+        f_cancel = QPushButton(_("Cancel"))
+        f_cancel.pressed.connect(cancel_handler)
+        f_layout.addWidget(f_cancel, 1, 1)
+        f_window.exec_()
+
     def transpose_dialog(self):
         if REGION_EDITOR_MODE != 0:
             return
@@ -3912,6 +3973,12 @@ class AudioSeqItem(pydaw_widgets.QGraphicsRectItemNDL):
         f_reverse_action.triggered.connect(self.reverse)
         f_time_pitch_action = f_properties_menu.addAction(_("Time/Pitch..."))
         f_time_pitch_action.triggered.connect(self.time_pitch_dialog)
+        f_ts_status = libmk.PROJECT.timestretch_scheduler.get_status(
+            libmk.PROJECT.timestretch_key(self.audio_item))
+        if f_ts_status is not None:
+            f_cancel_ts_action = f_properties_menu.addAction(
+                _("Cancel Time-Stretch ({}, {}s)").format(*f_ts_status))
+            f_cancel_ts_action.triggered.connect(self.cancel_timestretch)
         f_fade_vol_action = f_properties_menu.addAction(_("Fade Volume..."))
         f_fade_vol_action.triggered.connect(self.fade_vol_dialog)
 
@@ -3984,33 +4051,35 @@ class AudioSeqItem(pydaw_widgets.QGraphicsRectItemNDL):
 
     def crisp_menu_triggered(self, a_action):
         f_index = CRISPNESS_SETTINGS.index(a_action.crisp_mode)
-        f_list = [x.audio_item for x in AUDIO_SEQ.get_selected() if
+        f_list = [x for x in AUDIO_SEQ.get_selected() if
             x.audio_item.time_stretch_mode in (3, 4)]
         for f_item in f_list:
-            f_item.crispness = f_index
+            f_item.audio_item.crispness = f_index
         self.timestretch_items(f_list)
 
     def ts_mode_menu_triggered(self, a_action):
         f_index = TIMESTRETCH_INDEXES[a_action.algo_name]
-        f_list = [x.audio_item for x in AUDIO_SEQ.get_selected()]
+        f_list = AUDIO_SEQ.get_selected()
         for f_item in f_list:
-            f_item.time_stretch_mode = f_index
+            f_item.audio_item.time_stretch_mode = f_index
         self.timestretch_items(f_list)
 
+    def cancel_timestretch(self):
+        f_key = libmk.PROJECT.timestretch_key(self.audio_item)
+        libmk.PROJECT.timestretch_scheduler.cancel(f_key)
+
     def timestretch_items(self, a_list):
-        f_stretched_items = []
+        """ @a_list:  A list of AudioSeqItem """
         for f_item in a_list:
-            if f_item.time_stretch_mode >= 3:
-                f_ts_result = libmk.PROJECT.timestretch_audio_item(f_item)
+            if f_item.audio_item.time_stretch_mode >= 3:
+                f_ts_result = libmk.PROJECT.timestretch_audio_item(
+                    f_item.audio_item,
+                    AUDIO_SEQ.get_timestretch_priority(f_item))
                 if f_ts_result is not None:
-                    f_stretched_items.append(f_ts_result)
+                    global_timestretch_submitted(f_ts_result, CURRENT_ITEM.uid)
 
         libmk.PROJECT.save_stretch_dicts()
 
-        for f_stretch_item in f_stretched_items:
-            f_stretch_item[2].wait()
-            libmk.PROJECT.get_wav_uid_by_name(
-                f_stretch_item[0], a_uid=f_stretch_item[1])
         for f_audio_item in AUDIO_SEQ.get_selected():
             f_new_graph = libmk.PROJECT.get_sample_graph_by_uid(
                 f_audio_item.audio_item.uid)
@@ -4644,7 +4713,9 @@ class AudioSeqItem(pydaw_widgets.QGraphicsRectItemNDL):
                 if f_item.time_stretch_mode >= 3 and \
                 f_audio_item.orig_string != str(f_item):
                     f_was_stretching = True
-                    f_ts_result = libmk.PROJECT.timestretch_audio_item(f_item)
+                    f_ts_result = libmk.PROJECT.timestretch_audio_item(
+                        f_item, AUDIO_SEQ.get_timestretch_priority(
+                            f_audio_item))
                     if f_ts_result is not None:
                         f_stretched_items.append(f_ts_result)
                 f_audio_item.setRect(0.0, 0.0, f_x, AUDIO_ITEM_HEIGHT)
@@ -4694,9 +4765,8 @@ class AudioSeqItem(pydaw_widgets.QGraphicsRectItemNDL):
             if f_was_stretching:
                 libmk.PROJECT.save_stretch_dicts()
                 for f_stretch_item in f_stretched_items:
-                    f_stretch_item[2].wait()
-                    libmk.PROJECT.get_wav_uid_by_name(
-                        f_stretch_item[0], a_uid=f_stretch_item[1])
+                    global_timestretch_submitted(
+                        f_stretch_item, CURRENT_ITEM.uid)
 #                for f_audio_item in AUDIO_SEQ.get_selected():
 #                    f_new_graph = libmk.PROJECT.get_sample_graph_by_uid(
 #                        f_audio_item.audio_item.uid)
@@ -4759,6 +4829,32 @@ class AudioItemSeq(AbstractItemEditor):
     def scrollContentsBy(self, x, y):
         QGraphicsView.scrollContentsBy(self, x, y)
         self.set_header_y_pos()
+        self.raise_visible_timestretch_priority()
+
+    def is_item_visible(self, a_item):
+        f_rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        return f_rect.intersects(a_item.sceneBoundingRect())
+
+    def get_timestretch_priority(self, a_item):
+        """ The priority to time-stretch AudioSeqItem a_item at, items
+            that are scrolled out of view are stretched after the rest
+        """
+        if self.is_item_visible(a_item):
+            return mk_project.TIMESTRETCH_PRIORITY_VISIBLE
+        return mk_project.TIMESTRETCH_PRIORITY_BACKGROUND
+
+    def raise_visible_timestretch_priority(self):
+        """ Move the time-stretch jobs of items that were scrolled into
+            view ahead of the rest
+        """
+        if not TIMESTRETCH_PENDING:
+            return
+        for f_item in self.audio_items:
+            if self.is_item_visible(f_item):
+                f_key = libmk.PROJECT.timestretch_key(f_item.audio_item)
+                if f_key in TIMESTRETCH_PENDING:
+                    libmk.PROJECT.timestretch_scheduler.set_priority(
+                        f_key, mk_project.TIMESTRETCH_PRIORITY_VISIBLE)
 
     def set_header_y_pos(self):
         f_point = self.get_scene_pos()
@@ -5324,7 +5420,8 @@ class time_pitch_dialog_widget:
                 (f_item.orig_string != str(f_item.audio_item)):
                     f_was_stretching = True
                     f_ts_result = libmk.PROJECT.timestretch_audio_item(
-                        f_item.audio_item)
+                        f_item.audio_item,
+                        AUDIO_SEQ.get_timestretch_priority(f_item))
                     if f_ts_result is not None:
                         f_stretched_items.append(
                             (f_ts_result, f_item.audio_item))
@@ -5339,9 +5436,8 @@ class time_pitch_dialog_widget:
 #                f_global_tempo = float(TRANSPORT.tempo_spinbox.value())
                 libmk.PROJECT.save_stretch_dicts()
                 for f_stretch_item, f_audio_item in f_stretched_items:
-                    f_stretch_item[2].wait()
-                    libmk.PROJECT.get_wav_uid_by_name(
-                        f_stretch_item[0], a_uid=f_stretch_item[1])
+                    global_timestretch_submitted(
+                        f_stretch_item, CURRENT_ITEM.uid)
 #                    f_new_uid = libmk.PROJECT.get_wav_uid_by_name(
 #                        f_stretch_item[0], a_uid=f_stretch_item[1])
 #                    f_graph = libmk.PROJECT.get_sample_graph_by_uid(f_new_uid)
@@ -5680,6 +5776,50 @@ class AudioItemSeqWidget(FileDragDropper):
         global_open_audio_items(a_reload=False)
 
 
+# {timestretch_cache key: set of item uids}, the items with audio items
+# that are waiting for a time-stretch job
+TIMESTRETCH_PENDING = {}
+
+def global_timestretch_submitted(a_ts_result, a_item_uid):
+    """ Use the time-stretched file in item a_item_uid when the job in
+        a_ts_result, returned by timestretch_audio_item(), is finished
+    """
+    f_job = a_ts_result[2]
+    if not f_job.is_done():
+        TIMESTRETCH_PENDING.setdefault(f_job.key, set()).add(a_item_uid)
+
+def global_timestretch_job_finished(a_job):
+    """ Connected to the TimestretchScheduler's job_finished, replace the
+        audio items that were waiting for a_job with the stretched file
+        and redraw them
+    """
+    f_item_uids = TIMESTRETCH_PENDING.pop(a_job.key, None)
+    if not f_item_uids or \
+    libmk.PROJECT.timestretch_cache.get(a_job.key) != a_job.uid or \
+    not libmk.PROJECT.get_wavs_dict().uid_exists(a_job.uid):
+        return
+    f_saved = False
+    f_current = False
+    for f_item_uid in f_item_uids:
+        if CURRENT_ITEM and CURRENT_ITEM.uid == f_item_uid:
+            f_item = CURRENT_ITEM
+        else:
+            f_item = PROJECT.get_item_by_uid(f_item_uid)
+        f_changed = False
+        for f_audio_item in f_item.items.values():
+            if f_audio_item.uid != a_job.uid and \
+            libmk.PROJECT.timestretch_key(f_audio_item) == a_job.key:
+                f_audio_item.uid = a_job.uid
+                f_changed = True
+        if f_changed:
+            PROJECT.save_item_by_uid(f_item_uid, f_item)
+            f_saved = True
+            f_current = f_current or f_item is CURRENT_ITEM
+    if f_saved:
+        PROJECT.commit(_("Time-stretch audio items"))
+    if f_current:
+        global_open_audio_items(True)
+
 def global_open_audio_items(a_update_viewer=True, a_reload=True):
     if a_update_viewer:
         f_selected_list = []
@@ -8973,6 +9113,28 @@ class MainWindow(QScrollArea):
         self.first_offline_render = True
         self.last_offline_dir = global_home
         self.copy_to_clipboard_checked = True
+        self.ui_messages = pydaw_ui_messages.pydaw_ui_message_dispatcher(
+            {
+                "cur": lambda x: self.on_engine_cursor(float(x)),
+                "peak": lambda x: global_update_peak_meters(
+                    pydaw_ui_messages.pydaw_decode_peaks(x)),
+                "mrec": lambda x: MREC_EVENTS.append(x),
+                "ne": self.on_engine_note,
+                "ml": self.on_engine_midi_learn,
+                "ready": lambda x: libmk.on_ready(),
+            },
+            #This prevents multiple events from moving the same control,
+            #only the last goes through
+            {
+                "ui": self.on_engine_ui_messages,
+                "pc": self.on_engine_controls,
+                "cc": self.on_engine_ccs,
+            },
+            {
+                pydaw_ui_messages.UI_MSG_PEAK: global_update_peak_meters,
+                pydaw_ui_messages.UI_MSG_CURSOR:
+                    lambda x: self.on_engine_cursor(float(x[-1])),
+            })
         self.last_midi_dir = None
 
         self.setObjectName("plugin_ui")
@@ -9338,51 +9500,35 @@ class MainWindow(QScrollArea):
         SEQUENCER.set_header_y_pos(f_y)
 
     def configure_callback(self, path, arr):
-        f_pc_dict = {}
-        f_ui_dict = {}
-        f_cc_dict = {}
-        for f_line in arr[0].split("\n"):
-            if f_line == "":
-                break
-            a_key, a_val = f_line.split("|", 1)
-            if a_key == "pc":
-                f_plugin_uid, f_port, f_val = a_val.split("|")
-                f_pc_dict[(f_plugin_uid, f_port)] = f_val
-            elif a_key == "cur":
-                if libmk.IS_PLAYING:
-                    f_beat = float(a_val)
-                    global_set_playback_pos(f_beat)
-            elif a_key == "peak":
-                global_update_peak_meters(a_val)
-            elif a_key == "cc":
-                f_track_num, f_cc, f_val = a_val.split("|")
-                f_cc_dict[(f_track_num, f_cc)] = f_val
-            elif a_key == "ui":
-                f_plugin_uid, f_name, f_val = a_val.split("|", 2)
-                f_ui_dict[(f_plugin_uid, f_name)] = f_val
-            elif a_key == "mrec":
-                MREC_EVENTS.append(a_val)
-            elif a_key == "ne":
-                f_state, f_note = a_val.split("|")
-                PIANO_ROLL_EDITOR.highlight_keys(f_state, f_note)
-            elif a_key == "ml":
-                libmk.PLUGIN_UI_DICT.midi_learn_control[0].update_cc_map(
-                    a_val, libmk.PLUGIN_UI_DICT.midi_learn_control[1])
-            elif a_key == "ready":
-                libmk.on_ready()
-        #This prevents multiple events from moving the same control,
-        #only the last goes through
-        for k, f_val in f_ui_dict.items():
-            f_plugin_uid, f_name = k
-            if int(f_plugin_uid) in libmk.PLUGIN_UI_DICT:
-                libmk.PLUGIN_UI_DICT[int(f_plugin_uid)].ui_message(
-                    f_name, f_val)
-        for k, f_val in f_pc_dict.items():
+        self.ui_messages.dispatch(arr[0])
+
+    def on_engine_cursor(self, a_beat):
+        if libmk.IS_PLAYING:
+            global_set_playback_pos(a_beat)
+
+    def on_engine_note(self, a_val):
+        f_state, f_note = a_val.split("|")
+        PIANO_ROLL_EDITOR.highlight_keys(f_state, f_note)
+
+    def on_engine_midi_learn(self, a_val):
+        libmk.PLUGIN_UI_DICT.midi_learn_control[0].update_cc_map(
+            a_val, libmk.PLUGIN_UI_DICT.midi_learn_control[1])
+
+    def on_engine_ui_messages(self, a_vals):
+        for (f_plugin_uid, f_name), f_val in a_vals.items():
+            f_plugin_uid = int(f_plugin_uid)
+            if f_plugin_uid in libmk.PLUGIN_UI_DICT:
+                libmk.PLUGIN_UI_DICT[f_plugin_uid].ui_message(f_name, f_val)
+
+    def on_engine_controls(self, a_vals):
+        for k, f_val in a_vals.items():
             f_plugin_uid, f_port = (int(x) for x in k)
             if f_plugin_uid in libmk.PLUGIN_UI_DICT:
                 libmk.PLUGIN_UI_DICT[f_plugin_uid].set_control_val(
                     f_port, float(f_val))
-        for k, f_val in f_cc_dict.items():
+
+    def on_engine_ccs(self, a_vals):
+        for k, f_val in a_vals.items():
             f_track_num, f_cc = (int(x) for x in k)
             uids = []
             if f_track_num in PLUGIN_RACK.plugin_racks:
@@ -9416,13 +9562,12 @@ def global_set_playback_pos(a_beat):
         f_editor.set_playback_pos(PLAYBACK_POS)
     TRANSPORT.set_time(PLAYBACK_POS)
 
-def global_update_peak_meters(a_val):
-    for f_val in a_val.split("|"):
-        f_list = f_val.split(":")
-        f_index = int(f_list[0])
+def global_update_peak_meters(a_peaks):
+    """ a_peaks:  A pydaw_ui_messages.UI_PEAK_DTYPE array """
+    for f_index, f_left, f_right in a_peaks.tolist():
         if f_index in ALL_PEAK_METERS:
             for f_pkm in ALL_PEAK_METERS[f_index]:
-                f_pkm.set_value(f_list[1:])
+                f_pkm.set_value((f_left, f_right))
         else:
             print("{} not in ALL_PEAK_METERS".format(f_index))
 
@@ -9450,10 +9595,16 @@ def global_ui_refresh_callback(a_restore_all=False):
     MAIN_WINDOW.tab_changed()
     PROJECT.IPC.pydaw_open_song(PROJECT.project_folder, a_restore_all)
 
+def global_connect_timestretch_scheduler():
+    TIMESTRETCH_PENDING.clear()
+    libmk.PROJECT.timestretch_scheduler.job_finished.connect(
+        global_timestretch_job_finished)
+
 #Opens or creates a new project
 def global_open_project(a_project_file):
     global PROJECT, TRACK_NAMES, TRACK_COLORS
     PROJECT = DawNextProject(global_pydaw_with_audio)
+    global_connect_timestretch_scheduler()
     PROJECT.suppress_updates = True
     PROJECT.open_project(a_project_file, False)
     TRACK_COLORS = PROJECT.get_track_colors()
@@ -9479,6 +9630,7 @@ def global_open_project(a_project_file):
 def global_new_project(a_project_file):
     global PROJECT, TRACK_COLORS
     PROJECT = DawNextProject(global_pydaw_with_audio)
+    global_connect_timestretch_scheduler()
     PROJECT.new_project(a_project_file)
     TRACK_COLORS = PROJECT.get_track_colors()
     global_update_track_comboboxes()
@@ -30,11 +30,14 @@ class DawNextOsc(libmk.AbstractIPC):
             "os",  "|".join(str(x) for x in
             (bool_to_int(a_first_open), a_project_folder)))
 
-    def pydaw_save_item(self, a_uid):
-        self.send_configure("si", str(a_uid))
+    def pydaw_save_item(self, a_uid, a_data=None):
+        """ a_data:  The text of the item file, so that the engine
+                     doesn't need to read it back from disk
+        """
+        self.send_configure_many([("si", str(a_uid), a_data)])
 
-    def pydaw_save_region(self):
-        self.send_configure("sr", "")
+    def pydaw_save_region(self, a_data=None):
+        self.send_configure_many([("sr", "", a_data)])
 
     def pydaw_en_playback(self, a_mode, a_beat="0"):
         self.send_configure(
@@ -66,8 +69,8 @@ class DawNextOsc(libmk.AbstractIPC):
     def pydaw_save_tracks(self):
         self.send_configure("st", "")
 
-    def pydaw_save_atm_region(self):
-        self.send_configure("sa", "")
+    def pydaw_save_atm_region(self, a_data=None):
+        self.send_configure_many([("sa", "", a_data)])
 
     def pydaw_offline_render(self, a_start_beat, a_end_beat, a_file_name):
         self.send_configure(
@@ -86,8 +89,9 @@ class DawNextOsc(libmk.AbstractIPC):
 
     def pydaw_audio_per_item_fx(
             self, a_item_uid, a_audio_item_index, a_port_num, a_val):
-        self.send_configure(
-            "paif", "|".join(str(x) for x in
+        self.send_configure_coalesced(
+            "paif", (a_item_uid, a_audio_item_index, a_port_num),
+            "|".join(str(x) for x in
              (a_item_uid, a_audio_item_index, a_port_num, a_val)))
 
     def pydaw_glue_audio(
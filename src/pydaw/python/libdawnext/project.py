@@ -12,6 +12,10 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
 
+import bisect
+import collections
+import copy
+import operator
 import os
 import re
 import traceback
@@ -33,6 +37,14 @@ from PyQt5.QtWidgets import *
 from PyQt5 import QtCore
 
 from libpydaw import pydaw_history
+from libpydaw.pydaw_codec import (
+    ATM_POINT_DTYPE, ATM_POINT_ROUND, CC_ROUND, PB_ROUND, SEQ_ITEM_DTYPE,
+    pydaw_format_atm, pydaw_format_item_events, pydaw_format_sequencer_items,
+    pydaw_parse_atm, pydaw_parse_item, pydaw_parse_sequencer,
+    pydaw_round_fields)
+from libpydaw.pydaw_curves import (
+    pydaw_curve_fill, pydaw_curve_grid, pydaw_curve_one_pole,
+    pydaw_curve_segments, pydaw_curve_simplify, pydaw_curve_simplify_steps)
 
 import mkplugins
 
@@ -62,6 +74,72 @@ pydaw_file_notes = os.path.join(pydaw_folder_dawnext, "notes.txt")
 #Anything smaller gets deleted when doing a transform
 pydaw_min_note_length = 4.0 / 129.0
 
+ITEM_CACHE_SIZE = get_file_setting("item_cache_size", int, 2000)
+# Undo commits held in memory per undo context before spilling to disk
+UNDO_HISTORY_MB = get_file_setting("undo_history_mb", int, 16)
+UNDO_HISTORY_COUNT = get_file_setting("undo_history_count", int, 200)
+# Changes to project files are logged on commit when stdout isn't a TTY,
+# 0: off, 1: a summary per file, 2: diffs up to HISTORY_LOG_MAX_LINES
+HISTORY_LOG_LEVEL = get_file_setting(
+    "history_log_level", int,
+    pydaw_history.HISTORY_LOG_NONE if IS_A_TTY else
+    pydaw_history.HISTORY_LOG_DIFF)
+HISTORY_LOG_MAX_LINES = get_file_setting("history_log_max_lines", int, 200)
+HISTORY_LOG_MAX_EVENTS = get_file_setting(
+    "history_log_max_events", int, 100)
+# The maximum error in CC units (0-127) when removing redundant automation,
+# CC and pitchbend points after smoothing or drawing lines, 0 to disable
+AUTOMATION_SIMPLIFY_TOLERANCE = get_file_setting(
+    "automation_simplify_tolerance", float, 0.0)
+
+
+class ItemCache:
+    """ LRU cache of parsed pydaw_item objects keyed by uid.  The cached
+        objects are never handed to callers that might modify them,
+        DawNextProject.get_item_by_uid() returns a clone
+    """
+    def __init__(self, a_max_count=ITEM_CACHE_SIZE):
+        self.max_count = int(a_max_count)
+        self.items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, a_uid):
+        if a_uid in self.items:
+            self.hits += 1
+            self.items.move_to_end(a_uid)
+            return self.items[a_uid]
+        self.misses += 1
+        return None
+
+    def add(self, a_uid, a_item):
+        self.items[a_uid] = a_item
+        self.items.move_to_end(a_uid)
+        while len(self.items) > self.max_count:
+            self.items.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, a_uid):
+        if a_uid in self.items:
+            self.items.pop(a_uid)
+
+    def clear(self):
+        self.items.clear()
+
+    def get_stats(self):
+        return {
+            "count": len(self.items),
+            "max_count": self.max_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __str__(self):
+        return ", ".join("{}: {}".format(k, v)
+            for k, v in sorted(self.get_stats().items()))
+
 
 class DawNextProject(libmk.AbstractProject):
     def __init__(self, a_with_audio):
@@ -70,8 +148,11 @@ class DawNextProject(libmk.AbstractProject):
         self.last_item_number = 1
         self.last_region_number = 1
         self.clear_history()
+        self.history_log = pydaw_history.pydaw_history_log(
+            HISTORY_LOG_LEVEL, HISTORY_LOG_MAX_LINES, HISTORY_LOG_MAX_EVENTS)
         self.painter_path_cache = {}
         self.pixmap_cache_unscaled = {}
+        self.item_cache = ItemCache()
         self.IPC = DawNextOsc(a_with_audio)
         self.suppress_updates = False
 
@@ -83,52 +164,46 @@ class DawNextProject(libmk.AbstractProject):
             f_history_file = pydaw_history.pydaw_history_file(
                 a_folder, a_file, a_text, f_old, f_existed)
             self.history_files.append(f_history_file)
-            if not pydaw_util.IS_A_TTY:
-                print(str(f_history_file))
+            self.history_log.log(f_history_file)
 
     def set_undo_context(self, a_context):
         self.undo_context = a_context
 
     def clear_undo_context(self, a_context):
-        self.history_commits[a_context] = []
+        self.history_commits[a_context] = self.new_history_stack()
+
+    def new_history_stack(self):
+        return pydaw_history.pydaw_history_stack(
+            UNDO_HISTORY_MB * 1024 * 1024, UNDO_HISTORY_COUNT)
 
     def commit(self, a_message, a_discard=False):
         """ Commit the project history """
         if self.undo_context not in self.history_commits:
-            self.history_commits[self.undo_context] = []
-        if self.history_undo_cursor > 0:
-            self.history_commits[self.undo_context] = self.history_commits[
-                self.undo_context][:self.history_undo_cursor]
-            self.history_undo_cursor = 0
+            self.clear_undo_context(self.undo_context)
         if self.history_files and not a_discard:
             f_commit = pydaw_history.pydaw_history_commit(
                 self.history_files, a_message)
             self.history_commits[self.undo_context].append(f_commit)
         self.history_files = []
+        self.history_log.flush()
 
     def clear_history(self):
-        self.history_undo_cursor = 0
         self.history_files = []
         self.history_commits = {}
 
     def undo(self):
         if self.undo_context not in self.history_commits or \
-        self.history_undo_cursor >= len(
-        self.history_commits[self.undo_context]):
+        not self.history_commits[self.undo_context].undo(
+        self.project_folder):
             return False
-        self.history_undo_cursor += 1
-        self.history_commits[self.undo_context][
-            -1 * self.history_undo_cursor].undo(self.project_folder)
         self.clear_caches()
         return True
 
     def redo(self):
         if self.undo_context not in self.history_commits or \
-        self.history_undo_cursor == 0:
+        not self.history_commits[self.undo_context].redo(
+        self.project_folder):
             return False
-        self.history_commits[self.undo_context][
-            -1 * self.history_undo_cursor].redo(self.project_folder)
-        self.history_undo_cursor -= 1
         self.clear_caches()
         return True
 
@@ -180,6 +255,8 @@ class DawNextProject(libmk.AbstractProject):
         self.project_folders = [
             self.project_folder, self.items_folder, self.track_pool_folder,]
 
+        self.clear_caches()
+
     def open_project(self, a_project_file, a_notify_osc=True):
         self.set_project_folders(a_project_file)
         if not os.path.exists(a_project_file):
@@ -219,7 +296,7 @@ class DawNextProject(libmk.AbstractProject):
     def active_wav_pool_uids(self):
         f_region = self.get_region()
         f_item_uids = set(x.item_uid for x in f_region.items)
-        f_items = [self.get_item_by_uid(x) for x in f_item_uids]
+        f_items = [self.get_cached_item(x) for x in f_item_uids]
         result = set(y.uid for x in f_items for y in x.items.values())
         for uid in self.get_plugin_wav_pool_uids():
             result.add(uid)
@@ -347,9 +424,10 @@ class DawNextProject(libmk.AbstractProject):
             return pydaw_atm_region()
 
     def save_atm_region(self, a_region):
-        self.save_file(pydaw_folder_dawnext, "automation.txt", str(a_region))
+        f_text = str(a_region)
+        self.save_file(pydaw_folder_dawnext, "automation.txt", f_text)
         self.commit("Update automation")
-        self.IPC.pydaw_save_atm_region()
+        self.IPC.pydaw_save_atm_region(f_text)
 
     def rename_items(self, a_item_names, a_new_item_name):
         """ @a_item_names:  A list of str
@@ -463,17 +541,26 @@ class DawNextProject(libmk.AbstractProject):
         f_file.close()
         return f_result
 
-    def get_item_by_uid(self, a_item_uid):
+    def get_cached_item(self, a_item_uid):
+        """ Return the cached item without copying it, the caller must
+            not modify the result.  Use get_item_by_uid() to edit an item
+        """
         a_item_uid = int(a_item_uid)
-        f_result = pydaw_item.from_str(
-            self.get_item_string(a_item_uid), a_item_uid)
-        assert f_result.uid == a_item_uid, "UIDs do not match"
+        f_result = self.item_cache.get(a_item_uid)
+        if f_result is None:
+            f_result = pydaw_item.from_str(
+                self.get_item_string(a_item_uid), a_item_uid)
+            assert f_result.uid == a_item_uid, "UIDs do not match"
+            self.item_cache.add(a_item_uid, f_result)
         return f_result
 
+    def get_item_by_uid(self, a_item_uid):
+        return self.get_cached_item(a_item_uid).clone()
+
     def get_item_by_name(self, a_item_name):
         f_items_dict = self.get_items_dict()
         f_uid = f_items_dict.get_uid_by_name(a_item_name)
-        return pydaw_item.from_str(self.get_item_string(f_uid), f_uid)
+        return self.get_item_by_uid(f_uid)
 
     def save_audio_inputs(self, a_tracks):
         if not self.suppress_updates:
@@ -741,8 +828,10 @@ class DawNextProject(libmk.AbstractProject):
         f_item_name = self.get_next_default_item_name(
             a_item_name, a_items_dict=f_items_dict)
         f_uid = f_items_dict.add_new_item(f_item_name)
-        self.save_file(pydaw_folder_items, str(f_uid), pydaw_item(f_uid))
-        self.IPC.pydaw_save_item(f_uid)
+        self.item_cache.invalidate(f_uid)
+        f_text = str(pydaw_item(f_uid))
+        self.save_file(pydaw_folder_items, str(f_uid), f_text)
+        self.IPC.pydaw_save_item(f_uid, f_text)
         self.save_items_dict(f_items_dict)
         return f_uid
 
@@ -752,9 +841,10 @@ class DawNextProject(libmk.AbstractProject):
         f_old_uid = f_items_dict.get_uid_by_name(a_old_item)
         f_new_item = self.get_item_by_uid(f_old_uid)
         f_new_item.uid = f_uid
-        self.save_file(
-            pydaw_folder_items, str(f_uid), str(f_new_item))
-        self.IPC.pydaw_save_item(f_uid)
+        self.item_cache.invalidate(f_uid)
+        f_text = str(f_new_item)
+        self.save_file(pydaw_folder_items, str(f_uid), f_text)
+        self.IPC.pydaw_save_item(f_uid, f_text)
         self.save_items_dict(f_items_dict)
         return f_uid
 
@@ -768,6 +858,7 @@ class DawNextProject(libmk.AbstractProject):
     def clear_caches(self):
         self.pixmap_cache_unscaled = {}
         self.painter_path_cache = {}
+        self.item_cache.clear()
 
     def get_item_path(self, a_uid, a_px_per_beat, a_height, a_tempo):
         a_uid = int(a_uid)
@@ -777,7 +868,7 @@ class DawNextProject(libmk.AbstractProject):
             return self.painter_path_cache[a_uid][f_key]
         else:
             if a_uid not in self.pixmap_cache_unscaled:
-                f_item_obj = self.get_item_by_uid(a_uid)
+                f_item_obj = self.get_cached_item(a_uid)
                 f_path = f_item_obj.painter_path(
                     PIXMAP_BEAT_WIDTH, PIXMAP_TILE_HEIGHT, a_tempo)
                 self.pixmap_cache_unscaled[a_uid] = f_path
@@ -798,17 +889,20 @@ class DawNextProject(libmk.AbstractProject):
             self.painter_path_cache.pop(a_uid)
         if a_uid in self.pixmap_cache_unscaled:
             self.pixmap_cache_unscaled.pop(a_uid)
+        self.item_cache.invalidate(a_uid)
         if not self.suppress_updates:
+            f_text = str(a_item)
             self.save_file(
-                pydaw_folder_items, str(a_uid), str(a_item), a_new_item)
-            self.IPC.pydaw_save_item(a_uid)
+                pydaw_folder_items, str(a_uid), f_text, a_new_item)
+            self.IPC.pydaw_save_item(a_uid, f_text)
 
     def save_region(self, a_region, a_notify=True):
         if not self.suppress_updates:
             a_region.fix_overlaps()
-            self.save_file("", FILE_SEQUENCER, str(a_region))
+            f_text = str(a_region)
+            self.save_file("", FILE_SEQUENCER, f_text)
             if a_notify:
-                self.IPC.pydaw_save_region()
+                self.IPC.pydaw_save_region(f_text)
             self.check_output()
 
     def save_tracks(self, a_tracks):
@@ -904,16 +998,67 @@ class DawNextProject(libmk.AbstractProject):
         return f_result
 
 class pydaw_sequencer_item:
+    """ A reference to an item in the sequencer.  Changes to the fields
+        that pydaw_sequencer indexes on are reported to the sequencer
+        that owns the item, if any
+    """
     def __init__(
             self, a_track_num, a_start_beat, a_length_beats,
             a_item_uid=-1, a_start_pos=0.0, modified=True):
-        self.track_num = int(a_track_num)
-        self.start_beat = float(a_start_beat)
-        self.length_beats = float(a_length_beats)
+        self.owner = None
+        self._track_num = int(a_track_num)
+        self._start_beat = float(a_start_beat)
+        self._length_beats = float(a_length_beats)
         self.item_uid = int(a_item_uid)
         self.start_offset = float(a_start_pos)
         #self.sample_start = float(a_start_pos)
-        self.modified = modified
+        self._modified = modified
+
+    @property
+    def track_num(self):
+        return self._track_num
+
+    @track_num.setter
+    def track_num(self, a_value):
+        f_owner = self.owner
+        if f_owner is not None and f_owner.remove_item(self):
+            self._track_num = a_value
+            f_owner.add_item(self)
+        else:
+            self._track_num = a_value
+
+    @property
+    def start_beat(self):
+        return self._start_beat
+
+    @start_beat.setter
+    def start_beat(self, a_value):
+        self._start_beat = a_value
+        if self.owner is not None:
+            self.owner.dirty_tracks.add(self._track_num)
+
+    @property
+    def length_beats(self):
+        return self._length_beats
+
+    @length_beats.setter
+    def length_beats(self, a_value):
+        self._length_beats = a_value
+        if self.owner is not None:
+            self.owner.stale_tracks.add(self._track_num)
+
+    @property
+    def modified(self):
+        return self._modified
+
+    @modified.setter
+    def modified(self, a_value):
+        self._modified = a_value
+        if self.owner is not None:
+            self.owner.dirty_tracks.add(self._track_num)
+
+    def sort_key(self):
+        return (self._start_beat, bool(self._modified))
 
     def clone(self):
         f_self = str(self).split("|")
@@ -986,15 +1131,141 @@ class pydaw_loop_marker(pydaw_abstract_marker):
     def from_str(self, a_str):
         return pydaw_sequencer_marker(*a_str.split("|", 1))
 
+class pydaw_tempo_map:
+    """ Beat/time conversions for a list of tempo markers sorted by beat.
+        The seconds at each marker are accumulated once, so conversions
+        are a bisect plus one multiply.  Beats before the first marker
+        use the first marker's tempo
+    """
+    def __init__(self, a_tempo_markers):
+        self.markers = a_tempo_markers
+        self.beats = [x.beat for x in a_tempo_markers]
+        self.seconds_per_beat = [60.0 / x.real_tempo for x in a_tempo_markers]
+        self.seconds = [0.0]
+        for f_i in range(1, len(a_tempo_markers)):
+            self.seconds.append(
+                self.seconds[-1] + (self.beats[f_i] - self.beats[f_i - 1]) *
+                self.seconds_per_beat[f_i - 1])
+        self.np_beats = numpy.array(self.beats, dtype=numpy.float64)
+        self.np_seconds = numpy.array(self.seconds, dtype=numpy.float64)
+        self.np_seconds_per_beat = numpy.array(
+            self.seconds_per_beat, dtype=numpy.float64)
+
+    def get_index(self, a_beat):
+        """ The index of the marker in effect at a_beat """
+        return max(bisect.bisect_right(self.beats, a_beat) - 1, 0)
+
+    def get_marker(self, a_beat):
+        return self.markers[self.get_index(a_beat)]
+
+    def beat_to_seconds(self, a_beat):
+        f_i = self.get_index(a_beat)
+        return self.seconds[f_i] + \
+            (a_beat - self.beats[f_i]) * self.seconds_per_beat[f_i]
+
+    def seconds_to_beat(self, a_seconds):
+        f_i = max(bisect.bisect_right(self.seconds, a_seconds) - 1, 0)
+        return self.beats[f_i] + \
+            (a_seconds - self.seconds[f_i]) / self.seconds_per_beat[f_i]
+
+    def sample_to_beat(self, a_sample, a_sr):
+        return self.seconds_to_beat(a_sample / float(a_sr))
+
+    def beat_to_sample(self, a_beat, a_sr):
+        return int(round(self.beat_to_seconds(a_beat) * a_sr))
+
+    def beats_to_seconds(self, a_beats):
+        """ Vectorized beat_to_seconds() for a numpy array of beats """
+        a_beats = numpy.asarray(a_beats, dtype=numpy.float64)
+        f_i = numpy.maximum(
+            numpy.searchsorted(self.np_beats, a_beats, side="right") - 1, 0)
+        return self.np_seconds[f_i] + \
+            (a_beats - self.np_beats[f_i]) * self.np_seconds_per_beat[f_i]
+
+    def seconds_to_beats(self, a_seconds):
+        """ Vectorized seconds_to_beat() for a numpy array of seconds """
+        a_seconds = numpy.asarray(a_seconds, dtype=numpy.float64)
+        f_i = numpy.maximum(
+            numpy.searchsorted(
+                self.np_seconds, a_seconds, side="right") - 1, 0)
+        return self.np_beats[f_i] + \
+            (a_seconds - self.np_seconds[f_i]) / self.np_seconds_per_beat[f_i]
+
 class pydaw_sequencer:
+    """ Item references are indexed per track in lists sorted by
+        pydaw_sequencer_item.sort_key(), with a parallel list of the keys
+        for bisecting.  Edits to items mark their track as dirty, dirty
+        tracks are re-sorted the next time the index is queried
+    """
     def __init__(self):
-        self.items = []
+        self.tracks = {}  # track_num: [pydaw_sequencer_item, ...]
+        self.track_keys = {}  # track_num: [sort_key(), ...]
+        # track_num: (max end beat, max length), upper bounds for queries
+        self.track_ends = {}
+        self.dirty_tracks = set()  # Need to be re-sorted
+        self.stale_tracks = set()  # Need track_ends recalculated
         self.markers = {}
+        self.tempo_map = None
         self.loop_marker = None
         self.set_marker(pydaw_tempo_marker(0, 128.0, 4, 4))
 
+    @property
+    def items(self):
+        """ All item references, sorted by track and start beat """
+        self.clean()
+        return [x for k in sorted(self.tracks) for x in self.tracks[k]]
+
+    def clean(self):
+        """ Bring the index up to date with changes made to items """
+        for f_track_num in self.dirty_tracks:
+            f_items = self.tracks.get(f_track_num)
+            if not f_items:
+                continue
+            f_items.sort(key=pydaw_sequencer_item.sort_key)
+            self.track_keys[f_track_num] = [x.sort_key() for x in f_items]
+        self.stale_tracks.update(self.dirty_tracks)
+        self.dirty_tracks.clear()
+        for f_track_num in self.stale_tracks:
+            f_items = self.tracks.get(f_track_num)
+            if f_items:
+                self.track_ends[f_track_num] = (
+                    max(x._start_beat + x._length_beats for x in f_items),
+                    max(x._length_beats for x in f_items))
+            else:
+                self.tracks.pop(f_track_num, None)
+                self.track_keys.pop(f_track_num, None)
+                self.track_ends.pop(f_track_num, None)
+        self.stale_tracks.clear()
+
+    def get_track_items(self, a_track_num):
+        """ The item references on a track, sorted by start beat.  Do not
+            modify the list
+        """
+        self.clean()
+        return self.tracks.get(a_track_num, [])
+
+    def get_items_in_range(self, a_start_beat, a_end_beat, a_tracks=None):
+        """ Return the item references that overlap
+            a_start_beat <= beat < a_end_beat
+        """
+        self.clean()
+        f_result = []
+        for f_track_num in (self.tracks if a_tracks is None else a_tracks):
+            if f_track_num not in self.tracks:
+                continue
+            f_items = self.tracks[f_track_num]
+            f_keys = self.track_keys[f_track_num]
+            f_max_length = self.track_ends[f_track_num][1]
+            f_lo = bisect.bisect_left(f_keys, (a_start_beat - f_max_length,))
+            f_hi = bisect.bisect_left(f_keys, (a_end_beat,))
+            f_result.extend(
+                x for x in f_items[f_lo:f_hi]
+                if x.start_beat + x.length_beats > a_start_beat)
+        return f_result
+
     def set_marker(self, a_marker):
         self.markers[(a_marker.beat, a_marker.type)] = a_marker
+        self.tempo_map = None
 
     def delete_marker(self, a_marker):
         f_tuple = (a_marker.beat, a_marker.type)
@@ -1002,12 +1273,11 @@ class pydaw_sequencer:
             return # don't delete the first tempo marker
         if f_tuple in self.markers:
             self.markers.pop(f_tuple)
+            self.tempo_map = None
 
     def has_marker(self, a_beat, a_type):
         f_tuple = tuple(int(x) for x in (a_beat, a_type))
-        f_result = [v for k, v in self.markers.items() if k == f_tuple]
-        assert len(f_result) <= 1, "Should only be 1 or 0 results"
-        return f_result[0] if f_result else None
+        return self.markers.get(f_tuple)
 
     def get_markers(self):
         f_tempo_markers = self.get_tempo_markers()
@@ -1024,40 +1294,32 @@ class pydaw_sequencer:
             self.set_marker(a_marker)
         self.loop_marker = a_marker
 
+    def get_tempo_map(self):
+        """ The pydaw_tempo_map, rebuilt only after the markers change """
+        if self.tempo_map is None:
+            self.tempo_map = pydaw_tempo_map(
+                sorted(x for x in self.markers.values() if x.type == 2))
+        return self.tempo_map
+
     def get_tempo_markers(self):
-        return sorted(x for x in self.markers.values() if x.type == 2)
+        return list(self.get_tempo_map().markers)
 
     def get_tempo_at_pos(self, a_beat):
-        f_tempo_markers = self.get_tempo_markers()
-        for f_t1, f_t2 in zip(f_tempo_markers, f_tempo_markers[1:]):
-            if a_beat < f_t2.beat and a_beat > f_t1.beat:
-                return f_t1.real_tempo
-        return f_tempo_markers[-1].real_tempo
+        return self.get_tempo_map().get_marker(a_beat).real_tempo
 
     def get_tsig_at_pos(self, a_beat):
-        f_tempo_markers = self.get_tempo_markers()
-        for f_t1, f_t2 in zip(f_tempo_markers, f_tempo_markers[1:]):
-            if a_beat < f_t2.beat and a_beat > f_t1.beat:
-                return f_t1.tsig_num
-        return f_tempo_markers[-1].tsig_num
+        return self.get_tempo_map().get_marker(a_beat).tsig_num
 
     def get_seconds_at_beat(self, a_beat):
         if not a_beat:
             return 0.0
-        f_time = 0.0
-        f_found = False
-        f_tempo_markers = self.get_tempo_markers()
-        for f_t1, f_t2 in zip(f_tempo_markers, f_tempo_markers[1:]):
-            if a_beat < f_t2.beat and a_beat > f_t1.beat:
-                f_time += (a_beat - f_t1.beat) * (60.0 / f_t1.real_tempo)
-                f_found = True
-                break
-            else:
-                f_time += (f_t2.beat - f_t1.beat) * (60.0 / f_t1.real_tempo)
-        if not f_found:
-            f_t1 = f_tempo_markers[-1]
-            f_time += (a_beat - f_t1.beat) * (60.0 / f_t1.real_tempo)
-        return f_time
+        return self.get_tempo_map().beat_to_seconds(a_beat)
+
+    def get_beat_at_seconds(self, a_seconds):
+        return self.get_tempo_map().seconds_to_beat(a_seconds)
+
+    def get_beat_at_sample(self, a_sample, a_sr):
+        return self.get_tempo_map().sample_to_beat(a_sample, a_sr)
 
     def get_time_at_beat(self, a_beat):
         f_time = self.get_seconds_at_beat(a_beat)
@@ -1072,8 +1334,16 @@ class pydaw_sequencer:
         return int(round((f_time1 - f_time2) * a_sr))
 
     def reorder(self, a_dict):
-        for f_item in self.items:
+        f_items = self.items
+        self.tracks.clear()
+        self.track_keys.clear()
+        self.track_ends.clear()
+        self.dirty_tracks.clear()
+        self.stale_tracks.clear()
+        for f_item in f_items:
+            f_item.owner = None
             f_item.track_num = a_dict[f_item.track_num]
+            self.add_item(f_item)
 
     def add_item_ref_by_name(self, a_item_ref, a_item_name, a_uid_dict):
         a_item_ref.item_uid = a_uid_dict.get_uid_by_name(a_item_name)
@@ -1081,194 +1351,362 @@ class pydaw_sequencer:
 
     def add_item_ref_by_uid(self, a_item_ref):
         self.remove_item_ref(a_item_ref)
-        self.items.append(a_item_ref)
+        self.add_item(a_item_ref)
 
     def add_item(self, a_item):
-        self.items.append(a_item)
+        a_item.owner = self
+        f_track_num = a_item.track_num
+        if f_track_num not in self.tracks:
+            self.tracks[f_track_num] = [a_item]
+            self.track_keys[f_track_num] = [a_item.sort_key()]
+            self.stale_tracks.add(f_track_num)
+        elif f_track_num in self.dirty_tracks:
+            self.tracks[f_track_num].append(a_item)
+        else:
+            f_key = a_item.sort_key()
+            f_keys = self.track_keys[f_track_num]
+            f_index = bisect.bisect_right(f_keys, f_key)
+            f_keys.insert(f_index, f_key)
+            self.tracks[f_track_num].insert(f_index, a_item)
+            self.stale_tracks.add(f_track_num)
+
+    def remove_item(self, a_item):
+        """ Remove a_item by identity, returns True if it was found """
+        self.clean()
+        f_track_num = a_item.track_num
+        if f_track_num not in self.tracks:
+            return False
+        f_items = self.tracks[f_track_num]
+        f_keys = self.track_keys[f_track_num]
+        f_key = a_item.sort_key()
+        f_lo = bisect.bisect_left(f_keys, f_key)
+        f_hi = bisect.bisect_right(f_keys, f_key)
+        for f_index in range(f_lo, f_hi):
+            if f_items[f_index] is a_item:
+                f_items.pop(f_index)
+                f_keys.pop(f_index)
+                self.stale_tracks.add(f_track_num)
+                a_item.owner = None
+                return True
+        return False
 
     def remove_item_ref(self, a_item):
+        """ Remove any item references equal to a_item """
         f_to_remove = str(a_item)
-        for f_item in self.items:
-            if str(f_item) == f_to_remove:
-                self.items.remove(f_item)
+        f_start = round(a_item.start_beat, 6)
+        for f_item in self.get_items_in_range(
+        f_start - 1e-6, f_start + 1e-6, [a_item.track_num]):
+            if round(f_item.start_beat, 6) == f_start and \
+            str(f_item) == f_to_remove:
+                self.remove_item(f_item)
 
     def split(self, a_points, a_tracks=None, a_modify=True):
         if a_points[0] != 0.0:
             a_points.insert(0, 0.0)
         assert sorted(a_points) == a_points
         f_result = []
-        if not a_tracks:
-            f_items = self.items[:]
-        else:
-            f_items = [x for x in self.items if x.track_num in a_tracks]
-            if a_port is not None:
-                f_items = [x for x in f_items if x.port == a_port]
+        f_tracks = self.tracks if a_tracks is None else a_tracks
+        f_carry = []
         for f_p1, f_p2 in zip(a_points, a_points[1:]):
-            f_list = [x for x in f_items
-                if x.start_beat >= f_p1 and x.start_beat < f_p2]
+            f_list = f_carry + [
+                x for x in self.get_items_in_range(f_p1, f_p2, f_tracks)
+                if x.start_beat >= f_p1]
+            f_carry = []
             f_result.append(f_list)
             for f_item in f_list:
                 if f_item.length_beats + f_item.start_beat > f_p2:
                     f_new_item = f_item.clone()
-                    f_items.append(f_new_item)
                     f_diff = f_p2 - f_item.start_beat
+                    f_new_item.start_beat = f_p2
                     f_new_item.length_beats = f_item.length_beats - f_diff
                     f_new_item.start_offset += f_diff
+                    f_carry.append(f_new_item)
                     if a_modify:
                         f_item.length_beats = f_diff
-        f_list = [x for x in f_items if x > a_points[-1]]
-        f_result.append(f_list)
+        f_result.append(f_carry + [
+            x for x in self.get_items_in_range(
+                a_points[-1], float("inf"), f_tracks)
+            if x.start_beat >= a_points[-1]])
         return f_result
 
     def insert_space(self, a_start, a_length):
-        for f_item in (x for x in self.items if x.start_beat >= a_start):
-            f_item.start_beat += a_length
+        self.clean()
+        for f_track_num, f_items in self.tracks.items():
+            f_keys = self.track_keys[f_track_num]
+            f_index = bisect.bisect_left(f_keys, (a_start,))
+            if f_index == len(f_items):
+                continue
+            # Moving every item after a_start keeps the order the same
+            for f_item in f_items[f_index:]:
+                f_item._start_beat += a_length
+            f_keys[f_index:] = [x.sort_key() for x in f_items[f_index:]]
+            self.stale_tracks.add(f_track_num)
 
     def clear_range(self, a_track_list, a_start_beat, a_end_beat):
-        for f_item in [x for x in self.items if x.track_num in a_track_list]:
+        if a_start_beat >= a_end_beat:
+            return
+        f_to_delete = set()
+        for f_item in self.get_items_in_range(
+        a_start_beat, a_end_beat, a_track_list):
             f_end_beat = f_item.start_beat + f_item.length_beats
-            if f_item.start_beat >= a_start_beat and \
-            a_start_beat < a_end_beat:
+            if f_item.start_beat >= a_start_beat:
                 if f_end_beat <= a_end_beat:
-                    self.items.remove(f_item)
+                    f_to_delete.add(id(f_item))
                 else:
                     f_diff = a_end_beat - f_item.start_beat
                     f_item.start_offset += f_diff
                     f_item.length_beats -= f_diff
                     f_item.start_beat = a_end_beat
-            elif f_item.start_beat < a_start_beat:
-                if f_end_beat >= a_start_beat and \
-                f_end_beat < a_end_beat:
-                    f_item.length_beats = a_start_beat - f_item.start_beat
+            elif f_end_beat < a_end_beat:
+                f_item.length_beats = a_start_beat - f_item.start_beat
+        self.remove_items_by_id(f_to_delete)
+
+    def remove_items_by_id(self, a_ids):
+        """ Remove every item reference whose id() is in a_ids """
+        if not a_ids:
+            return
+        for f_track_num in list(self.tracks):
+            f_items = self.tracks[f_track_num]
+            f_keep = [x for x in f_items if id(x) not in a_ids]
+            if len(f_keep) == len(f_items):
+                continue
+            for f_item in f_items:
+                if id(f_item) in a_ids:
+                    f_item.owner = None
+            self.tracks[f_track_num] = f_keep
+            self.dirty_tracks.add(f_track_num)
 
     def get_length(self):
-        f_item_max = max(x.start_beat + x.length_beats
-            for x in self.items) if self.items else 0
+        self.clean()
+        f_item_max = max(
+            x[0] for x in self.track_ends.values()) if self.tracks else 0
         f_marker_max = max(
             x.beat for x in self.markers.values()) if self.markers else 0
         return max((f_item_max, f_marker_max)) + 64
 
     def fix_overlaps(self):
+        self.clean()
         # Delete items with length < 1/16th note
-        f_to_delete = {x for x in self.items if x.length_beats < 0.25}
-        for f_i in range(TRACK_COUNT_ALL):
-            f_items = [
-                x for x in self.items if x.track_num == f_i and
-                x not in f_to_delete]
-            if f_items:
-                f_items.sort()
-                for f_item, f_next in zip(f_items, f_items[1:]):
-                    if f_item.start_beat == f_next.start_beat:
-                        # sort is by start_beat then (not modified)
-                        f_to_delete.add(f_item)
-                    f_end = f_item.start_beat + f_item.length_beats
-                    if f_end > f_next.start_beat:
-                        f_item.length_beats = (
-                            f_next.start_beat - f_item.start_beat)
-                        if f_item.length_beats < 0.25:
-                            f_to_delete.add(f_item)
-        for f_item in f_to_delete:
-            self.items.remove(f_item)
-
+        f_to_delete = {id(x) for x in self.items if x.length_beats < 0.25}
+        for f_items in self.tracks.values():
+            f_items = [x for x in f_items if id(x) not in f_to_delete]
+            # sorted by start_beat then (not modified)
+            for f_item, f_next in zip(f_items, f_items[1:]):
+                if f_item.start_beat == f_next.start_beat:
+                    f_to_delete.add(id(f_item))
+                f_end = f_item.start_beat + f_item.length_beats
+                if f_end > f_next.start_beat:
+                    f_item.length_beats = (
+                        f_next.start_beat - f_item.start_beat)
+                    if f_item.length_beats < 0.25:
+                        f_to_delete.add(id(f_item))
+        self.remove_items_by_id(f_to_delete)
 
     def __str__(self):
+        self.clean()
         f_result = []
         f_result.append("M|{}".format(
             len([x for x in self.markers.values() if x.type in (1, 2)])))
         for v in sorted(self.markers.values()):
             f_result.append(str(v))
-        for f_i in range(TRACK_COUNT_ALL):
-            f_items = [x for x in self.items if x.track_num == f_i]
-            if f_items:
-                f_items.sort()
-                f_result.append("C|{}|{}".format(f_i, len(f_items)))
-                for f_item in f_items:
-                    f_result.append(str(f_item))
+        f_items = [
+            x for k in sorted(self.tracks) if k >= 0 and k < TRACK_COUNT_ALL
+            for x in self.tracks[k]]
+        f_arr = numpy.empty(len(f_items), dtype=SEQ_ITEM_DTYPE)
+        for f_name, f_attr in zip(SEQ_ITEM_DTYPE.names, (
+        "_track_num", "_start_beat", "_length_beats", "item_uid",
+        "start_offset")):
+            f_arr[f_name] = numpy.array(
+                list(map(operator.attrgetter(f_attr), f_items)),
+                dtype=SEQ_ITEM_DTYPE[f_name])
+        assert not len(f_arr) or f_arr["item_uid"].min() >= 0, "Negative UID"
+        f_result += pydaw_format_sequencer_items(f_arr)
         f_result.append(pydaw_terminating_char)
         return "\n".join(f_result)
 
     @staticmethod
     def from_str(a_str):
         f_result = pydaw_sequencer()
-        f_arr = a_str.split("\n")
-        for f_line in f_arr:
-            if f_line == pydaw_terminating_char:
-                break
+        f_markers, f_arr = pydaw_parse_sequencer(a_str)
+        for f_item_arr in f_markers:
+            f_type = int(f_item_arr[1])
+            if f_type == 1:
+                f_result.set_loop_marker(
+                    pydaw_loop_marker(*f_item_arr[2:]))
+            elif f_type == 2:
+                f_result.set_marker(
+                    pydaw_tempo_marker(*f_item_arr[2:]))
+            elif f_type == 3:
+                f_result.set_marker(
+                    pydaw_sequencer_marker(*f_item_arr[2:]))
             else:
-                f_item_arr = f_line.split("|")
-                if f_item_arr[0] == "E":
-                    f_type = int(f_item_arr[1])
-                    if f_type == 1:
-                        f_result.set_loop_marker(
-                            pydaw_loop_marker(*f_item_arr[2:]))
-                    elif f_type == 2:
-                        f_result.set_marker(
-                            pydaw_tempo_marker(*f_item_arr[2:]))
-                    elif f_type == 3:
-                        f_result.set_marker(
-                            pydaw_sequencer_marker(*f_item_arr[2:]))
-                    else:
-                        assert False, "Invalid type {}".format(f_type)
-                    continue
-                if f_item_arr[0] == "M":
-                    continue
-                if f_item_arr[0] == "C":
-                    continue
-                f_result.add_item(
-                    pydaw_sequencer_item(*f_item_arr, modified=False))
-        f_result.items.sort()
+                assert False, "Invalid type {}".format(f_type)
+        # Append to the track lists and let clean() sort them once,
+        # rather than bisecting each item into place
+        f_tracks = f_result.tracks
+        for f_track_num, f_start, f_length, f_uid, f_offset in zip(
+        *(f_arr[x].tolist() for x in f_arr.dtype.names)):
+            f_item = pydaw_sequencer_item(
+                f_track_num, f_start, f_length, f_uid, f_offset, False)
+            f_item.owner = f_result
+            if f_track_num in f_tracks:
+                f_tracks[f_track_num].append(f_item)
+            else:
+                f_tracks[f_track_num] = [f_item]
+        f_result.dirty_tracks.update(f_tracks)
         return f_result
 
 
 class pydaw_atm_region:
+    """ Automation points are indexed per (plugin UID, port) in lists
+        sorted by beat, with a parallel list of the beats for bisecting.
+        Moving a point marks its port as dirty, dirty ports are re-sorted
+        the next time the index is queried
+    """
     def __init__(self):
-        self.plugins = {}
-        self.points = []
+        self.plugins = {}  # plugin_uid: {port_num: [pydaw_atm_point, ...]}
+        self.port_keys = {}  # (plugin_uid, port_num): [beat, ...]
+        self.dirty_ports = set()  # (plugin_uid, port_num)
+
+    @property
+    def points(self):
+        """ All points, sorted by plugin, port and beat """
+        self.clean()
+        return [
+            x for f_index in sorted(self.plugins)
+            for f_port in sorted(self.plugins[f_index])
+            for x in self.plugins[f_index][f_port]]
+
+    def clean(self):
+        """ Bring the index up to date with points that have been moved """
+        for f_index, f_port_num in self.dirty_ports:
+            f_ports = self.plugins.get(f_index)
+            if not f_ports or f_port_num not in f_ports:
+                continue
+            f_points = f_ports[f_port_num]
+            f_points.sort(key=pydaw_atm_point.sort_key)
+            self.port_keys[(f_index, f_port_num)] = [
+                x._beat for x in f_points]
+        self.dirty_ports.clear()
+
+    def get_range(self, a_index, a_port_num, a_start_beat, a_end_beat):
+        """ Returns (list, start index, end index) of the points of a port
+            where a_start_beat <= beat < a_end_beat, or None if the port
+            has no points
+        """
+        f_ports = self.plugins.get(a_index)
+        if not f_ports or a_port_num not in f_ports:
+            return None
+        if (a_index, a_port_num) in self.dirty_ports:
+            self.clean()
+        f_keys = self.port_keys[(a_index, a_port_num)]
+        return (
+            f_ports[a_port_num],
+            bisect.bisect_left(f_keys, a_start_beat),
+            bisect.bisect_left(f_keys, a_end_beat))
+
+    def get_points_in_range(
+            self, a_index, a_port_num, a_start_beat, a_end_beat):
+        f_range = self.get_range(
+            a_index, a_port_num, a_start_beat, a_end_beat)
+        if not f_range:
+            return []
+        f_points, f_start, f_end = f_range
+        return f_points[f_start:f_end]
 
     def split(self, a_points, a_plugins=None, a_port=None):
         if a_points[0] != 0.0:
             a_points.insert(0, 0.0)
         assert(sorted(a_points) == a_points)
-        f_result = []
-        if not a_plugins:
-            f_points = self.points[:]
-        else:
-            f_points = [x for x in self.points if x.index in a_plugins]
-            if a_port is not None:
-                f_points = [x for x in f_points if x.port == a_port]
-        for f_p1, f_p2 in zip(a_points, a_points[1:]):
-            f_list = [x for x in f_points if x >= f_p1 and x < f_p2]
-            f_result.append(f_list)
-        f_list = [x for x in f_points if x > a_points[-1]]
-        f_result.append(f_list)
+        f_result = [[] for x in a_points]
+        for f_point in self.points:
+            if a_plugins and (f_point.index not in a_plugins or (
+            a_port is not None and f_point.port_num != a_port)):
+                continue
+            f_i = bisect.bisect_right(a_points, f_point.beat) - 1
+            if f_i >= 0:
+                f_result[f_i].append(f_point)
         return f_result
 
     def copy_range_all(self, a_start, a_end):
-        return [x.clone() for x in self.points
-            if x.beat >= a_start and x.beat < a_end]
+        return self.copy_range_by_plugins(a_start, a_end, self.plugins)
 
     def copy_range_by_plugins(self, a_start, a_end, a_plugins):
-        f_result = [x.clone() for x in self.points
-            if x.beat >= a_start and x.beat < a_end and x.index in a_plugins]
+        """ Returns clones of the points of a_plugins where
+            a_start <= beat < a_end, with the beat relative to a_start
+        """
+        f_result = []
+        for f_index in a_plugins:
+            for f_port_num in self.get_ports(f_index):
+                f_result.extend(
+                    x.clone() for x in self.get_points_in_range(
+                        f_index, f_port_num, a_start, a_end))
         for x in f_result:
             x.beat -= a_start
         return f_result
 
-    def add_port_list(self, a_point):
-        if not a_point.index in self.plugins:
-            self.plugins[a_point.index] = {}
-        if not a_point.port_num in self.plugins[a_point.index]:
-            self.plugins[a_point.index][a_point.port_num] = []
-
     def add_point(self, a_point):
-        self.add_port_list(a_point)
-        self.plugins[a_point.index][a_point.port_num].append(a_point)
-        self.points.append(a_point)
+        a_point.owner = self
+        f_key = (a_point.index, a_point.port_num)
+        f_ports = self.plugins.setdefault(a_point.index, {})
+        if a_point.port_num not in f_ports:
+            f_ports[a_point.port_num] = [a_point]
+            self.port_keys[f_key] = [a_point._beat]
+        elif f_key in self.dirty_ports:
+            f_ports[a_point.port_num].append(a_point)
+        else:
+            f_keys = self.port_keys[f_key]
+            f_i = bisect.bisect_right(f_keys, a_point._beat)
+            f_keys.insert(f_i, a_point._beat)
+            f_ports[a_point.port_num].insert(f_i, a_point)
+
+    def add_points(self, a_points):
+        """ Add many points at once, sorting each port once instead of
+            bisecting every point into place
+        """
+        for f_point in a_points:
+            f_point.owner = self
+            f_key = (f_point.index, f_point.port_num)
+            f_ports = self.plugins.setdefault(f_point.index, {})
+            if f_point.port_num in f_ports:
+                f_ports[f_point.port_num].append(f_point)
+            else:
+                f_ports[f_point.port_num] = [f_point]
+            self.dirty_ports.add(f_key)
 
     def remove_point(self, a_point):
-        #self.add_port_list(a_point)
-        self.plugins[a_point.index][a_point.port_num].remove(a_point)
-        self.points.remove(a_point)
+        f_range = self.get_range(
+            a_point.index, a_point.port_num, a_point.beat, float("inf"))
+        if f_range:
+            f_points, f_i, f_end = f_range
+            f_keys = self.port_keys[(a_point.index, a_point.port_num)]
+            while f_i < f_end and f_keys[f_i] == a_point.beat:
+                if f_points[f_i] is a_point:
+                    self.remove_range(
+                        a_point.index, a_point.port_num, f_i, f_i + 1)
+                    return
+                f_i += 1
+        raise ValueError("Point not in the region: {}".format(a_point))
+
+    def remove_range(self, a_index, a_port_num, a_start, a_end):
+        """ Remove the points of a port from list index a_start to a_end,
+            returns the removed points
+        """
+        f_key = (a_index, a_port_num)
+        f_ports = self.plugins[a_index]
+        f_points = f_ports[a_port_num]
+        f_result = f_points[a_start:a_end]
+        del f_points[a_start:a_end]
+        del self.port_keys[f_key][a_start:a_end]
+        for f_point in f_result:
+            f_point.owner = None
+        if not f_points:
+            del f_ports[a_port_num]
+            del self.port_keys[f_key]
+            self.dirty_ports.discard(f_key)
+            if not f_ports:
+                del self.plugins[a_index]
+        return f_result
 
     def get_ports(self, a_index):
         a_index = int(a_index)
@@ -1278,41 +1716,40 @@ class pydaw_atm_region:
             return sorted(self.plugins[a_index])
 
     def get_points(self, a_index, a_port_num):
+        """ The points of a port sorted by beat.  Do not modify the list """
         a_port_num = int(a_port_num)
         a_index = int(a_index)
         if a_index not in self.plugins or \
         a_port_num not in self.plugins[a_index]:
             return []
         else:
-            f_result = self.plugins[a_index][a_port_num]
-            f_result.sort()
-            return f_result
+            if (a_index, a_port_num) in self.dirty_ports:
+                self.clean()
+            return self.plugins[a_index][a_port_num]
 
     def clear_range_by_plugins(self, a_start, a_end, a_plugins):
-        f_result = [x for x in self.points
-            if x.beat >= a_start and x.beat < a_end and x.index in a_plugins]
-        for f_point in f_result:
-            self.remove_point(f_point)
+        for f_index in a_plugins:
+            for f_port_num in self.get_ports(f_index):
+                self.clear_range(f_index, f_port_num, a_start, a_end)
 
     def clear_plugins(self, a_plugin_uids):
-        f_result = [x for x in self.points if x.index in a_plugin_uids]
-        for f_point in f_result:
-            self.remove_point(f_point)
+        for f_index in a_plugin_uids:
+            for f_port_num in self.get_ports(f_index):
+                self.clear_port(f_index, f_port_num)
 
     def clear_port(self, a_index, a_port_num):
-        f_result = self.get_points(a_index, a_port_num)
-        for f_point in f_result:
-            self.remove_point(f_point)
+        if self.get_points(a_index, a_port_num):
+            self.remove_range(a_index, a_port_num, 0, None)
 
     def clear_range(self, a_index, a_port_num, a_start_beat, a_end_beat):
-        f_list = self.get_points(a_index, a_port_num)
-        if f_list:
-            f_new = [x for x in f_list if
-                x.beat < a_start_beat or x.beat >= a_end_beat]
-            f_result = [x for x in f_list if
-                x.beat >= a_start_beat or x.beat < a_end_beat]
-            self.plugins[a_index][a_port_num] = f_new
-            return f_result
+        """ Remove the points of a port where
+            a_start_beat <= beat < a_end_beat, returns the removed points
+        """
+        f_range = self.get_range(
+            a_index, a_port_num, a_start_beat, a_end_beat)
+        if not f_range or f_range[1] == f_range[2]:
+            return []
+        return self.remove_range(a_index, a_port_num, *f_range[1:])
 
     def smooth_points(
             self, a_index, a_port_num, a_plugin_index, a_points, a_linear):
@@ -1326,78 +1763,98 @@ class pydaw_atm_region:
         f_end = a_points[-1]
         self.clear_range(a_index, a_port_num, f_start.beat, f_end.beat)
         f_inc = 0.0625 # 64th note
-        f_result = self.plugins[a_index][a_port_num]
-        f_smoother = pydaw_util.OnePoleLP(f_start.cc_val)
-        for f_point, f_next in zip(a_points, a_points[1:]):
-            f_beat = f_point.beat + f_inc
-            f_val = f_point.cc_val
-            f_beat_next = f_next.beat
-            f_val_next = f_next.cc_val
-            f_result.append(f_point)
-            if round(f_val, 3) == round(f_val_next, 3):
-                continue
-            f_beat_diff = f_beat_next - f_beat
-            if f_beat_diff < f_inc:
-                f_result.append(f_point)
-                continue
-            f_inc_count = int(round(f_beat_diff / f_inc))
-            for f_i in range(1, f_inc_count + 1):
-                if a_linear:
-                    f_int_val = pydaw_util.linear_interpolate(
-                        f_val, f_val_next, (f_i / f_inc_count))
-                else:
-                    f_int_val = pydaw_util.cosine_interpolate(
-                        f_val, f_val_next, (f_i / f_inc_count))
-                f_int_val = f_smoother.process(f_int_val)
-                f_point2 = pydaw_atm_point(
-                    f_beat, a_port_num, f_int_val, a_index, a_plugin_index)
-                f_result.append(f_point2)
-                a_points.append(f_point2)
-                f_beat += f_inc
-        f_result.append(f_end)
+        f_beats, f_vals, f_segments = pydaw_curve_segments(
+            [x.beat for x in a_points], [x.cc_val for x in a_points],
+            f_inc, not a_linear)
+        f_arr = numpy.zeros(len(f_beats), dtype=ATM_POINT_DTYPE)
+        f_arr["beat"] = f_beats
+        f_arr["cc_val"] = pydaw_curve_one_pole(f_vals, f_start.cc_val)
+        f_arr["port_num"] = a_port_num
+        f_arr["index"] = a_index
+        f_arr["plugin_index"] = a_plugin_index
+        f_new = pydaw_atm_points_from_array(f_arr)
+        self.add_points([x for x in a_points if x.owner is not self])
+        self.add_points(f_new)
+        a_points.extend(f_new)
+        if AUTOMATION_SIMPLIFY_TOLERANCE > 0.0:
+            self.simplify(
+                a_index, a_port_num, AUTOMATION_SIMPLIFY_TOLERANCE,
+                f_start.beat, f_end.beat)
+            a_points[:] = [x for x in a_points if x.owner is self]
+
+    def simplify(
+            self, a_index, a_port_num, a_tolerance, a_start_beat=None,
+            a_end_beat=None):
+        """ Remove the points of a port where
+            a_start_beat <= beat <= a_end_beat that the automation would
+            pass within a_tolerance of anyway, the engine interpolates
+            linearly between points.  Points with break_after set and the
+            points after them are kept.  Returns the number of points
+            removed
+        """
+        f_range = self.get_range(
+            a_index, a_port_num,
+            float("-inf") if a_start_beat is None else a_start_beat,
+            float("inf"))
+        if not f_range:
+            return 0
+        f_points, f_start, f_end = f_range
+        if a_end_beat is not None:
+            f_end = bisect.bisect_right(
+                self.port_keys[(a_index, a_port_num)], a_end_beat)
+        f_slice = f_points[f_start:f_end]
+        if len(f_slice) <= 2:
+            return 0
+        f_breaks = numpy.array([x.break_after for x in f_slice], dtype=bool)
+        f_breaks[1:] |= f_breaks[:-1]
+        f_keep = pydaw_curve_simplify(
+            [x._beat for x in f_slice], [x.cc_val for x in f_slice],
+            a_tolerance, f_breaks).tolist()
+        f_kept = [x for x, k in zip(f_slice, f_keep) if k]
+        for f_point, f_k in zip(f_slice, f_keep):
+            if not f_k:
+                f_point.owner = None
+        f_points[f_start:f_end] = f_kept
+        self.port_keys[(a_index, a_port_num)][f_start:f_end] = [
+            x._beat for x in f_kept]
+        return len(f_slice) - len(f_kept)
 
     def __str__(self):
         # New file format:
         # lines starting with 'p':  p|plugin_uid|port_count
         # lines starting with 'q':  n|port_num|point_count
         # other lines:  pydaw_atm_point
-        f_result = []
-        for f_index in sorted(self.plugins):
-            port_dict = {k:v for k, v in self.plugins[f_index].items() if v}
-            if not port_dict:
-                continue
-            port_len = len(port_dict)
-            f_result.append(
-                "|".join(str(x) for x in
-                ("p", f_index, port_len)))
-            for port_num in sorted(port_dict):
-                port_list = port_dict[port_num]
-                port_list.sort()
-                f_result.append(
-                    "|".join(str(x) for x in
-                    ("q", port_num, len(port_list))))
-                for f_point in port_list:
-                    f_result.append(str(f_point))
+        f_result = pydaw_format_atm(
+            pydaw_events_to_array(self.points, ATM_POINT_DTYPE))
         f_result.append(pydaw_terminating_char)
         return "\n".join(f_result)
 
     @staticmethod
     def from_str(a_str):
         f_result = pydaw_atm_region()
-        for f_line in str(a_str).split("\n"):
-            if f_line == pydaw_terminating_char:
-                break
-            if f_line[0] in ("p", "q"):
-                continue
-            f_point = pydaw_atm_point.from_str(f_line)
-            f_result.add_point(f_point)
+        f_arr = pydaw_parse_atm(str(a_str))
+        assert numpy.all(f_arr["break_after"] <= 1) and \
+            numpy.all(f_arr["break_after"] >= 0), "Invalid break_after"
+        f_plugins = f_result.plugins
+        # Append to the port lists and let clean() sort them once
+        for f_point in pydaw_events_from_array(
+        f_arr, pydaw_atm_point, ATM_POINT_ATTRS):
+            f_point.owner = f_result
+            f_ports = f_plugins.setdefault(f_point.index, {})
+            if f_point.port_num in f_ports:
+                f_ports[f_point.port_num].append(f_point)
+            else:
+                f_ports[f_point.port_num] = [f_point]
+        f_result.dirty_ports.update(
+            (k, x) for k, v in f_plugins.items() for x in v)
         return f_result
 
 class pydaw_atm_point:
     def __init__(
             self, a_beat, a_port_num, a_cc_val, a_index, a_plugin_index,
             a_break_after=0, a_curve=0.0):
-        self.beat = round(float(a_beat), 4)
+        self.owner = None  # The pydaw_atm_region that indexes the point
+        self._beat = round(float(a_beat), 4)
         self.port_num = int(a_port_num)
         self.cc_val = round(float(a_cc_val), 4)
         self.index = int(a_index) # Now means plugin pool UID
@@ -1408,11 +1865,24 @@ class pydaw_atm_point:
         # so I don't have to code around it later
         self.curve = float(a_curve)
 
+    @property
+    def beat(self):
+        return self._beat
+
+    @beat.setter
+    def beat(self, a_value):
+        self._beat = a_value
+        if self.owner is not None:
+            self.owner.dirty_ports.add((self.index, self.port_num))
+
+    def sort_key(self):
+        return self._beat
+
     def set_val(self, a_val):
         self.cc_val = pydaw_clip_value(float(a_val), 0.0, 127.0, True)
 
     def __lt__(self, other):
-        return self.beat < other.beat
+        return self._beat < other._beat
 
 #    def __eq__(self, other):
 #        return (
@@ -1441,6 +1911,22 @@ class pydaw_atm_point:
     def clone(self):
         return pydaw_atm_point.from_str(str(self))
 
+# The pydaw_atm_point attributes for the fields of ATM_POINT_DTYPE
+ATM_POINT_ATTRS = (
+    "_beat", "port_num", "cc_val", "index", "plugin_index", "break_after",
+    "curve")
+
+def pydaw_atm_points_from_array(a_arr):
+    """ Create pydaw_atm_point objects from an ATM_POINT_DTYPE array,
+        rounding the fields like the constructor does
+    """
+    f_result = pydaw_events_from_array(
+        pydaw_round_fields(a_arr, ATM_POINT_ROUND), pydaw_atm_point,
+        ATM_POINT_ATTRS)
+    for f_point in f_result:
+        f_point.owner = None
+    return f_result
+
 
 class pydaw_item:
     def __init__(self, a_uid):
@@ -1451,6 +1937,16 @@ class pydaw_item:
         self.uid = int(a_uid)
         self.fx_list = {} #per-audio-item-fx
 
+    def clone(self):
+        """ Return a deep copy without re-parsing the item """
+        f_result = pydaw_item(self.uid)
+        f_result.items = {k:copy.copy(v) for k, v in self.items.items()}
+        f_result.notes = [copy.copy(x) for x in self.notes]
+        f_result.ccs = [copy.copy(x) for x in self.ccs]
+        f_result.pitchbends = [copy.copy(x) for x in self.pitchbends]
+        f_result.fx_list = copy.deepcopy(self.fx_list)
+        return f_result
+
     def get_next_lane(self):
         f_lanes = set(x.lane_num for x in self.items.values())
         for f_i in range(24):
@@ -1697,6 +2193,53 @@ class pydaw_item:
             print((repr(traceback.extract_stack())))
             print("\n\n\n")
 
+    def get_note_array(self):
+        """ The notes as a NOTE_DTYPE structured array, in the same order
+            as self.notes
+        """
+        return pydaw_events_to_array(self.notes, NOTE_DTYPE)
+
+    def get_cc_array(self):
+        return pydaw_events_to_array(self.ccs, CC_DTYPE)
+
+    def get_pb_array(self):
+        return pydaw_events_to_array(self.pitchbends, PB_DTYPE)
+
+    def set_note_array(self, a_arr):
+        """ Replace the notes with the contents of a NOTE_DTYPE array """
+        a_arr = numpy.sort(a_arr, order="start", kind="mergesort")
+        self.notes = pydaw_events_from_array(a_arr, pydaw_note)
+
+    def set_cc_array(self, a_arr):
+        a_arr = numpy.sort(a_arr, order="start", kind="mergesort")
+        self.ccs = pydaw_events_from_array(a_arr, pydaw_cc)
+
+    def set_pb_array(self, a_arr):
+        a_arr = numpy.sort(a_arr, order="start", kind="mergesort")
+        self.pitchbends = pydaw_events_from_array(a_arr, pydaw_pitchbend)
+
+    def get_note_indexes(self, a_notes=None, a_selected_only=False):
+        """ Return a numpy array of the indexes in self.notes of the
+            first note equal to each note in a_notes, or of every note
+            if a_notes is None
+        """
+        if a_notes is None:
+            f_result = range(len(self.notes))
+        else:
+            f_lookup = {}
+            for f_i, f_note in enumerate(self.notes):
+                f_lookup.setdefault(
+                    (f_note.start, f_note.length, f_note.note_num,
+                    f_note.velocity), f_i)
+            f_result = sorted({
+                f_lookup[f_key] for f_key in (
+                    (x.start, x.length, x.note_num, x.velocity)
+                    for x in a_notes)
+                if f_key in f_lookup})
+        if a_selected_only:
+            f_result = [x for x in f_result if self.notes[x].is_selected]
+        return numpy.array(f_result, dtype=numpy.intp)
+
     def velocity_mod(self, a_amt, a_start_beat=0.0,
                      a_end_beat=4.0, a_line=False,
                      a_end_amt=127, a_add=False, a_notes=None):
@@ -1713,224 +2256,220 @@ class pydaw_item:
 
          Modify the velocity of a range of notes
          """
-        f_notes = []
-
-        if a_notes is None:
-            f_notes = self.notes
+        f_indexes = self.get_note_indexes(a_notes)
+        if not len(f_indexes):
+            return
+        f_arr = self.get_note_array()[f_indexes]
+        f_starts = f_arr["start"]
+        f_mask = (f_starts >= a_start_beat) & (f_starts <= a_end_beat)
+        f_indexes = f_indexes[f_mask]
+        f_starts = f_starts[f_mask]
+        f_velocity = f_arr["velocity"][f_mask]
+
+        if a_line:
+            f_frac = (f_starts - a_start_beat) / (a_end_beat - a_start_beat)
+            f_value = numpy.trunc(
+                ((a_end_amt - a_amt) * f_frac) + a_amt).astype(numpy.int64)
         else:
-            for f_note in a_notes:
-                for f_note2 in self.notes:
-                    if f_note2 == f_note:
-                        f_notes.append(f_note2)
-                        break
-
-        f_range_beats = a_end_beat - a_start_beat
-
-        for note in f_notes:
-            if note.start >= a_start_beat and note.start <= a_end_beat:
-                if a_line:
-                    f_frac = ((note.start - a_start_beat)/f_range_beats)
-                    f_value = int(((a_end_amt - a_amt) * f_frac) + a_amt)
-                else:
-                    f_value = int(a_amt)
-                if a_add:
-                    note.velocity += f_value
-                else:
-                    note.velocity = f_value
-                if note.velocity > 127:
-                    note.velocity = 127
-                elif note.velocity < 1:
-                    note.velocity = 1
+            f_value = numpy.full(len(f_starts), int(a_amt), numpy.int64)
+        if a_add:
+            f_value += f_velocity
+        f_value = numpy.clip(f_value, 1, 127)
+        for f_i, f_vel in zip(f_indexes.tolist(), f_value.tolist()):
+            self.notes[f_i].velocity = f_vel
 
     def quantize(
             self, a_beat_frac, a_events_move_with_item=False,
             a_notes=None, a_selected_only=False):
-        f_notes = []
-        f_ccs = []
-        f_pbs = []
-
-        f_result = []
-
-        if a_notes is None:
-            f_notes = self.notes
-            f_ccs = self.ccs
-            f_pbs = self.pitchbends
-        else:
-            for i in range(len(a_notes)):
-                for f_note in self.notes:
-                    if f_note == a_notes[i]:
-                        if a_events_move_with_item:
-                            f_start = f_note.start
-                            f_end = f_note.start + f_note.length
-                            for f_cc in self.ccs:
-                                if f_cc.start >= f_start and \
-                                f_cc.start <= f_end:
-                                    f_ccs.append(f_cc)
-                            for f_pb in self.pitchbends:
-                                if f_pb.start >= f_start and \
-                                f_pb.start <= f_end:
-                                    f_pbs.append(f_pb)
-                        f_notes.append(f_note)
-                        break
-
+        """ Quantize the start and length of notes to a_beat_frac, returns
+            the str() of each quantized note.  CCs and pitchbends are
+            not moved, a_events_move_with_item is kept for compatibility
+        """
         f_quantized_value = bar_frac_text_to_float(a_beat_frac)
         f_quantize_multiple = 1.0 / f_quantized_value
+        f_indexes = self.get_note_indexes(a_notes, a_selected_only)
+        if not len(f_indexes):
+            self.fix_overlaps()
+            return []
+        f_arr = self.get_note_array()[f_indexes]
+        f_starts = numpy.round(numpy.round(
+            f_arr["start"] * f_quantize_multiple) * f_quantized_value, 6)
+        f_lengths = numpy.round(
+            f_arr["length"] * f_quantize_multiple) * f_quantized_value
+        f_lengths[f_lengths == 0.0] = f_quantized_value
+        f_lengths = numpy.round(f_lengths, 6)
 
-        for note in f_notes:
-            if a_selected_only and not note.is_selected:
-                continue
-            f_new_start = round(note.start *
-                f_quantize_multiple) * f_quantized_value
-            note.start = f_new_start
-            shift_adjust = note.start - f_new_start
-            f_new_length = round(note.length *
-                f_quantize_multiple) * f_quantized_value
-            if f_new_length == 0.0:
-                f_new_length = f_quantized_value
-            note.set_length(f_new_length)
-            f_result.append(str(note))
+        f_result = []
+        for f_i, f_start, f_length in zip(
+        f_indexes.tolist(), f_starts.tolist(), f_lengths.tolist()):
+            f_note = self.notes[f_i]
+            f_note.start = f_start
+            f_note.set_length(f_length)
+            f_result.append(str(f_note))
 
         self.fix_overlaps()
-
-        if a_events_move_with_item:
-            for cc in f_ccs:
-                cc.start -= shift_adjust
-            for pb in f_pbs:
-                pb.start -= shift_adjust
-
         return f_result
 
     def transpose(
             self, a_semitones, a_octave=0, a_notes=None,
             a_selected_only=False, a_duplicate=False):
         f_total = a_semitones + (a_octave * 12)
-        f_notes = []
-        f_result = []
-
-        if a_notes is None:
-            f_notes = self.notes
-        else:
-            for i in range(len(a_notes)):
-                for f_note in self.notes:
-                    if f_note == a_notes[i]:
-                        f_notes.append(f_note)
-                        break
+        f_indexes = self.get_note_indexes(a_notes, a_selected_only)
+        if not len(f_indexes):
+            return []
+        f_arr = self.get_note_array()[f_indexes]
         if a_duplicate:
-            f_duplicates = []
-        for note in f_notes:
-            if a_selected_only and not note.is_selected:
-                continue
-            if a_duplicate:
-                f_duplicates.append(pydaw_note.from_str(str(note)))
-            note.note_num += f_total
-            note.note_num = pydaw_clip_value(note.note_num, 0, 120)
-            f_result.append(str(note))
+            f_duplicates = pydaw_events_from_array(f_arr, pydaw_note)
+        f_note_nums = numpy.clip(f_arr["note_num"] + f_total, 0, 120)
+        f_result = []
+        for f_i, f_note_num in zip(f_indexes.tolist(), f_note_nums.tolist()):
+            f_note = self.notes[f_i]
+            f_note.note_num = f_note_num
+            f_result.append(str(f_note))
         if a_duplicate:
             self.notes += f_duplicates
             self.notes.sort()
         return f_result
 
     def smooth_automation_points(self, a_is_cc, a_cc_num=-1):
+        """ Fill the gaps between CCs of a_cc_num, or between pitchbends,
+            with a linear ramp of events every 1/64th note
+        """
+        f_time_inc = .0625  #1/64th note
         if a_is_cc:
-            f_this_cc_arr = []
-            f_result_arr = []
             f_cc_num = int(a_cc_num)
-            for f_cc in self.ccs:
-                if f_cc.cc_num == f_cc_num:
-                    f_new_cc = pydaw_cc(f_cc.start, f_cc_num, f_cc.cc_val)
-                    f_this_cc_arr.append(f_new_cc)
-            f_this_cc_arr.sort()
-            for f_cc1, f_cc2 in zip(f_this_cc_arr, f_this_cc_arr[1:]):
-                f_val_diff = abs(f_cc2.cc_val - f_cc1.cc_val)
-                if f_val_diff == 0:
-                    continue
-                f_time_inc = .0625  #1/64th note
-                f_start = f_cc1.start + f_time_inc
-
-                f_start_diff = f_cc2.start - f_cc1.start
-                if f_start_diff == 0.0:
-                    continue
-
-                f_inc = (f_val_diff / (f_start_diff * 16.0))
-                if (f_cc1.cc_val) > (f_cc2.cc_val):
-                    f_inc *= -1.0
-                f_new_val = f_cc1.cc_val + f_inc
-                while True:
-                    f_interpolated_cc = pydaw_cc(f_start, f_cc_num, f_new_val)
-                    f_new_val += f_inc
-                    f_result_arr.append(f_interpolated_cc)
-                    f_start += f_time_inc
-                    if f_start >= (f_cc2.start - 0.0625):
-                        break
-
-            self.ccs += f_result_arr
+            f_arr = self.get_cc_array()
+            f_arr = f_arr[f_arr["cc_num"] == f_cc_num]
+            f_arr = f_arr[numpy.argsort(f_arr["start"], kind="mergesort")]
+            f_starts, f_vals = pydaw_curve_fill(
+                f_arr["start"], f_arr["cc_val"], f_time_inc)
+            f_new = numpy.zeros(len(f_starts), dtype=CC_DTYPE)
+            f_new["start"] = f_starts
+            f_new["cc_num"] = f_cc_num
+            f_new["cc_val"] = f_vals
+            self.ccs += pydaw_events_from_array(
+                pydaw_round_fields(f_new, CC_ROUND), pydaw_cc)
             self.ccs.sort()
         else:
-            f_this_pb_arr = []
-            f_result_arr = []
-
-            for f_pb in self.pitchbends:
-                f_new_pb = pydaw_pitchbend(f_pb.start, f_pb.pb_val)
-                f_this_pb_arr.append(f_new_pb)
-
-            for f_pb1, f_pb2 in zip(f_this_pb_arr, f_this_pb_arr[1:]):
-                f_val_diff = abs(
-                    f_pb2.pb_val - f_pb1.pb_val)
-                if f_val_diff == 0.0:
-                    continue
-                f_time_inc = 0.0625
-                f_start = f_pb1.start + f_time_inc
-                f_start_diff = f_pb2.start - f_pb1.start
-                if f_start_diff == 0.0:
-                    continue
-                f_val_inc = f_val_diff / (f_start_diff * 16.0)
-                if f_pb1.pb_val > f_pb2.pb_val:
-                    f_val_inc *= -1.0
-                f_new_val = f_pb1.pb_val + f_val_inc
-
-                while True:
-                    f_interpolated_pb = pydaw_pitchbend(f_start, f_new_val)
-                    f_new_val += f_val_inc
-                    f_result_arr.append(f_interpolated_pb)
-                    f_start += f_time_inc
-                    if f_start >= (f_pb2.start - 0.0625):
-                        break
-            self.pitchbends += f_result_arr
+            f_arr = self.get_pb_array()
+            f_arr = f_arr[numpy.argsort(f_arr["start"], kind="mergesort")]
+            f_starts, f_vals = pydaw_curve_fill(
+                f_arr["start"], f_arr["pb_val"], f_time_inc)
+            f_new = numpy.zeros(len(f_starts), dtype=PB_DTYPE)
+            f_new["start"] = f_starts
+            f_new["pb_val"] = f_vals
+            self.pitchbends += pydaw_events_from_array(
+                pydaw_round_fields(f_new, PB_ROUND), pydaw_pitchbend)
             self.pitchbends.sort()
+        if AUTOMATION_SIMPLIFY_TOLERANCE > 0.0:
+            self.simplify_automation_points(a_is_cc, a_cc_num)
+
+    def simplify_automation_points(
+            self, a_is_cc, a_cc_num=-1, a_tolerance=None,
+            a_start_beat=None, a_end_beat=None):
+        """ Remove CCs of a_cc_num, or pitchbends, between a_start_beat
+            and a_end_beat whose value is within a_tolerance of the
+            previous event.  a_tolerance is in CC units (0-127) and is
+            scaled for pitchbend.  Returns the number of events removed
+        """
+        if a_tolerance is None:
+            a_tolerance = AUTOMATION_SIMPLIFY_TOLERANCE
+        f_start = float("-inf") if a_start_beat is None else a_start_beat
+        f_end = float("inf") if a_end_beat is None else a_end_beat
+        if a_is_cc:
+            f_cc_num = int(a_cc_num)
+            f_events = [
+                x for x in self.ccs if x.cc_num == f_cc_num and
+                f_start <= x.start <= f_end]
+            f_vals = [x.cc_val for x in f_events]
+        else:
+            f_events = [
+                x for x in self.pitchbends if f_start <= x.start <= f_end]
+            f_vals = [x.pb_val for x in f_events]
+            a_tolerance /= 63.5
+        f_keep = pydaw_curve_simplify_steps(f_vals, a_tolerance).tolist()
+        f_remove = {id(x) for x, k in zip(f_events, f_keep) if not k}
+        if f_remove:
+            if a_is_cc:
+                self.ccs = [x for x in self.ccs if id(x) not in f_remove]
+            else:
+                self.pitchbends = [
+                    x for x in self.pitchbends if id(x) not in f_remove]
+        return len(f_remove)
 
     def fix_overlaps(self):
         """ Truncate the lengths of any notes that overlap
             the start of another note
         """
-        f_to_delete = []
-        for f_note in self.notes:
-            if f_note not in f_to_delete:
-                for f_note2 in self.notes:
-                    if f_note != f_note2 and f_note2 not in f_to_delete:
-                        if f_note.note_num == f_note2.note_num:
-                            if f_note2.start == f_note.start:
-                                if f_note2.length == f_note.length:
-                                    f_to_delete.append(f_note2)
-                                elif f_note2.length > f_note.length:
-                                    f_note2.length = \
-                                        f_note2.length - f_note.length
-                                    f_note2.start = f_note.end
-                                    f_note2.set_end()
-                                else:
-                                    f_note.length = \
-                                        f_note.length - f_note2.length
-                                    f_note.start = f_note2.end
-                                    f_note.set_end()
-                            elif f_note2.start > f_note.start:
-                                if f_note.end > f_note2.start:
-                                    f_note.length = \
-                                        f_note2.start - f_note.start
-                                    f_note.set_end()
-        for f_note in self.notes:
-            if f_note.length < pydaw_min_note_length:
-                f_to_delete.append(f_note)
-        for f_note in f_to_delete:
-            self.notes.remove(f_note)
+        if not self.notes:
+            return
+        f_notes = self.dedupe_notes(self.notes)
+        # Compare each note with the later notes of the same pitch, that
+        # start before it ends, in the order of self.notes.  This is the
+        # same as comparing every pair of notes, as notes only ever move
+        # later or get shorter.  {note_num: sorted [(start, index)]}
+        f_starts = {}
+        for f_i, f_note in enumerate(f_notes):
+            f_starts.setdefault(f_note.note_num, []).append(
+                (f_note.start, f_i))
+        for f_list in f_starts.values():
+            f_list.sort()
+
+        def move(a_i, a_note, a_start, a_length):
+            f_list = f_starts[a_note.note_num]
+            f_list.pop(bisect.bisect_left(f_list, (a_note.start, a_i)))
+            a_note.length = a_length
+            a_note.start = a_start
+            a_note.set_end()
+            bisect.insort(f_list, (a_note.start, a_i))
+
+        f_deleted = set()
+        for f_i, f_note in enumerate(f_notes):
+            if f_i in f_deleted:
+                continue
+            f_list = f_starts[f_note.note_num]
+            if len(f_list) < 2:
+                continue
+            f_lo = bisect.bisect_left(f_list, (f_note.start, -1))
+            f_hi = bisect.bisect_right(f_list, (f_note.end, len(f_notes)))
+            for f_i2 in sorted(x[1] for x in f_list[f_lo:f_hi]):
+                f_note2 = f_notes[f_i2]
+                if f_i2 == f_i or f_i2 in f_deleted or f_note2 == f_note:
+                    continue
+                if f_note2.start == f_note.start:
+                    if f_note2.length == f_note.length:
+                        f_deleted.add(f_i2)
+                        f_list.pop(bisect.bisect_left(
+                            f_list, (f_note2.start, f_i2)))
+                    elif f_note2.length > f_note.length:
+                        # Split into consecutive notes
+                        move(f_i2, f_note2, f_note.end,
+                            f_note2.length - f_note.length)
+                    else:
+                        move(f_i, f_note, f_note2.end,
+                            f_note.length - f_note2.length)
+                elif f_note2.start > f_note.start and \
+                f_note.end > f_note2.start:
+                    f_note.length = f_note2.start - f_note.start
+                    f_note.set_end()
+        # Splitting can make a note identical to another, which the
+        # comparison above skips
+        self.notes = self.dedupe_notes(
+            x for f_i, x in enumerate(f_notes) if f_i not in f_deleted and
+            x.length >= pydaw_min_note_length)
+
+    @staticmethod
+    def dedupe_notes(a_notes):
+        """ Returns a list of a_notes without exact duplicates """
+        f_seen = set()
+        f_result = []
+        for f_note in a_notes:
+            f_key = (f_note.start, f_note.length, f_note.note_num,
+                f_note.velocity)
+            if f_key not in f_seen:
+                f_seen.add(f_key)
+                f_result.append(f_note)
+        return f_result
 
     def get_next_default_note(self):
         pass
@@ -1946,17 +2485,12 @@ class pydaw_item:
         self.ccs.remove(a_cc)
 
     def remove_cc_range(self, a_cc_num, a_start_beat=0.0, a_end_beat=4.0):
-        """ Delete all pitchbends greater than a_start_beat
+        """ Delete all CCs greater than a_start_beat
             and less than a_end_beat
         """
-        f_ccs_to_delete = []
-        for cc in self.ccs:
-            if cc.cc_num == a_cc_num and \
-            cc.start >= a_start_beat and \
-            cc.start <= a_end_beat:
-                f_ccs_to_delete.append(cc)
-        for cc in f_ccs_to_delete:
-            self.remove_cc(cc)
+        self.ccs = [
+            x for x in self.ccs if x.cc_num != a_cc_num or
+            x.start < a_start_beat or x.start > a_end_beat]
 
     #TODO:  A maximum number of events per line?
     def draw_cc_line(self, a_cc, a_start, a_start_val,
@@ -1969,18 +2503,24 @@ class pydaw_item:
         #Remove any events that would overlap
         self.remove_cc_range(f_cc, f_start, f_end)
 
-        f_start_diff = f_end - f_start
+        # One event for each step of the CC value
         f_val_diff = abs(f_end_val - f_start_val)
-        if f_start_val > f_end_val:
-            f_inc = -1
+        f_arr = numpy.zeros(f_val_diff + 1, dtype=CC_DTYPE)
+        f_arr["cc_num"] = f_cc
+        if f_val_diff:
+            f_arr["start"] = pydaw_curve_grid(
+                f_start, abs((f_end - f_start) / f_val_diff), f_val_diff + 1)
+            f_arr["cc_val"] = numpy.linspace(
+                f_start_val, f_end_val, f_val_diff + 1)
         else:
-            f_inc = 1
-        f_time_inc = abs(f_start_diff / float(f_val_diff))
-        for i in range(0, (f_val_diff + 1)):
-            self.ccs.append(pydaw_cc(f_start, f_cc, f_start_val))
-            f_start_val += f_inc
-            f_start += f_time_inc
+            f_arr["start"] = f_start
+            f_arr["cc_val"] = f_start_val
+        self.ccs += pydaw_events_from_array(
+            pydaw_round_fields(f_arr, CC_ROUND), pydaw_cc)
         self.ccs.sort()
+        if AUTOMATION_SIMPLIFY_TOLERANCE > 0.0:
+            self.simplify_automation_points(
+                True, f_cc, a_start_beat=f_start, a_end_beat=f_end)
 
     def add_pb(self, a_pb):
         if a_pb in self.pitchbends:
@@ -1996,13 +2536,9 @@ class pydaw_item:
         """ Delete all pitchbends greater than
             a_start_beat and less than a_end_beat
         """
-        f_pbs_to_delete = []
-        for pb in self.pitchbends:
-            if pb.start >= a_start_beat and \
-            pb.start <= a_end_beat:
-                f_pbs_to_delete.append(pb)
-        for pb in f_pbs_to_delete:
-            self.remove_pb(pb)
+        self.pitchbends = [
+            x for x in self.pitchbends
+            if x.start < a_start_beat or x.start > a_end_beat]
 
     def draw_pb_line(self, a_start, a_start_val, a_end, a_end_val, a_curve=0):
         f_start = float(a_start)
@@ -2012,83 +2548,130 @@ class pydaw_item:
         #Remove any events that would overlap
         self.remove_pb_range(f_start, f_end)
 
-        f_start_diff = f_end - f_start
+        # One event for every 0.025 change in the value
         f_val_diff = abs(f_end_val - f_start_val)
-        if f_start_val > f_end_val:
-            f_inc = -0.025
+        f_count = int((f_val_diff * 40) + 1)
+        f_arr = numpy.zeros(f_count, dtype=PB_DTYPE)
+        if f_val_diff:
+            f_arr["start"] = pydaw_curve_grid(
+                f_start, abs((f_end - f_start) / (f_val_diff * 40.0)),
+                f_count)
+            f_inc = -0.025 if f_start_val > f_end_val else 0.025
+            f_arr["pb_val"] = pydaw_curve_grid(f_start_val, f_inc, f_count)
         else:
-            f_inc = 0.025
-        f_time_inc = abs(f_start_diff/(float(f_val_diff) * 40.0))
-        for i in range(0, int((f_val_diff * 40) + 1)):
-            self.pitchbends.append(pydaw_pitchbend(f_start, f_start_val))
-            f_start_val += f_inc
-            f_start += f_time_inc
+            f_arr["start"] = f_start
         #Ensure that the last value is what the user wanted it to be
-        self.pitchbends[(len(self.pitchbends) - 1)].pb_val = f_end_val
+        f_arr["pb_val"][-1] = f_end_val
+        self.pitchbends += pydaw_events_from_array(
+            pydaw_round_fields(f_arr, PB_ROUND), pydaw_pitchbend)
         self.pitchbends.sort()
+        if AUTOMATION_SIMPLIFY_TOLERANCE > 0.0:
+            self.simplify_automation_points(
+                False, a_start_beat=f_start, a_end_beat=f_end)
 
     def get_next_default_cc(self):
         pass
 
+    def add_events_bulk(self, a_notes, a_ccs, a_pbs):
+        """ Equivalent to calling add_note(), add_cc() and add_pb() for
+            each event, without the per-event overlap checks and sorting
+        """
+        self.notes += a_notes
+        self.ccs += a_ccs
+        self.pitchbends += a_pbs
+        self.drop_overlapping_notes()
+        for f_name, f_dtype in (
+        ("ccs", CC_DTYPE), ("pitchbends", PB_DTYPE)):
+            f_events = getattr(self, f_name)
+            if not f_events:
+                continue
+            f_arr = pydaw_events_to_array(f_events, f_dtype)
+            f_keep = numpy.unique(f_arr, return_index=True)[1]
+            f_keep = f_keep[numpy.lexsort((f_keep, f_arr["start"][f_keep]))]
+            setattr(self, f_name, [f_events[x] for x in f_keep.tolist()])
+
+    def drop_overlapping_notes(self):
+        """ Remove notes that overlap an earlier note of the same pitch,
+            like add_note(a_check=True) rejects them, and sort the rest
+        """
+        # {note_num: ([start], [note])} of the notes kept so far, sorted
+        # by start.  Kept notes can not contain the start of another kept
+        # note, so only those at the last start before a note can
+        # contain it, and only the next start after it can be inside it
+        f_kept = {}
+        f_notes = []
+        for f_note in self.notes:
+            f_starts, f_by_start = f_kept.setdefault(
+                f_note.note_num, ([], []))
+            f_i = bisect.bisect_right(f_starts, f_note.start)
+            if f_i < len(f_starts) and f_starts[f_i] < f_note.end:
+                continue
+            f_i2 = f_i
+            while f_i2 > 0 and f_starts[f_i2 - 1] == f_starts[f_i - 1]:
+                f_i2 -= 1
+                if f_note.start < f_by_start[f_i2].end:
+                    break
+            else:
+                f_starts.insert(f_i, f_note.start)
+                f_by_start.insert(f_i, f_note)
+                f_notes.append(f_note)
+        f_notes.sort()
+        self.notes = f_notes
+
     @staticmethod
     def from_str(a_str, a_uid):
         f_result = pydaw_item(a_uid)
-        f_arr = a_str.split("\n")
-        for f_event_str in f_arr:
-            if f_event_str == pydaw_terminating_char:
-                break
+        f_parsed = pydaw_parse_item(a_str)
+        if f_parsed["uid"] is not None:
+            f_result.uid = f_parsed["uid"]
+        for f_event_arr in f_parsed["other"]:
+            if f_event_arr[0] == "a":
+                f_result.add_item(
+                    int(f_event_arr[1]),
+                    pydaw_audio_item.from_arr(f_event_arr[2:]))
+            elif f_event_arr[0] == "f":
+                f_items_arr = []
+                f_item_index = f_event_arr[1]
+                f_vals_arr = f_event_arr[2:]
+                for f_i in range(8):
+                    f_index = f_i * 4
+                    f_index_end = f_index + 4
+                    a_knob0, a_knob1, a_knob2, a_type = f_vals_arr[
+                        f_index:f_index_end]
+                    f_items_arr.append(
+                        pydaw_modulex_settings(
+                            a_knob0, a_knob1, a_knob2, a_type))
+                f_result.set_row(f_item_index, f_items_arr)
             else:
-                f_event_arr = f_event_str.split("|")
-                if f_event_arr[0] == "n":
-                    f_result.add_note(pydaw_note.from_arr(f_event_arr[1:]))
-                elif f_event_arr[0] == "c":
-                    f_result.add_cc(pydaw_cc.from_arr(f_event_arr[1:]))
-                elif f_event_arr[0] == "p":
-                    f_result.add_pb(pydaw_pitchbend.from_arr(f_event_arr[1:]))
-                elif f_event_arr[0] == "a":
-                    f_result.add_item(
-                        int(f_event_arr[1]),
-                        pydaw_audio_item.from_arr(f_event_arr[2:]))
-                elif f_event_arr[0] == "f":
-                    f_items_arr = []
-                    f_item_index = f_event_arr[1]
-                    f_vals_arr = f_event_arr[2:]
-                    for f_i in range(8):
-                        f_index = f_i * 4
-                        f_index_end = f_index + 4
-                        a_knob0, a_knob1, a_knob2, a_type = f_vals_arr[
-                            f_index:f_index_end]
-                        f_items_arr.append(
-                            pydaw_modulex_settings(
-                                a_knob0, a_knob1, a_knob2, a_type))
-                    f_result.set_row(f_item_index, f_items_arr)
-                elif f_event_arr[0] == "U":
-                    f_result.uid = int(f_event_arr[1])
-                elif f_event_arr[0] == "M":
-                    pass
-                else:
-                    print("Error: {}".format(f_event_arr))
-                    assert False, "Invalid type '{}'".format(f_event_arr[0])
+                print("Error: {}".format(f_event_arr))
+                assert False, "Invalid type '{}'".format(f_event_arr[0])
+        f_result.add_events_bulk(
+            pydaw_events_from_array(f_parsed["notes"], pydaw_note),
+            pydaw_events_from_array(f_parsed["ccs"], pydaw_cc),
+            pydaw_events_from_array(f_parsed["pbs"], pydaw_pitchbend))
         return f_result
 
     def deduplicate(self):
         len_orig = len(self.notes)
-        f_note_set = {str(x) for x in self.notes}
-        note_diff = len_orig - len(f_note_set)
+        if not len_orig:
+            return
+        f_arr = self.get_note_array()
+        # Notes are duplicates if they would be saved the same
+        for f_name in ("start", "length"):
+            f_arr[f_name] = numpy.round(f_arr[f_name], 6)
+        f_keep = numpy.unique(f_arr, return_index=True)[1]
+        note_diff = len_orig - len(f_keep)
         if note_diff:
             print("Deduplicated {} notes".format(note_diff))
-            self.notes = [pydaw_note.from_str(x) for x in f_note_set]
-            self.notes.sort()
+            self.notes = [self.notes[x] for x in sorted(f_keep.tolist())]
         # TODO:  Others
 
     def __str__(self):
         self.deduplicate()
         f_result = []
         f_result.append("U|{}".format(self.uid))
-        f_midi_count = len(self.notes) + len(self.ccs) + len(self.pitchbends)
-        f_result.append("M|{}".format(f_midi_count))
-        f_result += [str(x) for x in
-            sorted(self.notes + self.ccs + self.pitchbends)]
+        f_result += pydaw_format_item_events(
+            self.get_note_array(), self.get_cc_array(), self.get_pb_array())
         for k, f_item in list(self.items.items()):
             f_result.append("a|{}|{}".format(k, f_item))
         for k, v in self.fx_list.items():
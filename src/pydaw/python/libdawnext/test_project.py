@@ -0,0 +1,73 @@
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+The fixtures were written by the object __str__ methods as they were
+before the events were parsed and transformed as numpy arrays:
+
+items_written:  Files saved by pydaw_item, with notes that end exactly
+                where the next note of the same pitch starts
+items_raw:      [file, what pydaw_item.from_str() made of it], files
+                with duplicate and overlapping notes
+fix_overlaps:   [notes, the str() of each note after fix_overlaps()]
+sequencers:     Files saved by pydaw_sequencer
+automation:     Files saved by pydaw_atm_region
+"""
+
+import json
+import os
+
+from libdawnext.project import (
+    pydaw_atm_region, pydaw_item, pydaw_sequencer)
+from libmk.mk_project import pydaw_note
+
+with open(os.path.join(
+os.path.dirname(__file__), "test_project_fixtures.json")) as f_file:
+    FIXTURES = json.load(f_file)
+
+
+def test_item_round_trip():
+    for f_uid, f_text in enumerate(FIXTURES["items_written"]):
+        assert str(pydaw_item.from_str(f_text, f_uid)) == f_text
+
+def test_item_from_str():
+    for f_uid, (f_text, f_expected) in enumerate(FIXTURES["items_raw"]):
+        assert str(pydaw_item.from_str(f_text, f_uid)) == f_expected
+
+def test_abutting_notes():
+    f_text = "\n".join((
+        "U|0", "M|2", "n|4.199734|3.410115|36|77",
+        "n|7.609849|2.598062|36|77", "\\"))
+    assert str(pydaw_item.from_str(f_text, 0)) == f_text
+
+def test_fix_overlaps():
+    for f_notes, f_expected in FIXTURES["fix_overlaps"]:
+        f_item = pydaw_item(0)
+        f_item.notes = [pydaw_note(*x.split("|")) for x in f_notes]
+        f_item.fix_overlaps()
+        f_result = [str(x) for x in f_item.notes]
+        assert sorted(f_result) == f_expected
+        for f_note in f_item.notes:
+            assert not any(
+                x is not f_note and x.overlaps(f_note)
+                for x in f_item.notes)
+
+def test_sequencer_round_trip():
+    for f_text in FIXTURES["sequencers"]:
+        f_sequencer = pydaw_sequencer.from_str(f_text)
+        assert str(f_sequencer) == f_text
+        for f_item in f_sequencer.items:
+            assert f_item.owner is f_sequencer
+            assert not f_item.modified
+
+def test_automation_round_trip():
+    for f_text in FIXTURES["automation"]:
+        assert str(pydaw_atm_region.from_str(f_text)) == f_text
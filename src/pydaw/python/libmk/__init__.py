@@ -13,7 +13,9 @@ GNU General Public License for more details.
 """
 
 import ast
+import collections
 import datetime
+import itertools
 import os
 import traceback
 
@@ -22,6 +24,7 @@ from libpydaw import pydaw_util
 if pydaw_util.IS_LINUX and not pydaw_util.IS_ENGINE_LIB:
     from libpydaw import liblo
 
+from PyQt5 import QtCore
 from PyQt5.QtGui import *
 from PyQt5.QtWidgets import *
 
@@ -47,6 +50,16 @@ PROJECT = None
 PLUGIN_UI_DICT = None
 CURRENT_HOST = 0
 TOOLTIPS_ENABLED = pydaw_util.get_file_setting("tooltips", int, 1)
+# Control changes queued with AbstractIPC.send_configure_coalesced() are
+# sent at most this often, only the last value for each control is sent.
+# 0 sends every value immediately
+IPC_COALESCE_MS = pydaw_util.get_file_setting("ipc_coalesce_ms", int, 15)
+# Send the queue immediately once this many different controls are queued
+IPC_COALESCE_MAX = pydaw_util.get_file_setting("ipc_coalesce_max", int, 64)
+# The coalesced messages of every AbstractIPC instance, shared so that they
+# are all sent before any instance sends another message
+SEND_QUEUE = collections.OrderedDict()
+SEND_TIMER = None
 MEMORY_ENTROPY = datetime.timedelta(minutes=0)
 MEMORY_ENTROPY_LIMIT = datetime.timedelta(minutes=30)
 MEMORY_ENTROPY_UIDS = set()
@@ -130,6 +143,23 @@ def pydaw_print_generic_exception(a_ex):
         MAIN_WINDOW, _("Warning"),
         _("The following error happened:\n{}").format(a_ex))
 
+def flush_send_queue():
+    """ Send the queued coalesced messages in the order of their last
+        update, consecutive messages to the same AbstractIPC in one batch
+    """
+    if SEND_TIMER is not None:
+        SEND_TIMER.stop()
+    if not SEND_QUEUE:
+        return
+    f_messages = list(SEND_QUEUE.values())
+    SEND_QUEUE.clear()
+    for f_ipc, f_group in itertools.groupby(f_messages, lambda x: x[0]):
+        f_group = [x[1:] for x in f_group]
+        if len(f_group) > 1:
+            f_ipc.send_configure_many(f_group)
+        else:
+            f_ipc.send_configure_now(*f_group[0])
+
 class AbstractIPC:
     """ Abstract class containing the minimum contract
         to run MK Plugins for host communication to the
@@ -146,6 +176,39 @@ class AbstractIPC:
             self.configure_path = a_configure_path
 
     def send_configure(self, key, value):
+        flush_send_queue()
+        self.send_configure_now(key, value)
+
+    def send_configure_coalesced(self, key, a_id, value):
+        """ Queue a configure message that replaces any queued message
+            with the same key and a_id, for controls that can change
+            faster than the engine needs to hear about it.  The queue is
+            sent every IPC_COALESCE_MS, when IPC_COALESCE_MAX different
+            controls are queued, or before any instance sends any other
+            message.  Messages are sent in the order of their last update.
+
+            @a_id:  Any hashable that identifies the control, for example
+                    (plugin_uid, port)
+        """
+        global SEND_TIMER
+        if IPC_COALESCE_MS <= 0:
+            self.send_configure(key, value)
+            return
+        f_key = (id(self), key, a_id)
+        if f_key in SEND_QUEUE:
+            SEND_QUEUE.move_to_end(f_key)
+        SEND_QUEUE[f_key] = (self, key, value)
+        if len(SEND_QUEUE) >= IPC_COALESCE_MAX:
+            flush_send_queue()
+        else:
+            if SEND_TIMER is None:
+                SEND_TIMER = QtCore.QTimer()
+                SEND_TIMER.setSingleShot(True)
+                SEND_TIMER.timeout.connect(flush_send_queue)
+            if not SEND_TIMER.isActive():
+                SEND_TIMER.start(IPC_COALESCE_MS)
+
+    def send_configure_now(self, key, value):
         if not IPC_ENABLED and key != "exit":
             print("IPC_ENABLED == False, "
                 "Would've sent configure message: key: \""
@@ -160,6 +223,27 @@ class AbstractIPC:
                 "Would've sent configure message: key: \""
                 "{}\" value: \"{}\"".format(key, value))
 
+    def send_configure_many(self, a_messages):
+        """ Send a list of (key, value) or (key, value, data) tuples.
+            data is the text of the project file that the message tells
+            the engine to reload.  When the engine is running as a shared
+            library, everything is sent in one binary buffer and the
+            engine parses data instead of reading the file back from
+            disk, otherwise this is the same as calling send_configure()
+            for each message
+        """
+        flush_send_queue()
+        if IPC_ENABLED and pydaw_util.IS_ENGINE_LIB and \
+        pydaw_util.ENGINE_LIB_BULK:
+            f_failed = pydaw_util.engine_lib_configure_bulk(
+                self.configure_path, a_messages)
+            if f_failed:
+                print("The engine did not handle {} of {} configure "
+                    "messages".format(f_failed, len(a_messages)))
+        else:
+            for f_message in a_messages:
+                self.send_configure_now(f_message[0], f_message[1])
+
 
 class AbstractProject:
     """ Abstract class containing the minimum contract
@@ -21,11 +21,20 @@ from libpydaw.pydaw_util import *
 import libmk
 import collections
 import shutil
-import tarfile
+from libpydaw.pydaw_codec import NOTE_DTYPE, CC_DTYPE, PB_DTYPE
+from libpydaw import pydaw_resample
+from libpydaw.pydaw_stretch_cache import (
+    pydaw_stretch_cache, pydaw_stretch_tool_version)
+from libpydaw.pydaw_snapshots import (
+    pydaw_snapshot_store, SnapshotCancelled, SNAPSHOT_EXT)
 import json
 import datetime
+import heapq
+import itertools
 import os
+import struct
 import numpy
+import operator
 
 pydaw_folder_audio = os.path.join("audio", "files")
 pydaw_folder_audio_rec = os.path.join("audio", "rec")
@@ -43,11 +52,252 @@ pydaw_file_pystretch = os.path.join("audio", "stretch.txt")
 pydaw_file_pystretch_map = os.path.join("audio", "stretch_map.txt")
 pydaw_file_backups = "backups.json"
 
+# One of pydaw_snapshots.SNAPSHOT_CODECS
+BACKUP_CODEC = get_file_setting("backup_codec", str, "fast")
+# The maximum number of time-stretch processes to run at once, 0 to use
+# the number of CPUs
+TIMESTRETCH_MAX_JOBS = get_file_setting("timestretch_max_jobs", int, 0)
+
+# The size of the time-stretch cache shared by all projects, 0 to disable
+TIMESTRETCH_CACHE_MAX_MB = get_file_setting(
+    "timestretch_cache_max_mb", int, 4096)
+TIMESTRETCH_CACHE_DIR = os.path.join(global_pydaw_home, "timestretch_cache")
+
+# Time-stretch jobs with a higher priority are started first
+TIMESTRETCH_PRIORITY_BACKGROUND = 0
+TIMESTRETCH_PRIORITY_VISIBLE = 1
+
+
+class BackupThread(QtCore.QThread):
+    """ Creates a project snapshot without blocking the UI thread, the
+        backup history is updated by MkProject when it finishes
+    """
+    progress = QtCore.pyqtSignal(str, int, int)
+
+    def __init__(self, a_project, a_name, a_parent):
+        QtCore.QThread.__init__(self)
+        self.project = a_project
+        self.name = a_name
+        self.parent = a_parent
+        self.error = None
+        self.cancelled = False
+        self.percent = -1
+
+    def cancel(self):
+        self.cancelled = True
+
+    def on_progress(self, a_done, a_total):
+        f_percent = (a_done * 100) // a_total
+        if f_percent != self.percent:
+            self.percent = f_percent
+            self.progress.emit(self.name, a_done, a_total)
+
+    def run(self):
+        try:
+            f_store = pydaw_snapshot_store(
+                self.project.backups_folder, BACKUP_CODEC)
+            f_store.create(
+                self.name, self.project.project_folder,
+                os.path.basename(self.project.projects_folder),
+                self.parent, self.on_progress, lambda: self.cancelled)
+            # Backups are only ever created by this thread, so this is the
+            # one place where no blob can be stored but not yet referenced.
+            # Reclaims the blobs of snapshots that the user deleted
+            if f_store.gc_needed():
+                f_store.gc()
+        except SnapshotCancelled:
+            self.error = "cancelled"
+        except Exception as ex:
+            self.error = str(ex)
+
+
+class TimestretchJob:
+    """ A time-stretch process queued in a TimestretchScheduler """
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(
+            self, a_scheduler, a_key, a_cmd, a_dest_path, a_uid, a_priority):
+        self.scheduler = a_scheduler
+        self.key = a_key
+        self.cmd = a_cmd
+        self.dest_path = a_dest_path
+        self.uid = a_uid
+        self.priority = a_priority
+        self.status = self.QUEUED
+        self.proc = None
+        self.returncode = None
+        self.start_time = None
+        self.end_time = None
+        self.callbacks = []
+
+    def is_done(self):
+        return self.status in (self.FINISHED, self.FAILED, self.CANCELLED)
+
+    def cancel(self):
+        self.scheduler.cancel(self.key)
+
+    def get_status(self):
+        """ Returns (status, seconds running), the time-stretch tools
+            don't report their progress
+        """
+        if self.start_time is None:
+            f_elapsed = 0.0
+        elif self.end_time is None:
+            f_elapsed = time.time() - self.start_time
+        else:
+            f_elapsed = self.end_time - self.start_time
+        return self.status, round(f_elapsed, 3)
+
+
+class TimestretchScheduler(QtCore.QObject):
+    """ Runs time-stretch processes, at most max_jobs at once.  Requests
+        for a key that is already queued or running share the same job,
+        queued jobs are started in order of priority, then submission.
+        Jobs are polled on the UI thread, callbacks and job_finished are
+        called there with the finished TimestretchJob
+    """
+    job_finished = QtCore.pyqtSignal(object)
+    POLL_MS = 100
+
+    def __init__(self, a_max_jobs=TIMESTRETCH_MAX_JOBS):
+        QtCore.QObject.__init__(self)
+        self.max_jobs = a_max_jobs if a_max_jobs > 0 else \
+            multiprocessing.cpu_count()
+        # key: job, for jobs that are queued or running
+        self.jobs = {}
+        # (-priority, sequence, job), may contain stale entries for jobs
+        # that were re-prioritized or cancelled
+        self.queue = []
+        self.running = []
+        self.sequence = itertools.count()
+        self.timer = None
+
+    def submit(
+            self, a_key, a_cmd, a_dest_path, a_uid,
+            a_priority=TIMESTRETCH_PRIORITY_BACKGROUND, a_callback=None):
+        """ Queue a_cmd to create a_dest_path, or return the existing job
+            for a_key if it is still queued or running
+
+            @a_callback:  callable(TimestretchJob) when the job is done
+        """
+        if a_key in self.jobs:
+            f_job = self.jobs[a_key]
+            self.set_priority(a_key, a_priority)
+        else:
+            f_job = TimestretchJob(
+                self, a_key, a_cmd, a_dest_path, a_uid, a_priority)
+            self.jobs[a_key] = f_job
+            heapq.heappush(
+                self.queue, (-a_priority, next(self.sequence), f_job))
+        if a_callback:
+            f_job.callbacks.append(a_callback)
+        self.poll()
+        if self.timer is None:
+            self.timer = QtCore.QTimer(self)
+            self.timer.timeout.connect(self.poll)
+        if not self.timer.isActive() and self.jobs:
+            self.timer.start(self.POLL_MS)
+        return f_job
+
+    def get_job(self, a_key):
+        """ Returns the job for a_key if it is queued or running """
+        return self.jobs.get(a_key)
+
+    def get_uids(self):
+        """ The wav pool uids of the files being created by queued or
+            running jobs, they are added to the pool when the job is
+            finished
+        """
+        return {x.uid for x in self.jobs.values()}
+
+    def get_status(self, a_key):
+        """ Returns (status, seconds running) of a queued or running job,
+            or None
+        """
+        if a_key in self.jobs:
+            return self.jobs[a_key].get_status()
+        return None
+
+    def set_priority(self, a_key, a_priority):
+        """ Raise the priority of a queued job, for example when it's
+            audio item becomes visible in an editor
+        """
+        f_job = self.jobs.get(a_key)
+        if f_job and f_job.status == f_job.QUEUED and \
+        a_priority > f_job.priority:
+            f_job.priority = a_priority
+            heapq.heappush(
+                self.queue, (-a_priority, next(self.sequence), f_job))
+
+    def cancel(self, a_key):
+        f_job = self.jobs.get(a_key)
+        if not f_job:
+            return
+        if f_job.status == f_job.RUNNING:
+            f_job.proc.kill()
+            f_job.proc.wait()
+            f_job.returncode = f_job.proc.returncode
+            self.running.remove(f_job)
+            if os.path.isfile(f_job.dest_path):
+                os.remove(f_job.dest_path)
+        self.finish(f_job, f_job.CANCELLED)
+
+    def cancel_all(self):
+        for f_key in list(self.jobs):
+            self.cancel(f_key)
+
+    def finish(self, a_job, a_status):
+        a_job.status = a_status
+        a_job.end_time = time.time()
+        self.jobs.pop(a_job.key, None)
+        for f_callback in a_job.callbacks:
+            f_callback(a_job)
+        self.job_finished.emit(a_job)
+
+    def start(self, a_job):
+        print("Running {}".format(" ".join(a_job.cmd)))
+        a_job.start_time = time.time()
+        try:
+            a_job.proc = subprocess.Popen(a_job.cmd)
+        except OSError as ex:
+            print("Error running {}: {}".format(a_job.cmd[0], ex))
+            self.finish(a_job, a_job.FAILED)
+            return
+        a_job.status = a_job.RUNNING
+        self.running.append(a_job)
+
+    def poll(self):
+        for f_job in list(self.running):
+            f_returncode = f_job.proc.poll()
+            if f_returncode is not None:
+                f_job.returncode = f_returncode
+                self.running.remove(f_job)
+                self.finish(
+                    f_job, f_job.FINISHED if f_returncode == 0 else
+                    f_job.FAILED)
+        while self.queue and len(self.running) < self.max_jobs:
+            f_priority, f_seq, f_job = heapq.heappop(self.queue)
+            if f_job.status == f_job.QUEUED and \
+            -f_priority == f_job.priority:
+                self.start(f_job)
+        if not self.jobs and self.timer:
+            self.timer.stop()
+
 
 class MkProject(libmk.AbstractProject):
     def __init__(self):
-        self.cached_audio_files = []
+        self.timestretch_scheduler = TimestretchScheduler()
+        self.stretch_cache = pydaw_stretch_cache(
+            TIMESTRETCH_CACHE_DIR, TIMESTRETCH_CACHE_MAX_MB * 1024 * 1024)
+        self.cached_audio_files = set()
         self.glued_name_index = 0
+        self.backup_queue = collections.deque()
+        self.backup_thread = None
+        self.clear_wav_pool_cache()
 
     def set_project_folders(self, a_project_file):
         #folders
@@ -96,6 +346,7 @@ class MkProject(libmk.AbstractProject):
             self.audio_rec_folder]
 
         pydaw_clear_sample_graph_cache()
+        self.clear_wav_pool_cache()
 
     def open_project(self, a_project_file, a_notify_osc=True):
         self.set_project_folders(a_project_file)
@@ -194,18 +445,72 @@ class MkProject(libmk.AbstractProject):
         print("New f_history:  {}".format(f_history))
         self.save_backups_history(f_history)
 
-    def create_backup(self, a_name=None):
+    def create_backup(self, a_name=None, a_wait=False):
+        """ Queue a snapshot of the project to be created in the background
+            @a_name:  The backup name, or None to use the current time
+            @a_wait:  Block until all queued backups have finished
+            Returns False if a backup called a_name already exists
+        """
         self.fix_backup_names()
         f_backup_name = a_name if a_name else \
-            datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.tar.bz2")
+            datetime.datetime.now().strftime(
+                "%Y-%m-%d_%H-%M-%S" + SNAPSHOT_EXT)
         f_file_path = os.path.join(self.backups_folder, f_backup_name)
-        if os.path.exists(f_file_path):
+        if os.path.exists(f_file_path) or \
+        f_backup_name in self.backup_queue or \
+        (self.backup_thread and self.backup_thread.name == f_backup_name):
             print("create_backup:  '{}' exists".format(f_file_path))
             return False
-        with tarfile.open(f_file_path, "w:bz2") as f_tar:
-            f_tar.add(
-                self.projects_folder,
-                arcname=os.path.basename(self.projects_folder))
+        self.backup_queue.append(f_backup_name)
+        if a_wait:
+            self.wait_for_backups()
+        elif not self.backup_thread:
+            self.start_next_backup()
+        return True
+
+    def start_next_backup(self):
+        if self.backup_thread or not self.backup_queue:
+            return
+        f_history = self.get_backups_history()
+        f_parent = f_history["CURRENT"].split("/")[-1] \
+            if f_history and f_history.get("CURRENT") else None
+        f_thread = BackupThread(self, self.backup_queue.popleft(), f_parent)
+        f_thread.progress.connect(self.on_backup_progress)
+        f_thread.finished.connect(
+            lambda: self.on_backup_finished(f_thread))
+        self.backup_thread = f_thread
+        f_thread.start()
+
+    def on_backup_progress(self, a_name, a_done, a_total):
+        if libmk.MAIN_WINDOW:
+            libmk.MAIN_WINDOW.on_backup_progress(a_name, a_done, a_total)
+
+    def on_backup_finished(self, a_thread):
+        if a_thread is not self.backup_thread:
+            return
+        self.backup_thread = None
+        if a_thread.error:
+            print("ERROR:  create_backup('{}') failed: {}".format(
+                a_thread.name, a_thread.error))
+        else:
+            self.add_backup_to_history(a_thread.name)
+        self.on_backup_progress(a_thread.name, 0, 0)
+        self.start_next_backup()
+
+    def cancel_backups(self):
+        self.backup_queue.clear()
+        if self.backup_thread:
+            self.backup_thread.cancel()
+
+    def wait_for_backups(self):
+        """ Run all queued backups to completion, blocking the caller """
+        while self.backup_thread or self.backup_queue:
+            self.start_next_backup()
+            f_thread = self.backup_thread
+            f_thread.wait()
+            self.on_backup_finished(f_thread)
+
+    def add_backup_to_history(self, a_backup_name):
         f_history = self.get_backups_history()
         if f_history:
             try:
@@ -213,19 +518,18 @@ class MkProject(libmk.AbstractProject):
                 for f_name in (
                 x for x in f_history["CURRENT"].split("/") if x):
                     f_node = f_node[f_name]
-                f_node[f_backup_name] = {}
+                f_node[a_backup_name] = {}
                 f_history["CURRENT"] = "/".join(
-                    [f_history["CURRENT"], f_backup_name])
+                    [f_history["CURRENT"], a_backup_name])
                 self.save_backups_history(f_history)
             except Exception as ex:
                 print("ERROR:  create_backup() failed {}".format(ex))
                 print("Resetting project history")
                 self.save_backups_history(
-                    {"NODES":{f_backup_name:{}}, "CURRENT":f_backup_name})
+                    {"NODES":{a_backup_name:{}}, "CURRENT":a_backup_name})
         else:
             self.save_backups_history(
-                {"NODES":{f_backup_name:{}}, "CURRENT":f_backup_name})
-        return True
+                {"NODES":{a_backup_name:{}}, "CURRENT":a_backup_name})
 
     def get_backups_history(self):
         if os.path.exists(self.backups_file):
@@ -241,7 +545,7 @@ class MkProject(libmk.AbstractProject):
                 separators=(',', ': '))
 
     def show_project_history(self):
-        self.create_backup()
+        self.create_backup(a_wait=True)
         f_file = os.path.join(self.project_folder, "default.musikernel")
         subprocess.Popen([PYTHON3, PROJECT_HISTORY_SCRIPT, f_file])
 
@@ -263,12 +567,12 @@ class MkProject(libmk.AbstractProject):
         for f_line in f_cache_text.split("\n"):
             if f_line == pydaw_terminating_char:
                 break
-            f_line_arr = f_line.split("|", 5)
-            f_file_path_and_uid = f_line_arr[5].split("|||")
+            f_line_arr = f_line.split("|", 6)
+            f_file_path_and_uid = f_line_arr[6].split("|||")
             self.timestretch_cache[
                 (int(f_line_arr[0]), float(f_line_arr[1]),
                 float(f_line_arr[2]), float(f_line_arr[3]),
-                float(f_line_arr[4]),
+                float(f_line_arr[4]), float(f_line_arr[5]),
                 f_file_path_and_uid[0])] = int(f_file_path_and_uid[1])
 
         f_map_text = pydaw_read_file_text(self.pystretch_map_file)
@@ -293,18 +597,42 @@ class MkProject(libmk.AbstractProject):
         f_map_text += pydaw_terminating_char
         self.save_file("", pydaw_file_pystretch_map, f_map_text)
 
-    def get_wavs_dict(self):
+    def clear_wav_pool_cache(self):
+        self.wav_pool = None
+        self.wav_pool_stat = None
+
+    def _get_wav_pool_stat(self):
         try:
-            f_file = open(self.pywavs_file, "r")
-        except:
+            f_stat = os.stat(self.pywavs_file)
+        except OSError:
+            return None
+        return (f_stat.st_mtime_ns, f_stat.st_ino, f_stat.st_size)
+
+    def get_wavs_dict(self):
+        """ Return the wav pool.  This is the project's in-memory copy,
+            the file is only re-read if it was modified by something other
+            than save_wavs_dict().  Callers that modify it must call
+            save_wavs_dict()
+        """
+        f_stat = self._get_wav_pool_stat()
+        if f_stat is None:
+            self.clear_wav_pool_cache()
             return pydaw_name_uid_dict()
-        f_str = f_file.read()
-        f_file.close()
-        return pydaw_name_uid_dict.from_str(f_str)
+        if self.wav_pool is None or f_stat != self.wav_pool_stat:
+            try:
+                with open(self.pywavs_file, "r") as f_file:
+                    f_str = f_file.read()
+            except:
+                return pydaw_name_uid_dict()
+            self.wav_pool = pydaw_name_uid_dict.from_str(f_str)
+            self.wav_pool_stat = f_stat
+        return self.wav_pool
 
     def save_wavs_dict(self, a_uid_dict):
         pydaw_write_file_text(self.pywavs_file, str(a_uid_dict))
         #self.save_file("", pydaw_file_pywavs, str(a_uid_dict))
+        self.wav_pool = a_uid_dict
+        self.wav_pool_stat = self._get_wav_pool_stat()
 
 
     def timestretch_lookup_orig_path(self, a_path):
@@ -313,18 +641,84 @@ class MkProject(libmk.AbstractProject):
         else:
             return a_path
 
-    def timestretch_audio_item(self, a_audio_item):
-        """ Return path, uid for a time-stretched
-            audio item and update all project files,
-            or None if the UID already exists in the cache
+    def timestretch_cache_key(self, a_key):
+        """ Return the key in the shared time-stretch cache for
+            timestretch_cache key a_key, or None if the cache is disabled
+            or the source file does not exist
         """
-        a_audio_item.timestretch_amt = round(
-            a_audio_item.timestretch_amt, 6)
-        a_audio_item.pitch_shift = round(a_audio_item.pitch_shift, 6)
-        a_audio_item.timestretch_amt_end = round(
-            a_audio_item.timestretch_amt_end, 6)
-        a_audio_item.pitch_shift_end = round(a_audio_item.pitch_shift_end, 6)
+        if TIMESTRETCH_CACHE_MAX_MB <= 0:
+            return None
+        f_mode = a_key[0]
+        if f_mode in (1, 2) and pydaw_resample.wavefile:
+            f_tool = "pydaw_resample:{}".format(
+                pydaw_resample.RESAMPLE_VERSION)
+        elif f_mode in (1, 2):
+            f_tool = pydaw_stretch_tool_version(
+                pydaw_util.BIN_PATH, global_pydaw_version_string)
+        elif f_mode in (3, 4):
+            f_tool = pydaw_stretch_tool_version(
+                pydaw_rubberband_util, "rubberband")
+        elif f_mode == 5:
+            f_tool = pydaw_stretch_tool_version(pydaw_sbsms_util, "sbsms")
+        else:
+            f_tool = pydaw_stretch_tool_version(
+                pydaw_paulstretch_util, "paulstretch")
+        try:
+            return self.stretch_cache.make_key(a_key[-1], a_key[:-1], f_tool)
+        except OSError as ex:
+            print("Error hashing {}: {}".format(a_key[-1], ex))
+            return None
+
+    def timestretch_cache_lookup(self, a_key, a_dest_path):
+        """ Copy a_dest_path from the shared time-stretch cache, returns
+            True if it was found
+        """
+        f_cache_key = self.timestretch_cache_key(a_key)
+        if f_cache_key is None:
+            return False
+        try:
+            return self.stretch_cache.lookup(f_cache_key, a_dest_path)
+        except OSError as ex:
+            print("Error reading the time-stretch cache: {}".format(ex))
+            return False
 
+    def timestretch_cache_store(self, a_key, a_path):
+        """ Add rendered file a_path to the shared time-stretch cache """
+        if not os.path.isfile(a_path):
+            return
+        f_cache_key = self.timestretch_cache_key(a_key)
+        if f_cache_key is None:
+            return
+        try:
+            self.stretch_cache.store(f_cache_key, a_path)
+        except OSError as ex:
+            print("Error writing the time-stretch cache: {}".format(ex))
+
+    def on_timestretch_job_finished(self, a_job):
+        """ Add the file to the wav pool, or if the job failed or was
+            cancelled, forget the stretch so that it is submitted again
+            the next time it is requested
+        """
+        if a_job.status == a_job.FINISHED and \
+        os.path.isfile(a_job.dest_path):
+            self.get_wav_uid_by_name(a_job.dest_path, a_uid=a_job.uid)
+            self.timestretch_cache_store(a_job.key, a_job.dest_path)
+            return
+        print("Time-stretching {} {}".format(a_job.dest_path, a_job.status))
+        if self.timestretch_cache.get(a_job.key) == a_job.uid:
+            self.timestretch_cache.pop(a_job.key)
+        self.timestretch_reverse_lookup.pop(a_job.dest_path, None)
+        f_wavs_dict = self.get_wavs_dict()
+        if f_wavs_dict.uid_exists(a_job.uid):
+            f_name = f_wavs_dict.name_lookup.pop(a_job.uid)
+            f_wavs_dict.uid_lookup.pop(f_name, None)
+            self.save_wavs_dict(f_wavs_dict)
+        self.save_stretch_dicts()
+
+    def timestretch_key(self, a_audio_item):
+        """ Return the timestretch_cache key of a_audio_item, or None if
+            it is not stretched or shifted
+        """
         f_src_path = self.get_wav_name_by_uid(a_audio_item.uid)
         if f_src_path in self.timestretch_reverse_lookup:
             f_src_path = self.timestretch_reverse_lookup[f_src_path]
@@ -339,32 +733,88 @@ class MkProject(libmk.AbstractProject):
             a_audio_item.timestretch_amt == a_audio_item.timestretch_amt_end):
                 #Don't process if the file is not being stretched/shifted yet
                 return None
-        f_key = (a_audio_item.time_stretch_mode, a_audio_item.timestretch_amt,
-                 a_audio_item.pitch_shift, a_audio_item.timestretch_amt_end,
-                 a_audio_item.pitch_shift_end, a_audio_item.crispness,
-                 f_src_path)
+        return (a_audio_item.time_stretch_mode, a_audio_item.timestretch_amt,
+                a_audio_item.pitch_shift, a_audio_item.timestretch_amt_end,
+                a_audio_item.pitch_shift_end, a_audio_item.crispness,
+                f_src_path)
+
+    def timestretch_audio_item(
+            self, a_audio_item, a_priority=TIMESTRETCH_PRIORITY_BACKGROUND):
+        """ Return path, uid, TimestretchJob for a time-stretched
+            audio item and update all project files,
+            or None if the UID already exists in the cache and is not
+            still being created.  a_audio_item keeps it's current uid
+            until the job is finished, the caller should use the new uid
+            when the scheduler's job_finished is emitted for it
+        """
+        a_audio_item.timestretch_amt = round(
+            a_audio_item.timestretch_amt, 6)
+        a_audio_item.pitch_shift = round(a_audio_item.pitch_shift, 6)
+        a_audio_item.timestretch_amt_end = round(
+            a_audio_item.timestretch_amt_end, 6)
+        a_audio_item.pitch_shift_end = round(a_audio_item.pitch_shift_end, 6)
+
+        f_key = self.timestretch_key(a_audio_item)
+        if f_key is None:
+            return None
+        f_src_path = f_key[-1]
         if f_key in self.timestretch_cache:
+            f_job = self.timestretch_scheduler.get_job(f_key)
+            if f_job is not None:
+                self.timestretch_scheduler.set_priority(f_key, a_priority)
+                return f_job.dest_path, f_job.uid, f_job
             a_audio_item.uid = self.timestretch_cache[f_key]
+            f_dest_path = os.path.join(
+                self.timestretch_folder, "{}.wav".format(a_audio_item.uid))
+            if not os.path.isfile(f_dest_path) and \
+            self.timestretch_cache_lookup(f_key, f_dest_path):
+                print("Restored {} from the time-stretch cache".format(
+                    f_dest_path))
             return None
         else:
             f_wavs_dict = self.get_wavs_dict()
-            f_uid = f_wavs_dict.gen_file_name_uid()
+            f_uid = f_wavs_dict.gen_file_name_uid(
+                self.timestretch_scheduler.get_uids())
             f_dest_path = os.path.join(
                 self.timestretch_folder, "{}.wav".format(f_uid))
 
+            if self.timestretch_cache_lookup(f_key, f_dest_path):
+                self.timestretch_cache[f_key] = f_uid
+                self.timestretch_reverse_lookup[f_dest_path] = f_src_path
+                a_audio_item.uid = f_uid
+                self.get_wav_uid_by_name(f_dest_path, a_uid=f_uid)
+                return None
+
             f_cmd = None
+            # Modes 1 and 2 are rendered in this process if libsndfile
+            # can be loaded, otherwise by the engine
             if a_audio_item.time_stretch_mode == 1:
-                libmk.IPC.pydaw_pitch_env(
-                    f_src_path, f_dest_path, a_audio_item.pitch_shift,
-                    a_audio_item.pitch_shift_end)
+                if pydaw_resample.wavefile:
+                    pydaw_resample.pydaw_pitch_envelope(
+                        f_src_path, f_dest_path, a_audio_item.pitch_shift,
+                        a_audio_item.pitch_shift_end)
+                else:
+                    libmk.IPC.pydaw_pitch_env(
+                        f_src_path, f_dest_path, a_audio_item.pitch_shift,
+                        a_audio_item.pitch_shift_end)
                 #add it to the pool
                 self.get_wav_uid_by_name(f_dest_path, a_uid=f_uid)
             elif a_audio_item.time_stretch_mode == 2:
-                libmk.IPC.pydaw_rate_env(
-                    f_src_path, f_dest_path, a_audio_item.timestretch_amt,
-                    a_audio_item.timestretch_amt_end)
+                if pydaw_resample.wavefile:
+                    pydaw_resample.pydaw_rate_envelope(
+                        f_src_path, f_dest_path,
+                        a_audio_item.timestretch_amt,
+                        a_audio_item.timestretch_amt_end)
+                else:
+                    libmk.IPC.pydaw_rate_env(
+                        f_src_path, f_dest_path,
+                        a_audio_item.timestretch_amt,
+                        a_audio_item.timestretch_amt_end)
                 #add it to the pool
                 self.get_wav_uid_by_name(f_dest_path, a_uid=f_uid)
+            if a_audio_item.time_stretch_mode in (1, 2):
+                # Both render before returning
+                self.timestretch_cache_store(f_key, f_dest_path)
             elif a_audio_item.time_stretch_mode == 3:
                 f_cmd = [
                     pydaw_rubberband_util, "-c", str(a_audio_item.crispness),
@@ -403,13 +853,14 @@ class MkProject(libmk.AbstractProject):
 
             self.timestretch_cache[f_key] = f_uid
             self.timestretch_reverse_lookup[f_dest_path] = f_src_path
-            a_audio_item.uid = self.timestretch_cache[f_key]
 
             if f_cmd is not None:
-                print("Running {}".format(" ".join(f_cmd)))
-                f_proc = subprocess.Popen(f_cmd)
-                return f_dest_path, f_uid, f_proc
+                f_job = self.timestretch_scheduler.submit(
+                    f_key, f_cmd, f_dest_path, f_uid, a_priority,
+                    self.on_timestretch_job_finished)
+                return f_dest_path, f_uid, f_job
             else:
+                a_audio_item.uid = f_uid
                 return None
 
     def timestretch_get_orig_file_uid(self, a_uid):
@@ -495,7 +946,7 @@ class MkProject(libmk.AbstractProject):
             os.makedirs(f_cp_dir)
         if not os.path.isfile(f_cp_path):
             shutil.copy(a_file, f_cp_path)
-        self.cached_audio_files.append(a_file)
+        self.cached_audio_files.add(a_file)
 
     def get_wav_name_by_uid(self, a_uid, a_uid_dict=None):
         """ Return the UID from the wav pool, or add to the
@@ -661,6 +1112,41 @@ class pydaw_pitchbend(pydaw_abstract_midi_event):
     def clone(self):
         return pydaw_pitchbend.from_str(str(self))
 
+# Structured array forms of pydaw_note, pydaw_cc and pydaw_pitchbend
+# for vectorized bulk editing, NOTE_DTYPE, CC_DTYPE and PB_DTYPE are
+# defined in pydaw_codec.  Field names match the attribute names
+
+def pydaw_events_to_array(a_events, a_dtype):
+    """ Pack a list of MIDI event objects into a structured array """
+    f_result = numpy.empty(len(a_events), dtype=a_dtype)
+    for f_name in a_dtype.names:
+        f_result[f_name] = numpy.array(
+            list(map(operator.attrgetter(f_name), a_events)),
+            dtype=a_dtype[f_name])
+    return f_result
+
+def pydaw_events_from_array(a_arr, a_class, a_attrs=None):
+    """ Create MIDI event objects of type a_class from a structured array,
+        without the per-field float()/round() of the constructors.
+        Float fields must already be rounded to 6 decimal places
+
+        @a_attrs:  The attribute names to assign the fields to, if they
+                   differ from the field names
+    """
+    f_names = a_arr.dtype.names
+    f_attrs = a_attrs if a_attrs else f_names
+    f_new = a_class.__new__
+    f_result = []
+    for f_values in zip(*(a_arr[x].tolist() for x in f_names)):
+        f_event = f_new(a_class)
+        f_event.__dict__ = dict(zip(f_attrs, f_values))
+        f_result.append(f_event)
+    if a_class is pydaw_note:
+        for f_note in f_result:
+            f_note.is_selected = False
+            f_note.set_end()
+    return f_result
+
 class pydaw_tracks:
     def __init__(self):
         self.tracks = {}
@@ -902,21 +1388,265 @@ pydaw_audio_item_editor_gradient.setColorAt(
     1.0, QColor.fromRgb(130, 130, 100, 120))
 #end from sample_graph.py
 
+# Approximate size of a QPainterPath element, 2 doubles and an int
+PAINTER_PATH_ELEMENT_BYTES = 24
+
+class SampleGraphCache:
+    """ LRU cache of pydaw_sample_graph objects keyed by file name,
+        bounded by the approximate number of bytes held by the peak
+        arrays and the cached QPainterPaths.  When over budget the
+        painter paths of the least recently used graphs are dropped
+        first, then the graphs themselves.
+    """
+    def __init__(self, a_max_bytes):
+        self.max_bytes = int(a_max_bytes)
+        self.graphs = collections.OrderedDict()
+        # {key: (peak bytes, painter path bytes)} as of the last time the
+        # graph was added or it's painter paths changed
+        self.sizes = {}
+        self.byte_count = 0
+        self.path_byte_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.path_evictions = 0
+
+    def __contains__(self, a_key):
+        return a_key in self.graphs
+
+    def __len__(self):
+        return len(self.graphs)
+
+    def get(self, a_key):
+        """ Return the graph for a_key and mark it as recently used,
+            or None if it is not cached
+        """
+        if a_key in self.graphs:
+            self.hits += 1
+            self.graphs.move_to_end(a_key)
+            return self.graphs[a_key]
+        self.misses += 1
+        return None
+
+    def add(self, a_key, a_graph):
+        self.graphs[a_key] = a_graph
+        self.graphs.move_to_end(a_key)
+        self._count(a_key)
+        self.evict()
+
+    def update(self, a_key):
+        """ Call when the painter paths of the graph for a_key change """
+        if a_key in self.graphs:
+            self._count(a_key)
+            self.evict()
+
+    def _count(self, a_key):
+        self._uncount(a_key)
+        f_graph = self.graphs[a_key]
+        f_peaks = f_graph.get_byte_count(False)
+        f_paths = f_graph.get_byte_count() - f_peaks
+        self.sizes[a_key] = (f_peaks, f_paths)
+        self.byte_count += f_peaks + f_paths
+        self.path_byte_count += f_paths
+
+    def _uncount(self, a_key):
+        f_peaks, f_paths = self.sizes.pop(a_key, (0, 0))
+        self.byte_count -= f_peaks + f_paths
+        self.path_byte_count -= f_paths
+
+    def _drop_paths(self, a_key):
+        self.graphs[a_key].sample_graph_cache = None
+        f_peaks, f_paths = self.sizes[a_key]
+        self.sizes[a_key] = (f_peaks, 0)
+        self.byte_count -= f_paths
+        self.path_byte_count -= f_paths
+
+    def pop(self, a_key):
+        self._uncount(a_key)
+        return self.graphs.pop(a_key)
+
+    def clear(self):
+        self.graphs.clear()
+        self.sizes.clear()
+        self.byte_count = 0
+        self.path_byte_count = 0
+
+    def clear_painter_paths(self):
+        for f_key in self.graphs:
+            self._drop_paths(f_key)
+
+    def bytes_resident(self, a_paths=True):
+        if a_paths:
+            return self.byte_count
+        return self.byte_count - self.path_byte_count
+
+    def evict(self):
+        """ Evict least recently used entries until the cache is within
+            budget, the most recently used graph is always kept
+        """
+        if self.byte_count <= self.max_bytes:
+            return
+        f_keys = list(self.graphs)[:-1]
+        for f_key in f_keys:
+            if self.graphs[f_key].sample_graph_cache is not None:
+                self._drop_paths(f_key)
+                self.path_evictions += 1
+                if self.byte_count <= self.max_bytes:
+                    return
+        for f_key in f_keys:
+            self.pop(f_key)
+            self.evictions += 1
+            if self.byte_count <= self.max_bytes:
+                return
+
+    def get_stats(self):
+        return {
+            "count": len(self.graphs),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "path_evictions": self.path_evictions,
+            "bytes": self.byte_count,
+            "path_bytes": self.path_byte_count,
+            "max_bytes": self.max_bytes,
+        }
+
+    def __str__(self):
+        return ", ".join("{}: {}".format(k, v)
+            for k, v in sorted(self.get_stats().items()))
+
 def pydaw_clear_sample_graph_cache():
-    global global_sample_graph_cache
-    global_sample_graph_cache = {}
+    global_sample_graph_cache.clear()
+
+def pydaw_clear_sample_graph_paths():
+    """ Free the cached QPainterPaths, but keep the peak data """
+    global_sample_graph_cache.clear_painter_paths()
 
 def pydaw_remove_item_from_sg_cache(a_path):
-    global global_sample_graph_cache
-    if os.path.exists(a_path):
-        os.remove(a_path)
     if a_path in global_sample_graph_cache:
+        # Drop the reference first, an open memmap would prevent
+        # the peaks file from being deleted on Windows
         global_sample_graph_cache.pop(a_path)
     else:
         print("\n\npydaw_remove_item_from_sg_cache: {} "
             "not found.\n\n".format(a_path))
-
-global_sample_graph_cache = {}
+    for f_path in (a_path, pydaw_peaks_file_path(a_path)):
+        if os.path.exists(f_path):
+            os.remove(f_path)
+
+global_sample_graph_cache = SampleGraphCache(
+    get_file_setting("sample_graph_cache_mb", int, 256) * 1024 * 1024)
+
+# Binary peak file format, written next to the engine's text sample graph
+# as <uid>.mkpeaks the first time the text graph is read.
+#
+# header:  PEAKS_HEADER, followed by the UTF-8 file name, padded to a
+#          multiple of PEAKS_ALIGN bytes
+# data:    for each mip level, the float32 high peaks of every channel
+#          followed by the float32 low peaks of every channel.  Level 0 is
+#          the engine's resolution, each following level is half the
+#          size of the previous.  Low peaks are stored in forward order.
+PEAKS_MAGIC = b"MKPK"
+PEAKS_VERSION = 1
+PEAKS_EXT = ".mkpeaks"
+PEAKS_ALIGN = 16
+# magic, version, channels, count, levels, sample_rate, frame_count,
+# timestamp, length_in_seconds, peak, file name length
+PEAKS_HEADER = struct.Struct("<4sIIIIIQqddI")
+# Don't create mip levels smaller than this
+PEAKS_MIN_LEVEL_SIZE = 32
+
+def pydaw_peaks_file_path(a_sample_graph_file):
+    return "{}{}".format(a_sample_graph_file, PEAKS_EXT)
+
+def pydaw_peaks_mip_sizes(a_count, a_levels=None):
+    """ Return the peak count of each mip level for a level 0 of a_count,
+        either a_levels levels, or until PEAKS_MIN_LEVEL_SIZE is reached
+    """
+    f_result = [int(a_count)]
+    while (len(f_result) < a_levels) if a_levels else \
+    (f_result[-1] > PEAKS_MIN_LEVEL_SIZE):
+        f_result.append((f_result[-1] + 1) // 2)
+    return f_result
+
+def pydaw_peaks_reduce(a_high, a_low):
+    """ Halve the resolution of a pair of (channels, count) peak arrays,
+        keeping the highest and lowest value of each pair of peaks
+    """
+    if a_high.shape[1] % 2:
+        a_high = numpy.concatenate((a_high, a_high[:, -1:]), axis=1)
+        a_low = numpy.concatenate((a_low, a_low[:, -1:]), axis=1)
+    f_shape = (a_high.shape[0], a_high.shape[1] // 2, 2)
+    return (a_high.reshape(f_shape).max(axis=2),
+        a_low.reshape(f_shape).min(axis=2))
+
+def pydaw_write_peaks_file(a_path, a_graph, a_high, a_low):
+    """ Write the binary peak file for a_graph
+        @a_path:  The .mkpeaks file to write
+        @a_graph: pydaw_sample_graph, for the meta data
+        @a_high:  (channels, count) float32 array of high peaks
+        @a_low:   (channels, count) float32 array of low peaks,
+                  in forward order
+    """
+    f_name = a_graph._file.encode("utf-8")
+    f_levels = [(a_high, a_low)]
+    for f_i in range(len(pydaw_peaks_mip_sizes(a_high.shape[1])) - 1):
+        f_levels.append(pydaw_peaks_reduce(*f_levels[-1]))
+    f_header = PEAKS_HEADER.pack(
+        PEAKS_MAGIC, PEAKS_VERSION, a_graph.channels, a_high.shape[1],
+        len(f_levels), a_graph.sample_rate, a_graph.frame_count,
+        a_graph.timestamp,
+        numpy.nan if a_graph.length_in_seconds is None
+        else a_graph.length_in_seconds,
+        a_graph.peak, len(f_name)) + f_name
+    f_header += b"\0" * (-len(f_header) % PEAKS_ALIGN)
+    f_tmp_path = "{}.tmp".format(a_path)
+    with open(f_tmp_path, "wb") as f_handle:
+        f_handle.write(f_header)
+        for f_high, f_low in f_levels:
+            f_handle.write(numpy.ascontiguousarray(
+                f_high, dtype="<f4").tobytes())
+            f_handle.write(numpy.ascontiguousarray(
+                f_low, dtype="<f4").tobytes())
+    os.replace(f_tmp_path, a_path)
+
+def pydaw_read_peaks_file(a_path):
+    """ Map a binary peak file into memory.  Returns a tuple of
+        (dict of meta data, list of (high, low) tuples of read-only
+        (channels, count) arrays, one per mip level)
+    """
+    with open(a_path, "rb") as f_handle:
+        f_header = f_handle.read(PEAKS_HEADER.size)
+        (f_magic, f_version, f_channels, f_count, f_level_count,
+         f_sample_rate, f_frame_count, f_timestamp, f_length, f_peak,
+         f_name_len) = PEAKS_HEADER.unpack(f_header)
+        if f_magic != PEAKS_MAGIC or f_version != PEAKS_VERSION:
+            raise Exception("Unsupported peak file {}, version {}".format(
+                a_path, f_version))
+        f_name = f_handle.read(f_name_len).decode("utf-8")
+    f_offset = PEAKS_HEADER.size + f_name_len
+    f_offset += -f_offset % PEAKS_ALIGN
+    f_sizes = pydaw_peaks_mip_sizes(f_count, f_level_count)
+    f_total = sum(f_sizes) * f_channels * 2
+    f_data = numpy.memmap(
+        a_path, dtype="<f4", mode="r", offset=f_offset, shape=(f_total,))
+    f_levels = []
+    f_pos = 0
+    for f_size in f_sizes:
+        f_len = f_size * f_channels
+        f_high = f_data[f_pos:f_pos + f_len].reshape((f_channels, f_size))
+        f_pos += f_len
+        f_low = f_data[f_pos:f_pos + f_len].reshape((f_channels, f_size))
+        f_pos += f_len
+        f_levels.append((f_high, f_low))
+    f_meta = {
+        "filename": f_name, "timestamp": f_timestamp,
+        "channels": f_channels, "count": f_count,
+        "length": None if numpy.isnan(f_length) else f_length,
+        "frame_count": f_frame_count,
+        "sample_rate": f_sample_rate, "peak": f_peak,
+    }
+    return f_meta, f_levels
 
 class pydaw_sample_graph:
     @staticmethod
@@ -926,13 +1656,11 @@ class pydaw_sample_graph:
             Prefer this over directly instantiating.
         """
         f_file_name = str(a_file_name)
-        global global_sample_graph_cache
-        if f_file_name in global_sample_graph_cache:
-            return global_sample_graph_cache[f_file_name]
-        else:
+        f_result = global_sample_graph_cache.get(f_file_name)
+        if f_result is None:
             f_result = pydaw_sample_graph(f_file_name, a_sample_dir)
-            global_sample_graph_cache[f_file_name] = f_result
-            return f_result
+            global_sample_graph_cache.add(f_file_name, f_result)
+        return f_result
 
     def __init__(self, a_file_name, a_sample_dir):
         """
@@ -941,6 +1669,7 @@ class pydaw_sample_graph:
         """
         self.sample_graph_cache = None
         f_file_name = str(a_file_name)
+        self.graph_file = f_file_name
         self._file = None
         self.sample_dir = str(a_sample_dir)
         self.sample_dir_file = None
@@ -953,14 +1682,65 @@ class pydaw_sample_graph:
         self.sample_rate = None
         self.frame_count = None
         self.peak = 0.0
+        # list of (high, low) tuples of (channels, count) arrays, see
+        # pydaw_read_peaks_file()
+        self.mip_levels = []
 
         if not os.path.isfile(f_file_name):
             return
 
+        f_peaks_file = pydaw_peaks_file_path(f_file_name)
+        if os.path.isfile(f_peaks_file) and \
+        os.path.getmtime(f_peaks_file) >= os.path.getmtime(f_file_name):
+            try:
+                self.open_peaks_file(f_peaks_file)
+                return
+            except Exception as ex:
+                print("Error opening {}, reading the text sample "
+                    "graph instead\n{}".format(f_peaks_file, ex))
+
+        if not self.read_text_file(f_file_name):
+            return
+
+        if None not in (self._file, self.timestamp, self.channels,
+        self.frame_count, self.sample_rate) and len(self.high_peaks[0]):
+            # Upgrade to the binary format so that the text file
+            # never needs to be parsed again
+            try:
+                f_high = numpy.array(self.high_peaks[:self.channels])
+                f_low = numpy.array(
+                    [x[::-1] for x in self.low_peaks[:self.channels]])
+                pydaw_write_peaks_file(f_peaks_file, self, f_high, f_low)
+                self.open_peaks_file(f_peaks_file)
+            except Exception as ex:
+                print("Error converting {} to {}\n{}".format(
+                    f_file_name, f_peaks_file, ex))
+
+    def open_peaks_file(self, a_path):
+        f_meta, f_levels = pydaw_read_peaks_file(a_path)
+        self._file = f_meta["filename"]
+        self.sample_dir_file = "{}{}".format(self.sample_dir, self._file)
+        self.timestamp = f_meta["timestamp"]
+        self.channels = f_meta["channels"]
+        self.count = f_meta["count"]
+        self.length_in_seconds = f_meta["length"]
+        self.frame_count = f_meta["frame_count"]
+        self.sample_rate = f_meta["sample_rate"]
+        self.peak = f_meta["peak"]
+        self.mip_levels = f_levels
+        f_high, f_low = f_levels[0]
+        self.high_peaks = list(f_high)
+        # Reversed views, for compatibility with the text format
+        self.low_peaks = [x[::-1] for x in f_low]
+
+    def read_text_file(self, a_file_name):
+        """ Parse the sample graph text file written by the engine,
+            returns True if successful
+        """
         try:
-            f_file = open(f_file_name, "r")
+            f_file = open(a_file_name, "r")
         except:
-            return
+            return False
 
         f_line_arr = f_file.readlines()
         f_file.close()
@@ -1010,6 +1790,7 @@ class pydaw_sample_graph:
         for f_high_peaks, f_low_peaks in zip(self.high_peaks, self.low_peaks):
             numpy.clip(f_high_peaks, 0.01, 0.99, f_high_peaks)
             numpy.clip(f_low_peaks, -0.99, -0.01, f_low_peaks)
+        return True
 
     def is_valid(self):
         if (self._file is None):
@@ -1043,71 +1824,125 @@ class pydaw_sample_graph:
         f_result = pydaw_clip_value(f_result, -24, 24)
         return f_result
 
+    def get_mip_levels(self):
+        """ Return the peak pyramid, a list of (high, low) tuples of
+            (channels, count) arrays with forward-ordered low peaks,
+            building it if the graph was not loaded from a peaks file
+        """
+        if not self.mip_levels:
+            f_levels = [(
+                numpy.array(self.high_peaks[:self.channels]),
+                numpy.array([x[::-1] for x in self.low_peaks[:self.channels]]),
+            )]
+            for f_i in range(
+            len(pydaw_peaks_mip_sizes(f_levels[0][0].shape[1])) - 1):
+                f_levels.append(pydaw_peaks_reduce(*f_levels[-1]))
+            self.mip_levels = f_levels
+        return self.mip_levels
+
+    def get_mip_level(self, a_width):
+        """ Return the (high, low) tuple of the coarsest mip level that
+            still has at least one peak per pixel when the whole file
+            is drawn a_width pixels wide
+        """
+        f_levels = self.get_mip_levels()
+        f_result = f_levels[0]
+        for f_level in f_levels[1:]:
+            if f_level[0].shape[1] < a_width:
+                break
+            f_result = f_level
+        return f_result
+
     def create_sample_graph(
             self, a_for_scene=False, a_width=None, a_height=None,
             a_audio_item=None):
         if a_audio_item:
             f_ss = a_audio_item.sample_start * 0.001
             f_se = a_audio_item.sample_end * 0.001
-            #f_width_frac = f_se - f_ss
             f_vol = pydaw_util.pydaw_db_to_lin(a_audio_item.vol)
-            f_len = len(self.high_peaks[0])
-            f_slice_low = int(f_ss * f_len)
-            f_slice_high = int(f_se * f_len)
-            #a_width *= f_width_frac
-        else:
-            f_slice_low = None
-            f_slice_high = None
         if a_width or a_height or self.sample_graph_cache is None:
+            f_return_paths = bool(a_width or a_height)
             if not a_width:
                 a_width = AUDIO_ITEM_SCENE_WIDTH
             if not a_height:
                 a_height = AUDIO_ITEM_SCENE_HEIGHT
 
+            f_level_high, f_level_low = self.get_mip_level(a_width)
+            f_len = f_level_high.shape[1]
+            # self.count is the level 0 count, scale it to this level
+            f_count = self.count * (f_len / len(self.high_peaks[0]))
+
+            if a_audio_item:
+                f_slice_low = int(f_ss * f_len)
+                f_slice_high = int(f_se * f_len)
+            else:
+                f_slice_low = None
+                f_slice_high = None
+
             if a_for_scene:
-                f_width_inc = a_width / self.count
+                f_width_inc = a_width / f_count
                 f_section = a_height / float(self.channels)
             else:
-                f_width_inc = 98.0 / self.count
+                f_width_inc = 98.0 / f_count
                 f_section = 100.0 / float(self.channels)
             f_section_div2 = f_section * 0.5
 
             f_paths = []
 
             for f_i in range(self.channels):
-                f_result = QPainterPath()
-                f_width_pos = 1.0
-                f_result.moveTo(f_width_pos, f_section_div2)
                 if a_audio_item and a_audio_item.reversed:
-                    f_high_peaks = self.high_peaks[f_i][
+                    f_high_peaks = f_level_high[f_i][
                             f_slice_high:f_slice_low:-1]
-                    f_low_peaks = self.low_peaks[f_i][::-1]
-                    f_low_peaks = f_low_peaks[f_slice_low:f_slice_high]
+                    f_low_peaks = f_level_low[f_i][f_slice_low:f_slice_high]
                 else:
-                    f_high_peaks = self.high_peaks[f_i][
+                    f_high_peaks = f_level_high[f_i][
                         f_slice_low:f_slice_high]
-                    f_low_peaks = self.low_peaks[f_i][::-1]
-                    f_low_peaks = f_low_peaks[f_slice_high:f_slice_low:-1]
+                    f_low_peaks = f_level_low[f_i][
+                        f_slice_high:f_slice_low:-1]
 
                 if a_audio_item:
                     f_high_peaks = f_high_peaks * f_vol
                     f_low_peaks = f_low_peaks * f_vol
 
-                for f_peak in f_high_peaks:
-                    f_result.lineTo(f_width_pos, f_section_div2 -
-                        (f_peak * f_section_div2))
-                    f_width_pos += f_width_inc
-                for f_peak in f_low_peaks:
-                    f_result.lineTo(f_width_pos, (f_peak * -1.0 *
-                        f_section_div2) + f_section_div2)
-                    f_width_pos -= f_width_inc
+                f_high_count = f_high_peaks.shape[0]
+                f_x = numpy.concatenate((
+                    [1.0],
+                    1.0 + (numpy.arange(f_high_count) * f_width_inc),
+                    1.0 + (numpy.arange(
+                        f_high_count, f_high_count - f_low_peaks.shape[0],
+                        -1) * f_width_inc),
+                ))
+                f_y = numpy.concatenate((
+                    [f_section_div2],
+                    f_section_div2 - (f_high_peaks * f_section_div2),
+                    f_section_div2 - (f_low_peaks * f_section_div2),
+                ))
+                f_result = QPainterPath()
+                f_result.addPolygon(QPolygonF(
+                    [QtCore.QPointF(x, y) for x, y in
+                     zip(f_x.tolist(), f_y.tolist())]))
                 f_result.closeSubpath()
                 f_paths.append(f_result)
-            if a_width or a_height:
+            if f_return_paths:
                 return f_paths
             self.sample_graph_cache = f_paths
+            global_sample_graph_cache.update(self.graph_file)
         return self.sample_graph_cache
 
+    def get_byte_count(self, a_paths=True):
+        """ Return the approximate number of bytes used by the peak
+            arrays, and optionally the cached QPainterPaths
+        """
+        f_result = sum(x.nbytes for f_level in self.mip_levels
+            for x in f_level)
+        # Peaks loaded from a peaks file are views of the mip levels
+        f_result += sum(x.nbytes for x in self.high_peaks + self.low_peaks
+            if isinstance(x, numpy.ndarray) and x.base is None)
+        if a_paths and self.sample_graph_cache:
+            f_result += sum(x.elementCount() for x in
+                self.sample_graph_cache) * PAINTER_PATH_ELEMENT_BYTES
+        return f_result
+
     def check_mtime(self):
         """ Returns False if the sample graph is older than
             the file modified time
@@ -0,0 +1,44 @@
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+"""
+
+import libmk
+
+
+class RecordingIPC(libmk.AbstractIPC):
+    def __init__(self, a_path, a_sent):
+        libmk.AbstractIPC.__init__(self)
+        self.path = a_path
+        self.sent = a_sent
+
+    def send_configure_now(self, key, value):
+        self.sent.append((self.path, key, value))
+
+
+def test_coalesced_messages_are_sent_before_other_instances(monkeypatch):
+    monkeypatch.setattr(libmk, "IPC_COALESCE_MS", 1000)
+    f_sent = []
+    f_master = RecordingIPC("/musikernel/master", f_sent)
+    f_daw = RecordingIPC("/musikernel/dawnext", f_sent)
+    try:
+        f_master.send_configure_coalesced("mvol", 0, "-6")
+        f_master.send_configure_coalesced("mvol", 0, "-3")
+        f_daw.send_configure_coalesced("pc", (1, 2), "0|1|2|3")
+        assert not f_sent
+        f_daw.send_configure("en", "1")
+        assert f_sent == [
+            ("/musikernel/master", "mvol", "-3"),
+            ("/musikernel/dawnext", "pc", "0|1|2|3"),
+            ("/musikernel/dawnext", "en", "1"),
+        ]
+    finally:
+        libmk.SEND_QUEUE.clear()
@@ -0,0 +1,61 @@
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+"""
+
+import os
+
+from libmk import mk_project
+
+
+def new_project(a_folder, monkeypatch):
+    f_lib = os.path.join(
+        str(a_folder), "lib", mk_project.global_pydaw_version_string)
+    os.makedirs(f_lib)
+    with open(os.path.join(f_lib, "minor-version.txt"), "w") as f_file:
+        f_file.write("1")
+    monkeypatch.setattr(mk_project, "INSTALL_PREFIX", str(a_folder))
+    f_project = mk_project.MkProject()
+    f_project.new_project(
+        os.path.join(str(a_folder), "project", "project.mkp2"))
+    return f_project
+
+
+def test_concurrent_stretches_get_different_files(tmp_path, monkeypatch):
+    f_project = new_project(tmp_path, monkeypatch)
+    monkeypatch.setattr(mk_project, "TIMESTRETCH_CACHE_MAX_MB", 0)
+    # Jobs that stay queued until they are cancelled
+    f_project.timestretch_scheduler.max_jobs = 0
+    f_src = os.path.join(str(tmp_path), "src.wav")
+    with open(f_src, "wb") as f_file:
+        f_file.write(b"RIFF")
+    f_wavs_dict = f_project.get_wavs_dict()
+    f_src_uid = f_wavs_dict.add_new_item(f_src)
+    f_project.save_wavs_dict(f_wavs_dict)
+
+    f_results = []
+    for f_amt in (2.0, 3.0):
+        f_item = mk_project.MkAudioItem(
+            f_src_uid, a_timestretch_mode=6, a_timestretch_amt=f_amt,
+            a_timestretch_amt_end=f_amt)
+        f_result = f_project.timestretch_audio_item(f_item)
+        assert f_result is not None
+        assert f_item.uid == f_src_uid
+        f_results.append(f_result)
+    try:
+        (f_path1, f_uid1, f_job1), (f_path2, f_uid2, f_job2) = f_results
+        assert f_uid1 != f_uid2
+        assert f_path1 != f_path2
+        assert f_job1 is not f_job2
+        assert sorted(f_project.timestretch_cache.values()) == sorted(
+            [f_uid1, f_uid2])
+    finally:
+        f_project.timestretch_scheduler.cancel_all()
@@ -16,9 +16,11 @@ GNU General Public License for more details.
 try:
     import libpydaw.pydaw_util as pydaw_util
     from libpydaw.translate import _
+    from libpydaw.pydaw_snapshots import pydaw_snapshot_store
 except ImportError:
     import pydaw_util
     from translate import _
+    from pydaw_snapshots import pydaw_snapshot_store
 
 from PyQt5 import QtCore
 from PyQt5.QtGui import *
@@ -27,7 +29,6 @@ from PyQt5.QtWidgets import *
 import json
 import os
 import shutil
-import tarfile
 import datetime
 
 class project_history_widget(QTreeWidget):
@@ -84,11 +85,9 @@ class project_history_widget(QTreeWidget):
                 f_project_dir,
                 datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S"))
             f_item = f_items[0]
-            f_tar_path = os.path.join(
-                self.backup_dir, f_item.text(0))
             shutil.move(f_project_dir, f_tmp_dir)
-            with tarfile.open(f_tar_path, "r:bz2") as f_tar:
-                f_tar.extractall(self.project_dir)
+            pydaw_snapshot_store(self.backup_dir).extract(
+                f_item.text(0), self.project_dir)
             self.project_data["CURRENT"] = f_item.node_path
             with open(self.backup_file, "w", newline="\n") as f_handle:
                 json.dump(
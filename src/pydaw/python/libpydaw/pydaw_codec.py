@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Bulk parsing and serializing of the pipe-delimited item, sequencer and
+automation files into structured numpy arrays, with one pass over the
+lines instead of one object constructor per event.  The output is byte
+for byte what the object __str__ methods produce.
+
+Run this file directly to load and save files written by the original
+__str__ methods, and the files of any project folders given, with the
+objects that use this module, check that they are unchanged and
+benchmark it:
+    python3 pydaw_codec.py [project folder ...]
+"""
+
+import itertools
+import numpy
+
+TERMINATING_CHAR = "\\"
+
+NOTE_DTYPE = numpy.dtype([
+    ("start", numpy.float64), ("length", numpy.float64),
+    ("note_num", numpy.int32), ("velocity", numpy.int32)])
+CC_DTYPE = numpy.dtype([
+    ("start", numpy.float64), ("cc_num", numpy.int32),
+    ("cc_val", numpy.float64)])
+PB_DTYPE = numpy.dtype([
+    ("start", numpy.float64), ("pb_val", numpy.float64)])
+SEQ_ITEM_DTYPE = numpy.dtype([
+    ("track_num", numpy.int32), ("start_beat", numpy.float64),
+    ("length_beats", numpy.float64), ("item_uid", numpy.int64),
+    ("start_offset", numpy.float64)])
+ATM_POINT_DTYPE = numpy.dtype([
+    ("beat", numpy.float64), ("port_num", numpy.int32),
+    ("cc_val", numpy.float64), ("index", numpy.int64),
+    ("plugin_index", numpy.int64), ("break_after", numpy.int32),
+    ("curve", numpy.float64)])
+
+# The number of decimal places each float field is rounded to by the
+# object constructors
+NOTE_ROUND = {"start": 6, "length": 6}
+CC_ROUND = {"start": 6, "cc_val": 6}
+PB_ROUND = {"start": 6, "pb_val": 6}
+SEQ_ITEM_ROUND = {}
+ATM_POINT_ROUND = {"beat": 4, "cc_val": 4}
+
+
+def pydaw_split_lines(a_text):
+    """ The lines of a file, up to the terminating character """
+    f_lines = a_text.split("\n")
+    try:
+        return f_lines[:f_lines.index(TERMINATING_CHAR)]
+    except ValueError:
+        return f_lines
+
+def pydaw_round(a_arr, a_digits):
+    """ Returns a list of the values of float array a_arr rounded with
+        round(), which numpy.round() is not always the same as.  Values
+        that are already rounded, which is nearly all of them, are
+        detected with numpy and left alone
+    """
+    f_result = a_arr.tolist()
+    f_redo = numpy.flatnonzero(
+        (numpy.round(a_arr, a_digits) != a_arr) |
+        (numpy.abs(a_arr) >= 1.0e9))
+    for f_i in f_redo.tolist():
+        f_result[f_i] = round(f_result[f_i], a_digits)
+    return f_result
+
+def pydaw_round_fields(a_arr, a_round):
+    """ Round the fields of structured array a_arr in place, the same
+        way the object constructors do.  a_round is a dict of
+        {field name: decimal places}
+    """
+    for f_name, f_digits in a_round.items():
+        a_arr[f_name] = numpy.array(
+            pydaw_round(a_arr[f_name], f_digits), dtype=numpy.float64)
+    return a_arr
+
+def pydaw_split_columns(a_lines):
+    """ Split pipe-delimited lines into a list of columns.  Columns
+        missing from the end of shorter lines are filled with "0"
+    """
+    f_counts = set(map(str.count, a_lines, itertools.repeat("|")))
+    if len(f_counts) == 1:
+        f_width = f_counts.pop() + 1
+        f_fields = "|".join(a_lines).split("|")
+        return [f_fields[x::f_width] for x in range(f_width)]
+    return list(itertools.zip_longest(
+        *(x.split("|") for x in a_lines), fillvalue="0"))
+
+def pydaw_parse_rows(a_lines, a_dtype, a_round=None, a_skip=0):
+    """ Convert a list of pipe-delimited lines to a structured array of
+        a_dtype, ignoring the first a_skip fields.  Fields missing from
+        the end of shorter lines default to zero.  a_round is a dict of
+        {field name: decimal places} for the fields the object
+        constructors round
+    """
+    f_result = numpy.zeros(len(a_lines), dtype=a_dtype)
+    if not a_lines:
+        return f_result
+    f_columns = pydaw_split_columns(a_lines)[a_skip:]
+    for f_name, f_column in zip(a_dtype.names, f_columns):
+        if a_dtype[f_name].kind == "f":
+            f_values = numpy.array(
+                list(map(float, f_column)), dtype=numpy.float64)
+            if a_round and f_name in a_round:
+                f_values = numpy.array(
+                    pydaw_round(f_values, a_round[f_name]),
+                    dtype=numpy.float64)
+            f_result[f_name] = f_values
+        else:
+            f_result[f_name] = numpy.array(
+                list(map(int, f_column)), dtype=a_dtype[f_name])
+    return f_result
+
+def pydaw_format_rows(a_arr, a_prefix=None, a_round=None):
+    """ Return a list of pipe-delimited lines for a structured array,
+        formatted the same way as str() of the Python values
+    """
+    f_columns = []
+    for f_name in a_arr.dtype.names:
+        if a_round and f_name in a_round:
+            f_columns.append(pydaw_round(a_arr[f_name], a_round[f_name]))
+        else:
+            f_columns.append(a_arr[f_name].tolist())
+    f_format = "|".join(["{}"] * len(f_columns))
+    if a_prefix is not None:
+        f_format = "{}|{}".format(a_prefix, f_format)
+    return list(map(f_format.format, *f_columns))
+
+def pydaw_parse_item(a_text):
+    """ Returns a dict of:
+        "uid":  int or None,
+        "notes", "ccs", "pbs":  NOTE_DTYPE, CC_DTYPE and PB_DTYPE arrays,
+        "other":  a list of the remaining rows, split on '|', in order
+    """
+    f_lines = {"n": [], "c": [], "p": []}
+    f_other = []
+    f_uid = None
+    for f_line in pydaw_split_lines(a_text):
+        f_type = f_line[:1]
+        if f_type in f_lines and f_line[1:2] == "|":
+            f_lines[f_type].append(f_line)
+        elif f_type == "U":
+            f_uid = int(f_line.split("|")[1])
+        elif f_type != "M":
+            f_other.append(f_line.split("|"))
+    return {
+        "uid": f_uid,
+        "notes": pydaw_parse_rows(f_lines["n"], NOTE_DTYPE, NOTE_ROUND, 1),
+        "ccs": pydaw_parse_rows(f_lines["c"], CC_DTYPE, CC_ROUND, 1),
+        "pbs": pydaw_parse_rows(f_lines["p"], PB_DTYPE, PB_ROUND, 1),
+        "other": f_other,
+    }
+
+def pydaw_format_item_events(a_notes, a_ccs, a_pbs):
+    """ The 'M' line and the MIDI event lines of an item file, sorted by
+        start the same way as sorted(notes + ccs + pitchbends)
+    """
+    f_lines = (
+        pydaw_format_rows(a_notes, "n", NOTE_ROUND) +
+        pydaw_format_rows(a_ccs, "c", CC_ROUND) +
+        # pydaw_pitchbend.__str__ does not round the start
+        pydaw_format_rows(a_pbs, "p", {"pb_val": 6}))
+    f_starts = numpy.concatenate(
+        (a_notes["start"], a_ccs["start"], a_pbs["start"]))
+    f_order = numpy.argsort(f_starts, kind="mergesort")
+    return ["M|{}".format(len(f_lines))] + [
+        f_lines[x] for x in f_order.tolist()]
+
+def pydaw_parse_sequencer(a_text):
+    """ Returns (marker_rows, SEQ_ITEM_DTYPE array) """
+    f_markers = []
+    f_items = []
+    for f_line in pydaw_split_lines(a_text):
+        f_type = f_line[:2]
+        if f_type == "E|":
+            f_markers.append(f_line.split("|"))
+        elif f_type not in ("M|", "C|"):
+            f_items.append(f_line)
+    return f_markers, pydaw_parse_rows(
+        f_items, SEQ_ITEM_DTYPE, SEQ_ITEM_ROUND)
+
+def pydaw_format_sequencer_items(a_arr):
+    """ 'C' lines and item lines for a SEQ_ITEM_DTYPE array that is
+        already sorted by track and start beat
+    """
+    f_lines = pydaw_format_rows(
+        a_arr, None,
+        {"start_beat": 6, "length_beats": 6, "start_offset": 6})
+    f_tracks = a_arr["track_num"]
+    f_bounds = (numpy.flatnonzero(numpy.diff(f_tracks)) + 1).tolist()
+    f_result = []
+    for f_start, f_end in zip([0] + f_bounds, f_bounds + [len(f_lines)]):
+        if f_start == f_end:
+            continue
+        f_result.append("C|{}|{}".format(
+            int(f_tracks[f_start]), f_end - f_start))
+        f_result.extend(f_lines[f_start:f_end])
+    return f_result
+
+def pydaw_parse_atm(a_text):
+    """ Returns an ATM_POINT_DTYPE array of every point, in file order """
+    return pydaw_parse_rows(
+        [x for x in pydaw_split_lines(a_text)
+        if x and x[0] not in ("p", "q")],
+        ATM_POINT_DTYPE, ATM_POINT_ROUND)
+
+def pydaw_format_atm(a_arr):
+    """ Lines for an ATM_POINT_DTYPE array, grouped by plugin and port
+        in the same order as pydaw_atm_region.__str__
+    """
+    f_order = numpy.lexsort(
+        (a_arr["beat"], a_arr["port_num"], a_arr["index"]))
+    a_arr = a_arr[f_order]
+    f_lines = pydaw_format_rows(a_arr)
+    f_index = a_arr["index"]
+    f_port = a_arr["port_num"]
+    f_change = numpy.flatnonzero(
+        (numpy.diff(f_index) != 0) | (numpy.diff(f_port) != 0)) + 1
+    f_bounds = [0] + f_change.tolist() + [len(f_lines)]
+    f_groups = [x for x in zip(f_bounds, f_bounds[1:]) if x[0] != x[1]]
+    f_result = []
+    for f_plugin, f_plugin_groups in itertools.groupby(
+    f_groups, lambda x: int(f_index[x[0]])):
+        f_plugin_groups = list(f_plugin_groups)
+        f_result.append("p|{}|{}".format(f_plugin, len(f_plugin_groups)))
+        for f_start, f_end in f_plugin_groups:
+            f_result.append("q|{}|{}".format(
+                int(f_port[f_start]), f_end - f_start))
+            f_result.extend(f_lines[f_start:f_end])
+    return f_result
+
+
+def _random_corpus(a_count, a_seed=0):
+    """ Synthetic item, sequencer and automation files in the same form
+        the DAW writes them
+    """
+    f_random = numpy.random.RandomState(a_seed)
+    f_notes = numpy.zeros(a_count, dtype=NOTE_DTYPE)
+    f_notes["start"] = numpy.round(
+        f_random.randint(0, a_count, a_count) * 0.0625, 6)
+    f_notes["length"] = numpy.round(f_random.uniform(0.01, 4.0, a_count), 6)
+    f_notes["note_num"] = f_random.randint(0, 120, a_count)
+    f_notes["velocity"] = f_random.randint(1, 128, a_count)
+    f_notes.sort(order="start", kind="mergesort")
+    f_ccs = numpy.zeros(a_count, dtype=CC_DTYPE)
+    f_ccs["start"] = numpy.round(f_random.uniform(0, a_count, a_count), 6)
+    f_ccs["cc_num"] = f_random.randint(0, 128, a_count)
+    f_ccs["cc_val"] = numpy.round(f_random.uniform(0, 127, a_count), 6)
+    f_ccs.sort(order="start", kind="mergesort")
+    f_pbs = numpy.zeros(a_count, dtype=PB_DTYPE)
+    f_pbs["start"] = numpy.round(f_random.uniform(0, a_count, a_count), 6)
+    f_pbs["pb_val"] = numpy.round(f_random.uniform(-1, 1, a_count), 6)
+    f_pbs.sort(order="start", kind="mergesort")
+    f_item = "\n".join(
+        ["U|1"] + pydaw_format_item_events(f_notes, f_ccs, f_pbs) +
+        [TERMINATING_CHAR])
+
+    f_seq = numpy.zeros(a_count, dtype=SEQ_ITEM_DTYPE)
+    f_seq["track_num"] = f_random.randint(0, 32, a_count)
+    f_seq["start_beat"] = f_random.randint(0, a_count, a_count) * 0.25
+    f_seq["length_beats"] = f_random.randint(1, 64, a_count) * 0.25
+    f_seq["item_uid"] = f_random.randint(0, 1000, a_count)
+    f_seq["start_offset"] = numpy.round(f_random.uniform(0, 4, a_count), 6)
+    f_seq = f_seq[numpy.lexsort((f_seq["start_beat"], f_seq["track_num"]))]
+    f_sequencer = "\n".join(
+        ["M|1", "E|2|0|128.0|4|4"] + pydaw_format_sequencer_items(f_seq) +
+        [TERMINATING_CHAR])
+
+    f_atm = numpy.zeros(a_count, dtype=ATM_POINT_DTYPE)
+    f_atm["beat"] = numpy.round(f_random.uniform(0, a_count, a_count), 4)
+    f_atm["port_num"] = f_random.randint(0, 8, a_count)
+    f_atm["cc_val"] = numpy.round(f_random.uniform(0, 127, a_count), 4)
+    f_atm["index"] = f_random.randint(0, 16, a_count)
+    f_atm["plugin_index"] = f_random.randint(0, 10, a_count)
+    f_atm["break_after"] = f_random.randint(0, 2, a_count)
+    f_automation = "\n".join(pydaw_format_atm(f_atm) + [TERMINATING_CHAR])
+    return {"item": f_item, "sequencer": f_sequencer,
+        "automation": f_automation}
+
+def _round_trip(a_type, a_text):
+    """ Load and save a_text with the objects the DAW uses, which parse
+        and format it with this module
+    """
+    from libdawnext.project import (
+        pydaw_atm_region, pydaw_item, pydaw_sequencer)
+    if a_type == "item":
+        return str(pydaw_item.from_str(a_text, 0))
+    elif a_type == "sequencer":
+        return str(pydaw_sequencer.from_str(a_text))
+    else:
+        return str(pydaw_atm_region.from_str(a_text))
+
+def _fixture_corpus():
+    """ Files written by the object __str__ methods before they used this
+        module, see libdawnext/test_project.py
+    """
+    import json
+    import os
+    f_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        "libdawnext", "test_project_fixtures.json")
+    with open(f_path) as f_file:
+        f_fixtures = json.load(f_file)
+    for f_type, f_key in (("item", "items_written"),
+    ("sequencer", "sequencers"), ("automation", "automation")):
+        for f_i, f_text in enumerate(f_fixtures[f_key]):
+            yield f_type, "{} {}".format(f_key, f_i), f_text
+
+def _project_corpus(a_folder):
+    import os
+    f_projects = os.path.join(a_folder, "projects", "dawnext")
+    f_items = os.path.join(f_projects, "items")
+    for f_type, f_path in (
+    ("sequencer", os.path.join(f_projects, "sequencer.txt")),
+    ("automation", os.path.join(f_projects, "automation.txt"))):
+        if os.path.isfile(f_path):
+            with open(f_path) as f_file:
+                yield f_type, f_path, f_file.read()
+    if os.path.isdir(f_items):
+        for f_name in sorted(os.listdir(f_items)):
+            with open(os.path.join(f_items, f_name)) as f_file:
+                yield "item", f_name, f_file.read()
+
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+    sys.path.insert(
+        0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    f_failed = 0
+    f_corpus = list(_fixture_corpus())
+    for f_folder in sys.argv[1:]:
+        f_corpus.extend(_project_corpus(f_folder))
+    for f_type, f_name, f_text in f_corpus:
+        if _round_trip(f_type, f_text) != f_text:
+            print("Round trip failed:  {} {}".format(f_type, f_name))
+            f_failed += 1
+    print("Round trip:  {} of {} files OK".format(
+        len(f_corpus) - f_failed, len(f_corpus)))
+    for f_type, f_text in sorted(_random_corpus(100000, 1).items()):
+        f_time = time.perf_counter()
+        _round_trip(f_type, f_text)
+        print("{}:  {} events loaded and saved in {:.3f}s".format(
+            f_type, f_text.count("\n"), time.perf_counter() - f_time))
+    sys.exit(1 if f_failed else 0)
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Vectorized curve generators for automation, CC and pitchbend editing.
+Everything works on numpy arrays of beats and values, the callers
+create the point objects from the result in bulk.
+"""
+
+import math
+import numpy
+
+# The natural log of the largest b1 ** -k that pydaw_curve_one_pole() will
+# scale values by before starting a new block
+ONE_POLE_MAX_EXPONENT = 100.0 * math.log(10.0)
+
+
+def pydaw_curve_grid(a_start, a_step, a_count):
+    """ a_count beats starting at a_start, a_step apart """
+    return a_start + (numpy.arange(a_count, dtype=numpy.float64) * a_step)
+
+def pydaw_curve_ramp(a_start, a_step, a_end):
+    """ The beats from a_start to a_end, a_step apart, not including
+        a_end
+    """
+    return pydaw_curve_grid(
+        a_start, a_step, max(int(math.ceil((a_end - a_start) / a_step)), 0))
+
+def pydaw_curve_interpolate(a_val1, a_val2, a_mu, a_cosine=False):
+    """ Vectorized linear_interpolate() or cosine_interpolate(), any of
+        the arguments can be arrays
+    """
+    a_mu = numpy.asarray(a_mu, dtype=numpy.float64)
+    if a_cosine:
+        a_mu = (1.0 - numpy.cos(a_mu * math.pi)) * 0.5
+    return ((1.0 - a_mu) * a_val1) + (a_mu * a_val2)
+
+def pydaw_curve_segments(a_beats, a_vals, a_step, a_cosine=False):
+    """ Interpolate between each pair of points in a_beats/a_vals, with a
+        new point every a_step beats after the first point of each pair.
+        Pairs with the same value (to 3 decimal places) or closer than
+        a_step are skipped, like pydaw_atm_region.smooth_points always
+        has.  Returns (beats, values, segment index of each point)
+    """
+    a_beats = numpy.asarray(a_beats, dtype=numpy.float64)
+    a_vals = numpy.asarray(a_vals, dtype=numpy.float64)
+    f_empty = numpy.zeros(0)
+    if len(a_beats) < 2:
+        return f_empty, f_empty, numpy.zeros(0, dtype=numpy.intp)
+    f_diff = a_beats[1:] - (a_beats[:-1] + a_step)
+    f_counts = numpy.round(f_diff / a_step).astype(numpy.intp)
+    f_rounded = numpy.round(a_vals, 3)
+    f_counts[(f_rounded[1:] == f_rounded[:-1]) | (f_diff < a_step)] = 0
+    f_counts[f_counts < 0] = 0
+    f_segment = numpy.repeat(numpy.arange(len(f_counts)), f_counts)
+    f_offsets = numpy.cumsum(f_counts) - f_counts
+    # 1 to count within each segment
+    f_k = numpy.arange(len(f_segment)) - f_offsets[f_segment] + 1
+    f_beats = a_beats[:-1][f_segment] + (f_k * a_step)
+    f_mu = f_k / f_counts[f_segment]
+    f_vals = pydaw_curve_interpolate(
+        a_vals[:-1][f_segment], a_vals[1:][f_segment], f_mu, a_cosine)
+    return f_beats, f_vals, f_segment
+
+def pydaw_curve_fill(a_beats, a_vals, a_step, a_cosine=False):
+    """ A point every a_step beats strictly between each pair of points
+        in a_beats/a_vals that have different values, interpolated by
+        position.  Returns (beats, values)
+    """
+    a_beats = numpy.asarray(a_beats, dtype=numpy.float64)
+    a_vals = numpy.asarray(a_vals, dtype=numpy.float64)
+    if len(a_beats) < 2:
+        return numpy.zeros(0), numpy.zeros(0)
+    f_gap = a_beats[1:] - a_beats[:-1]
+    f_counts = numpy.ceil(f_gap / a_step).astype(numpy.intp) - 1
+    f_counts[(a_vals[1:] == a_vals[:-1]) | (f_counts < 0)] = 0
+    f_segment = numpy.repeat(numpy.arange(len(f_counts)), f_counts)
+    f_offsets = numpy.cumsum(f_counts) - f_counts
+    f_pos = (numpy.arange(len(f_segment)) - f_offsets[f_segment] + 1) * \
+        a_step
+    f_mu = f_pos / f_gap[f_segment]
+    return (
+        a_beats[:-1][f_segment] + f_pos,
+        pydaw_curve_interpolate(
+            a_vals[:-1][f_segment], a_vals[1:][f_segment], f_mu, a_cosine))
+
+def pydaw_curve_one_pole(a_values, a_initial, a_fc=0.33):
+    """ Vectorized pydaw_util.OnePoleLP(a_initial, a_fc).process() over
+        every value of a_values, returns the filtered values
+
+        z[n] = a0 * x[n] + b1 * z[n - 1] is evaluated in closed form as a
+        cumulative sum of x[k] * b1 ** -k, in blocks short enough that
+        b1 ** -k can not overflow
+    """
+    a_values = numpy.asarray(a_values, dtype=numpy.float64)
+    f_b1 = math.exp(-2.0 * math.pi * a_fc)
+    f_a0 = 1.0 - f_b1
+    f_result = numpy.empty_like(a_values)
+    if not len(a_values):
+        return f_result
+    f_block = max(int(ONE_POLE_MAX_EXPONENT / -math.log(f_b1)), 1)
+    f_block = min(f_block, len(a_values))
+    f_pow = f_b1 ** numpy.arange(1, f_block + 1, dtype=numpy.float64)
+    f_z = float(a_initial)
+    for f_start in range(0, len(a_values), f_block):
+        f_x = a_values[f_start:f_start + f_block]
+        f_p = f_pow[:len(f_x)]
+        # z[n] = b1^(n+1) * z0 + a0 * sum(b1^(n-k) * x[k])
+        f_y = f_p * (f_z + (f_a0 * numpy.cumsum(f_x / f_p)))
+        f_result[f_start:f_start + len(f_x)] = f_y
+        f_z = f_y[-1]
+    return f_result
+
+LFO_SHAPES = {
+    "sine": numpy.sin,
+    "triangle": lambda x: (2.0 / math.pi) * numpy.arcsin(numpy.sin(x)),
+    "square": lambda x: numpy.where(numpy.sin(x) >= 0.0, 1.0, -1.0),
+    "saw": lambda x: numpy.mod((x / math.pi) + 1.0, 2.0) - 1.0,
+}
+
+def pydaw_curve_lfo(
+        a_beats, a_start_beat, a_end_beat, a_phase,
+        a_start_freq, a_start_amp, a_start_center, a_start_fade,
+        a_end_fade, a_end_freq, a_end_amp, a_end_center, a_shape="sine"):
+    """ LFO values at a_beats, which must be sorted.  The frequency,
+        amplitude and center sweep linearly from start to end across
+        a_start_beat to a_end_beat, the phase advances by the frequency
+        (in radians per point) for every point.
+
+        @a_phase:       The starting phase in radians
+        @a_start_fade:  Fade in the amplitude until this fraction of the
+                        range, 0.0 to 1.0
+        @a_end_fade:    Fade out the amplitude after this fraction of the
+                        range, 0.0 to 1.0
+    """
+    a_beats = numpy.asarray(a_beats, dtype=numpy.float64)
+    f_pos = (a_beats - a_start_beat) / (a_end_beat - a_start_beat)
+    f_center = pydaw_curve_interpolate(a_start_center, a_end_center, f_pos)
+    f_amp = pydaw_curve_interpolate(a_start_amp, a_end_amp, f_pos)
+    f_fade_in = f_pos < a_start_fade
+    if a_start_fade > 0.0:
+        f_amp[f_fade_in] *= f_pos[f_fade_in] / a_start_fade
+    if a_end_fade < 1.0:
+        f_fade_out = (f_pos > a_end_fade) & ~f_fade_in
+        f_amp[f_fade_out] *= 1.0 - (
+            (f_pos[f_fade_out] - a_end_fade) / (1.0 - a_end_fade))
+    f_inc = pydaw_curve_interpolate(a_start_freq, a_end_freq, f_pos)
+    f_phase = numpy.empty_like(f_inc)
+    f_phase[:1] = a_phase
+    numpy.cumsum(f_inc[:-1], out=f_phase[1:])
+    f_phase[1:] += a_phase
+    return (LFO_SHAPES[a_shape](f_phase) * f_amp) + f_center
+
+def pydaw_curve_add_mul(a_values, a_add, a_mul, a_min=None, a_max=None):
+    """ a_values * a_mul + a_add, optionally clipped to a_min, a_max """
+    f_result = (numpy.asarray(a_values, dtype=numpy.float64) * a_mul) + a_add
+    if a_min is not None or a_max is not None:
+        f_result = numpy.clip(f_result, a_min, a_max)
+    return f_result
+
+def pydaw_curve_simplify(a_beats, a_vals, a_tolerance, a_keep=None):
+    """ Ramer-Douglas-Peucker simplification of a curve that is linearly
+        interpolated between points, like automation.  The error is
+        measured in value units, not as a perpendicular distance.
+        Returns a boolean array of the points to keep, the first and
+        last points and any points in a_keep are always kept
+    """
+    a_beats = numpy.asarray(a_beats, dtype=numpy.float64)
+    a_vals = numpy.asarray(a_vals, dtype=numpy.float64)
+    f_count = len(a_beats)
+    if a_keep is None:
+        f_result = numpy.zeros(f_count, dtype=bool)
+    else:
+        f_result = numpy.array(a_keep, dtype=bool)
+    if f_count <= 2:
+        f_result[:] = True
+        return f_result
+    f_result[0] = f_result[-1] = True
+    f_anchors = numpy.flatnonzero(f_result).tolist()
+    f_stack = list(zip(f_anchors, f_anchors[1:]))
+    while f_stack:
+        f_i, f_j = f_stack.pop()
+        if f_j - f_i < 2:
+            continue
+        f_beat_diff = a_beats[f_j] - a_beats[f_i]
+        if f_beat_diff > 0.0:
+            f_line = pydaw_curve_interpolate(
+                a_vals[f_i], a_vals[f_j],
+                (a_beats[f_i + 1:f_j] - a_beats[f_i]) / f_beat_diff)
+        else:
+            f_line = a_vals[f_i]
+        f_error = numpy.abs(a_vals[f_i + 1:f_j] - f_line)
+        f_max = int(numpy.argmax(f_error))
+        if f_error[f_max] > a_tolerance:
+            f_split = f_i + 1 + f_max
+            f_result[f_split] = True
+            f_stack.append((f_i, f_split))
+            f_stack.append((f_split, f_j))
+    return f_result
+
+def pydaw_curve_simplify_steps(a_vals, a_tolerance):
+    """ Simplification of events that hold their value until the next
+        event, like MIDI CCs and pitchbend.  An event is kept if it's
+        value differs from the last kept event by more than a_tolerance.
+        Returns a boolean array of the events to keep, the first and
+        last events are always kept
+    """
+    f_result = numpy.zeros(len(a_vals), dtype=bool)
+    f_last = None
+    for f_i, f_val in enumerate(numpy.asarray(a_vals).tolist()):
+        if f_last is None or abs(f_val - f_last) > a_tolerance:
+            f_result[f_i] = True
+            f_last = f_val
+    if len(f_result):
+        f_result[-1] = True
+    return f_result
@@ -13,27 +13,189 @@ MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
 GNU General Public License for more details.
 """
 
-import os, time, difflib
+import os, sys, time, difflib, pickle, tempfile, zlib, collections
+
+# Rough overhead of a Python object, for memory accounting
+OBJECT_OVERHEAD_BYTES = 56
+# Texts are compared this many characters at a time when looking for the
+# changed region, each comparison is a memcmp()
+COMPARE_BLOCK_SIZE = 4096
+
+# pydaw_history_log verbosity levels
+HISTORY_LOG_NONE = 0
+HISTORY_LOG_SUMMARY = 1
+HISTORY_LOG_DIFF = 2
+
+
+def _common_prefix_length(a_str1, a_str2, a_max):
+    """ The length of the common prefix of a_str1 and a_str2, up to a_max,
+        found by comparing slices rather than characters
+    """
+    f_lo = 0
+    while f_lo < a_max:
+        f_hi = min(f_lo + COMPARE_BLOCK_SIZE, a_max)
+        if a_str1[f_lo:f_hi] != a_str2[f_lo:f_hi]:
+            break
+        f_lo = f_hi
+    else:
+        return a_max
+    # The first difference is in [f_lo, f_hi), binary search for it
+    while f_hi - f_lo > 1:
+        f_mid = (f_lo + f_hi) // 2
+        if a_str1[f_lo:f_mid] == a_str2[f_lo:f_mid]:
+            f_lo = f_mid
+        else:
+            f_hi = f_mid
+    return f_lo
+
+def _common_suffix_length(a_str1, a_str2, a_max):
+    f_len1 = len(a_str1)
+    f_len2 = len(a_str2)
+    f_lo = 0
+    while f_lo < a_max:
+        f_hi = min(f_lo + COMPARE_BLOCK_SIZE, a_max)
+        if a_str1[f_len1 - f_hi:f_len1 - f_lo] != \
+        a_str2[f_len2 - f_hi:f_len2 - f_lo]:
+            break
+        f_lo = f_hi
+    else:
+        return a_max
+    while f_hi - f_lo > 1:
+        f_mid = (f_lo + f_hi) // 2
+        if a_str1[f_len1 - f_mid:f_len1 - f_lo] == \
+        a_str2[f_len2 - f_mid:f_len2 - f_lo]:
+            f_lo = f_mid
+        else:
+            f_hi = f_mid
+    return f_lo
 
 
 class pydaw_history_file:
+    """ The changes to one file in a commit, stored as the whole lines
+        between the first and last change in the old and new text, which
+        can be applied in either direction.  Finding them compares the
+        texts a block at a time, the line-level diff used for logging is
+        only computed when it is formatted
+    """
     def __init__(self, a_folder, a_file_name, a_text_new,
                  a_text_old, a_existed):
         self.folder = str(a_folder)
         self.file_name = str(a_file_name)
-        self.new_text = str(a_text_new)
-        self.old_text = str(a_text_old)
         self.existed = int(a_existed)
+        f_new_text = str(a_text_new)
+        f_old_text = str(a_text_old)
+        self.new_crc = zlib.crc32(f_new_text.encode())
+        self.old_crc = zlib.crc32(f_old_text.encode())
+        f_max = min(len(f_new_text), len(f_old_text))
+        f_start = _common_prefix_length(f_old_text, f_new_text, f_max)
+        f_end = _common_suffix_length(
+            f_old_text, f_new_text, f_max - f_start)
+        # Extend the changed region to whole lines
+        self.start = f_old_text.rfind("\n", 0, f_start) + 1
+        f_end_pos = f_old_text.find("\n", len(f_old_text) - f_end)
+        self.end = 0 if f_end_pos == -1 else len(f_old_text) - f_end_pos
+        self.start_line = f_old_text.count("\n", 0, self.start)
+        self.old_region = f_old_text[self.start:len(f_old_text) - self.end]
+        self.new_region = f_new_text[self.start:len(f_new_text) - self.end]
+        self.line_counts = None
+        self.byte_count = len(self.old_region) + len(self.new_region) + \
+            OBJECT_OVERHEAD_BYTES
+
+    def get_byte_count(self):
+        return self.byte_count
+
+    def get_opcodes(self):
+        """ Returns (old_lines, new_lines, opcodes), the line-level diff of
+            the changed region
+        """
+        f_old_lines = self.old_region.split("\n")
+        f_new_lines = self.new_region.split("\n")
+        f_opcodes = [
+            x for x in difflib.SequenceMatcher(
+                None, f_old_lines, f_new_lines).get_opcodes()
+            if x[0] != "equal"]
+        return f_old_lines, f_new_lines, f_opcodes
+
+    def get_line_counts(self):
+        """ Returns (lines_removed, lines_added) """
+        if self.line_counts is None:
+            f_opcodes = self.get_opcodes()[2]
+            self.line_counts = (
+                sum(x[2] - x[1] for x in f_opcodes),
+                sum(x[4] - x[3] for x in f_opcodes))
+        return self.line_counts
+
+    def get_summary(self):
+        f_removed, f_added = self.get_line_counts()
+        return "{}, existed: {}, -{} +{} lines".format(
+            os.path.join(self.folder, self.file_name), self.existed,
+            f_removed, f_added)
+
+    def apply(self, a_text, a_reverse=False):
+        """ Return a_text with the changes applied, or reverted if
+            a_reverse is True
+        """
+        if a_reverse:
+            f_from, f_to = self.new_region, self.old_region
+        else:
+            f_from, f_to = self.old_region, self.new_region
+        return "".join((
+            a_text[:self.start], f_to,
+            a_text[self.start + len(f_from):]))
 
     def __str__(self):
         """ Generate a human-readable summary of the changes """
         f_file_name = os.path.join(self.folder, self.file_name)
-        f_result = "\n\n{}, existed: {}\n".format(f_file_name, self.existed)
-        for f_line in difflib.unified_diff(
-        self.old_text.split("\n"), self.new_text.split("\n"),
-        f_file_name, f_file_name):
-            f_result += f_line + "\n"
-        return f_result
+        f_result = [
+            "\n\n{}, existed: {}".format(f_file_name, self.existed),
+            "--- {}".format(f_file_name), "+++ {}".format(f_file_name)]
+        f_old_lines, f_new_lines, f_opcodes = self.get_opcodes()
+        f_line = self.start_line + 1
+        for f_tag, i1, i2, j1, j2 in f_opcodes:
+            f_result.append("@@ -{},{} +{},{} @@".format(
+                f_line + i1, i2 - i1, f_line + j1, j2 - j1))
+            f_result.extend("-" + x for x in f_old_lines[i1:i2])
+            f_result.extend("+" + x for x in f_new_lines[j1:j2])
+        f_result.append("")
+        return "\n".join(f_result)
+
+class pydaw_history_log:
+    """ Bounded buffer of pydaw_history_file events.  Nothing is
+        formatted until flush() is called, and diffs of more than
+        a_max_lines changed lines are logged as a summary instead
+    """
+    def __init__(self, a_level, a_max_lines, a_max_events):
+        self.level = a_level
+        self.max_lines = a_max_lines
+        self.events = collections.deque(maxlen=a_max_events)
+        self.dropped = 0
+
+    def log(self, a_history_file):
+        if self.level == HISTORY_LOG_NONE:
+            return
+        if len(self.events) == self.events.maxlen:
+            self.dropped += 1
+        self.events.append(a_history_file)
+
+    def format_event(self, a_history_file):
+        if self.level >= HISTORY_LOG_DIFF and \
+        sum(a_history_file.get_line_counts()) <= self.max_lines:
+            return str(a_history_file)
+        return a_history_file.get_summary()
+
+    def flush(self, a_stream=None):
+        """ Write and clear all buffered events """
+        if not self.events and not self.dropped:
+            return
+        f_stream = a_stream if a_stream else sys.stdout
+        if self.dropped:
+            f_stream.write("{} history events dropped\n".format(
+                self.dropped))
+            self.dropped = 0
+        f_stream.write("\n".join(
+            self.format_event(x) for x in self.events))
+        f_stream.write("\n")
+        self.events.clear()
 
 class pydaw_history_commit:
     def __init__(self, a_files, a_message):
@@ -41,23 +203,134 @@ class pydaw_history_commit:
         self.message = a_message
         self.timestamp = int(time.time())
 
+    def get_byte_count(self):
+        return sum(x.get_byte_count() for x in self.files)
+
     def undo(self, a_project_folder):
-        for f_file in self.files:
+        for f_file in reversed(self.files):
             f_full_path = os.path.join(
                 a_project_folder, f_file.folder, f_file.file_name)
             if f_file.existed == 0:
                 os.remove(f_full_path)
             else:
-                self._write_file(f_full_path, f_file.old_text)
+                self._apply(f_full_path, f_file, True)
 
     def redo(self, a_project_folder):
         for f_file in self.files:
             f_full_path = os.path.join(
                 a_project_folder, f_file.folder, f_file.file_name)
-            self._write_file(f_full_path, f_file.new_text)
+            if f_file.existed == 0:
+                self._write_file(f_full_path, f_file.apply("", False))
+            else:
+                self._apply(f_full_path, f_file, False)
+
+    def _apply(self, a_path, a_file, a_reverse):
+        with open(a_path, newline="\n") as f_handle:
+            f_text = f_handle.read()
+        f_crc = zlib.crc32(f_text.encode())
+        if f_crc != (a_file.new_crc if a_reverse else a_file.old_crc):
+            print("WARNING:  {} was modified outside of the undo "
+                "history, applying changes anyway".format(a_path))
+        self._write_file(a_path, a_file.apply(f_text, a_reverse))
 
     def _write_file(self, a_file, a_text):
         f_file = open(a_file, "w", newline="\n")
         f_file.write(a_text)
         f_file.close()
 
+class pydaw_history_spilled_commit:
+    """ Placeholder for a commit that was pickled to disk to stay within
+        the memory cap of a pydaw_history_stack
+    """
+    def __init__(self, a_path, a_commit):
+        self.path = a_path
+        self.message = a_commit.message
+        self.timestamp = a_commit.timestamp
+        with open(a_path, "wb") as f_handle:
+            pickle.dump(a_commit, f_handle, pickle.HIGHEST_PROTOCOL)
+
+    def load(self):
+        with open(self.path, "rb") as f_handle:
+            return pickle.load(f_handle)
+
+    def undo(self, a_project_folder):
+        self.load().undo(a_project_folder)
+
+    def redo(self, a_project_folder):
+        self.load().redo(a_project_folder)
+
+class pydaw_history_stack:
+    """ The undo history of one undo context.  Once more than a_max_bytes
+        or a_max_count commits are held in memory, the oldest commits are
+        spilled to a temporary folder
+    """
+    def __init__(self, a_max_bytes, a_max_count):
+        self.max_bytes = a_max_bytes
+        self.max_count = a_max_count
+        self.commits = []
+        self.undo_cursor = 0
+        self.byte_count = 0
+        self.in_memory = 0  # commits[-in_memory:] are not spilled
+        self.spill_dir = None
+        self.spill_count = 0
+
+    def __len__(self):
+        return len(self.commits)
+
+    def append(self, a_commit):
+        """ Add a commit, discarding anything that was undone """
+        if self.undo_cursor > 0:
+            for f_commit in self.commits[-self.undo_cursor:]:
+                self._discard(f_commit)
+            self.commits = self.commits[:-self.undo_cursor]
+            self.undo_cursor = 0
+        self.commits.append(a_commit)
+        self.in_memory += 1
+        self.byte_count += a_commit.get_byte_count()
+        self._spill()
+
+    def undo(self, a_project_folder):
+        if self.undo_cursor >= len(self.commits):
+            return False
+        self.undo_cursor += 1
+        self.commits[-self.undo_cursor].undo(a_project_folder)
+        return True
+
+    def redo(self, a_project_folder):
+        if self.undo_cursor == 0:
+            return False
+        self.commits[-self.undo_cursor].redo(a_project_folder)
+        self.undo_cursor -= 1
+        return True
+
+    def _discard(self, a_commit):
+        if isinstance(a_commit, pydaw_history_spilled_commit):
+            os.remove(a_commit.path)
+        else:
+            self.in_memory -= 1
+            self.byte_count -= a_commit.get_byte_count()
+
+    def _spill(self):
+        while self.in_memory > 1 and (
+        self.byte_count > self.max_bytes or
+        self.in_memory > self.max_count):
+            if self.spill_dir is None:
+                self.spill_dir = tempfile.TemporaryDirectory(
+                    prefix="musikernel-undo-")
+            self.spill_count += 1
+            f_index = len(self.commits) - self.in_memory
+            f_commit = self.commits[f_index]
+            self.commits[f_index] = pydaw_history_spilled_commit(
+                os.path.join(self.spill_dir.name, "{}.pickle".format(
+                    self.spill_count)), f_commit)
+            self.in_memory -= 1
+            self.byte_count -= f_commit.get_byte_count()
+
+    def get_stats(self):
+        return {
+            "commits": len(self.commits),
+            "in_memory": self.in_memory,
+            "bytes": self.byte_count,
+            "max_bytes": self.max_bytes,
+            "max_count": self.max_count,
+        }
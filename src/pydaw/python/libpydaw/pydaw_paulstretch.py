@@ -19,7 +19,10 @@ GNU General Public License for more details.
 
 import sys
 import os
-import subprocess
+import multiprocessing
+import shutil
+import tempfile
+import time
 import numpy
 
 from optparse import OptionParser
@@ -34,6 +37,112 @@ f_parent_dir = os.path.abspath(os.path.join(f_parent_dir, ".."))
 sys.path.insert(0, f_parent_dir)
 
 import wavefile
+from libpydaw.pydaw_resample import pydaw_envelope_reader
+
+# The minimum number of frames to read from the input file at once
+READ_BLOCK_SIZE = 65536
+# The number of frames to buffer before writing to the output file
+WRITE_BLOCK_SIZE = 65536
+# The number of windows per FFT call in paulstretch_batched()
+PAULSTRETCH_BATCH_SIZE = 64
+# The number of output windows that share a phase randomization seed
+PHASE_BLOCK_SIZE = 64
+# The random phases of paulstretch_batched() are looked up in a table of
+# this many unit phasors, instead of calculating numpy.exp() of each one
+PHASE_TABLE_SIZE = 65536
+PHASE_TABLE = numpy.exp(
+    numpy.arange(PHASE_TABLE_SIZE) * (2. * numpy.pi / PHASE_TABLE_SIZE) * 1j)
+# The number of bands the spectrum is reduced to for onset detection
+NUM_BINS_SCALED_FREQ = 32
+
+
+class WindowReader:
+    """ Reads windows of a WaveReader on demand, only the samples from the
+        start of the last window onwards are kept in memory.  The last
+        a_end_size samples of the file are faded out as they are read.
+    """
+    def __init__(self, a_reader, a_windowsize, a_end_size):
+        self.reader = a_reader
+        self.channels = a_reader.channels
+        self.frames = a_reader.frames
+        self.windowsize = a_windowsize
+        self.block_size = max(a_windowsize, READ_BLOCK_SIZE)
+        self.fade_start = self.frames - a_end_size
+        self.fade = numpy.linspace(1.0, 0.0, a_end_size)
+        self.buf = numpy.zeros((self.channels, 0), numpy.float32)
+        # The position in the file of self.buf[:,0]
+        self.buf_start = 0
+
+    def read_block(self, a_pos, a_count):
+        f_block = numpy.zeros(
+            (self.channels, a_count), numpy.float32, order='F')
+        self.reader.read(f_block)
+        f_lo = max(a_pos, self.fade_start)
+        f_hi = a_pos + a_count
+        if f_lo < f_hi:
+            f_block[:,f_lo - a_pos:] *= self.fade[
+                f_lo - self.fade_start:f_hi - self.fade_start]
+        return f_block
+
+    def get(self, a_start):
+        """ Returns the samples from a_start to a_start + windowsize, or
+            to the end of the file.  a_start must not decrease
+        """
+        f_end = min(a_start + self.windowsize, self.frames)
+        f_buf_end = self.buf_start + self.buf.shape[1]
+        if a_start >= f_buf_end:
+            if a_start > f_buf_end:
+                self.reader.seek(a_start)
+            self.buf = self.buf[:,:0]
+            self.buf_start = f_buf_end = a_start
+        else:
+            self.buf = self.buf[:,a_start - self.buf_start:]
+            self.buf_start = a_start
+        if f_end > f_buf_end:
+            f_count = min(
+                max(f_end - f_buf_end, self.block_size),
+                self.frames - f_buf_end)
+            self.buf = numpy.concatenate(
+                (self.buf, self.read_block(f_buf_end, f_count)), 1)
+        return self.buf[:,:max(f_end - a_start, 0)]
+
+
+class BufferedWriter:
+    """ Collects output frames and writes them to a WaveWriter in blocks
+        of at least WRITE_BLOCK_SIZE frames
+    """
+    def __init__(self, a_writer):
+        self.writer = a_writer
+        self.pending = []
+        self.pending_frames = 0
+
+    def write(self, a_data):
+        self.pending.append(a_data)
+        self.pending_frames += a_data.shape[1]
+        if self.pending_frames >= WRITE_BLOCK_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.writer.write(numpy.concatenate(self.pending, 1))
+            self.pending = []
+            self.pending_frames = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+
+def open_source(a_path, a_pitch):
+    """ Open a_path, resampled in memory by a_pitch, (start, end) in
+        semitones, if it is not None.  This changes the length as well as
+        the pitch, unlike rubberband or sbsms, but the length does not
+        matter for a file that will be stretched anyway.
+    """
+    f_reader = wavefile.WaveReader(a_path)
+    if a_pitch is None:
+        return f_reader
+    return pydaw_envelope_reader(f_reader, a_pitch[0], a_pitch[1], True)
 
 
 def optimize_windowsize(n):
@@ -53,35 +162,35 @@ def optimize_windowsize(n):
 
 
 def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
-                outfilename, a_start_pitch, a_end_pitch, a_in_file):
+                outfilename, a_start_pitch, a_end_pitch, a_in_file,
+                a_seed=None, a_batch_size=0, a_jobs=1):
+    """ Render file_path stretched by stretch to outfilename.  The input
+        is read and the output written a block at a time, so memory use
+        does not depend on the length of the file.  Returns the number of
+        windows rendered.
+
+        @a_seed:        Seed for the phase randomization, the output is
+                        the same for the same seed
+        @a_batch_size:  Windows per FFT call, 0 for the original loop
+        @a_jobs:        Processes to render with, with a_batch_size > 0
+    """
     if not os.path.exists(file_path):
         print("Error: {} does not exist.".format(file_path))
         return
 
-    if a_start_pitch is not None:
+    if a_start_pitch is None:
+        f_pitch = None
+    else:
         print("Pitch shifting file")
-        f_src_path = file_path
-        f_dest_path = outfilename.replace(".wav", "-tmp.wav")
-        if a_end_pitch is not None and "win" not in sys.platform.lower():
-            f_cmd = [
-                os.path.join(
-                    INSTALL_PREFIX, "lib", global_pydaw_version_string,
-                    "sbsms", "bin", "sbsms"),
-                f_src_path, f_dest_path, "1.0", "1.0",
-                str(a_start_pitch), str(a_end_pitch)]
-        else:
-            f_cmd = [
-                os.path.join(
-                    INSTALL_PREFIX, "lib", global_pydaw_version_string,
-                    "rubberband", "bin", "rubberband"),
-                    "-p", str(a_start_pitch), "-R",
-                    "--pitch-hq", f_src_path, f_dest_path]
-        print("Running {}".format(" ".join(f_cmd)))
-        f_proc = subprocess.Popen(f_cmd)
-        f_proc.wait()
-        file_path = f_dest_path
-
-    f_reader = wavefile.WaveReader(file_path)
+        f_pitch = (
+            a_start_pitch,
+            a_start_pitch if a_end_pitch is None else a_end_pitch)
+    f_source = (file_path, f_pitch)
+    f_reader = open_source(*f_source)
+    if f_pitch is not None:
+        # Resampling changes the length, stretch the result to the
+        # length that was asked for
+        stretch *= float(f_reader.source_frames) / max(f_reader.frames, 1)
     samplerate = f_reader.samplerate
     nsamples = f_reader.frames
 
@@ -93,8 +202,8 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
 
     nchannels = f_reader.channels
 
-    outfile = wavefile.WaveWriter(outfilename, channels=nchannels,
-                                  samplerate=samplerate)
+    outfile = BufferedWriter(wavefile.WaveWriter(
+        outfilename, channels=nchannels, samplerate=samplerate))
 
     #make sure that windowsize is even and larger than 16
     windowsize = int(windowsize_seconds * samplerate)
@@ -104,35 +213,59 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
     windowsize = int(windowsize / 2) * 2
     half_windowsize = int(windowsize / 2)
 
-    smp = numpy.zeros((nchannels, nsamples), numpy.float32, order='F')
-    f_reader.read(smp)
-
-    #correct the end of the smp
+    #correct the end of the smp as it is read
 
     end_size = int(samplerate * 0.05)
     if end_size < 16:
         end_size = 16
 
-    smp[:,nsamples-end_size:nsamples] *= numpy.linspace(1.0, 0.0, end_size)
-
-    #compute the displacement inside the input file
-    start_pos = 0.0
-    displace_pos = windowsize * 0.5
-
     #create Hann window
     window = 0.5 - numpy.cos(numpy.arange(windowsize, dtype='double') * \
         2.0 * numpy.pi / (windowsize - 1)) * 0.5
 
-    old_windowed_buf = numpy.zeros((2,windowsize))
     hinv_sqrt2 = (1 + numpy.sqrt(0.5)) * 0.5
     hinv_buf = 2.0 * (hinv_sqrt2 - (1.0 - hinv_sqrt2) * \
         numpy.cos(numpy.arange(half_windowsize, dtype='double') \
         * 2.0 * numpy.pi / half_windowsize)) / hinv_sqrt2
 
-    freqs = numpy.zeros((2, half_windowsize + 1))
+    if a_batch_size > 0:
+        f_frames = paulstretch_batched(
+            f_source, outfilename, f_reader, outfile, stretch, onset_level,
+            windowsize, end_size, window, hinv_buf, a_seed, a_batch_size,
+            a_jobs)
+    else:
+        f_frames = paulstretch_frames(
+            f_reader, outfile, stretch, onset_level, windowsize, end_size,
+            window, hinv_buf, a_seed)
+
+    outfile.close()
+    f_reader.close()
+
+    return f_frames
+
+
+def paulstretch_frames(
+        f_reader, outfile, stretch, onset_level, windowsize, end_size,
+        window, hinv_buf, a_seed):
+    """ The original Paulstretch loop, one window at a time """
+    nchannels = f_reader.channels
+    nsamples = f_reader.frames
+    half_windowsize = int(windowsize / 2)
+    smp = WindowReader(f_reader, windowsize, end_size)
+
+    if a_seed is not None:
+        numpy.random.seed(a_seed)
+
+    #compute the displacement inside the input file
+    start_pos = 0.0
+    displace_pos = windowsize * 0.5
+
+    old_windowed_buf = numpy.zeros((nchannels, windowsize))
+
+    freqs = numpy.zeros((nchannels, half_windowsize + 1))
     old_freqs = freqs
 
-    num_bins_scaled_freq = 32
+    num_bins_scaled_freq = NUM_BINS_SCALED_FREQ
     freqs_scaled = numpy.zeros(num_bins_scaled_freq)
     old_freqs_scaled = freqs_scaled
 
@@ -142,6 +275,7 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
         displace_tick_increase = 1.0
     extra_onset_time_credit = 0.0
     get_next_buf = True
+    f_frames = 0
 
     while True:
         if get_next_buf:
@@ -150,10 +284,11 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
 
             #get the windowed buffer
             istart_pos = int(numpy.floor(start_pos))
-            buf = smp[:,istart_pos:istart_pos + windowsize]
+            buf = smp.get(istart_pos)
             if buf.shape[1] < windowsize:
                 buf = numpy.append(
-                    buf, numpy.zeros((2, windowsize - buf.shape[1])), 1)
+                    buf, numpy.zeros((nchannels, windowsize - buf.shape[1])),
+                    1)
             buf = buf * window
 
             # get the amplitudes of the frequency components
@@ -206,6 +341,7 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
         output *= hinv_buf
 
         outfile.write(output)
+        f_frames += 1
 
         if get_next_buf:
             start_pos += displace_pos
@@ -229,50 +365,437 @@ def paulstretch(file_path, stretch, windowsize_seconds, onset_level,
             displace_tick = displace_tick % 1.0
             get_next_buf = True
 
-    outfile.close()
-
-    if a_start_pitch is not None:
-        print("Deleting temp file {}".format(file_path))
-        os.remove(file_path)
-
+    return f_frames
+
+
+class FrameAnalyzer:
+    """ The magnitude spectra of the analysis windows of a file, computed
+        with one FFT per batch of windows.  Window k starts at
+        k * windowsize / 2, window -1 is silence.  Requests must not
+        move backwards, only the spectra from the start of the last
+        request onwards are kept.
+    """
+    def __init__(self, a_reader, a_windowsize, a_end_size, a_window):
+        self.smp = WindowReader(a_reader, a_windowsize, a_end_size)
+        self.channels = a_reader.channels
+        self.windowsize = a_windowsize
+        self.half_windowsize = a_windowsize // 2
+        self.window = a_window
+        self.first = -1
+        self.freqs = numpy.zeros((1, self.channels, self.half_windowsize + 1))
+
+    def analyze(self, a_first, a_last):
+        f_bufs = numpy.zeros(
+            (a_last - a_first + 1, self.channels, self.windowsize))
+        for f_i, f_k in enumerate(range(a_first, a_last + 1)):
+            f_smp = self.smp.get(f_k * self.half_windowsize)
+            f_bufs[f_i,:,:f_smp.shape[1]] = f_smp
+        f_bufs *= self.window
+        return numpy.abs(numpy.fft.rfft(f_bufs))
+
+    def get(self, a_first, a_last):
+        """ Returns the spectra of windows a_first to a_last inclusive as
+            a (windows, channels, bins) array
+        """
+        f_have_last = self.first + len(self.freqs) - 1
+        if a_first > f_have_last:
+            self.freqs = self.analyze(a_first, a_last)
+        else:
+            self.freqs = self.freqs[a_first - self.first:]
+            if a_last > f_have_last:
+                self.freqs = numpy.concatenate(
+                    (self.freqs, self.analyze(f_have_last + 1, a_last)))
+        self.first = a_first
+        return self.freqs[:a_last - a_first + 1]
+
+
+def frame_onsets(a_freqs, a_old_freqs_scaled):
+    """ The onset value of each spectrum in a_freqs, as computed by
+        paulstretch_frames(), and the scaled spectrum of the last one
+    """
+    f_count, f_channels, freqs_len = a_freqs.shape
+    if NUM_BINS_SCALED_FREQ < freqs_len:
+        freqs_len_div = freqs_len // NUM_BINS_SCALED_FREQ
+        new_freqs_len = freqs_len_div * NUM_BINS_SCALED_FREQ
+        freqs_scaled = numpy.mean(
+            numpy.mean(a_freqs, 1)[:,:new_freqs_len].reshape(
+            [f_count, NUM_BINS_SCALED_FREQ, freqs_len_div]), 2)
+    else:
+        freqs_scaled = numpy.zeros((f_count, NUM_BINS_SCALED_FREQ))
+    old_freqs_scaled = numpy.concatenate(
+        (a_old_freqs_scaled[numpy.newaxis], freqs_scaled[:-1]))
+    m = 2.0 * numpy.mean(freqs_scaled - old_freqs_scaled, 1) / \
+        (numpy.mean(numpy.abs(old_freqs_scaled), 1) + 1e-3)
+    return numpy.clip(m, 0.0, 1.0), freqs_scaled[-1]
+
+
+class StretchSchedule:
+    """ The displacement of paulstretch_frames() as a state machine,
+        frame() returns the interpolation position between the previous
+        and current analysis window of each output window that analysis
+        window produces
+    """
+    def __init__(self, a_stretch, a_onset_level):
+        self.onset_level = a_onset_level
+        self.displace_tick = 0.0
+        self.displace_tick_increase = min(1.0 / a_stretch, 1.0)
+        self.extra_onset_time_credit = 0.0
+
+    def frame(self, a_onset, a_is_last):
+        if a_onset > self.onset_level:
+            self.displace_tick = 1.0
+            self.extra_onset_time_credit += 1.0
+        f_result = [self.displace_tick]
+        if a_is_last:
+            return f_result
+        while True:
+            if self.extra_onset_time_credit <= 0.0:
+                self.displace_tick += self.displace_tick_increase
+            else:
+                #this must be less than displace_tick_increase
+                credit_get = 0.5 * self.displace_tick_increase
+                self.extra_onset_time_credit -= credit_get
+                if self.extra_onset_time_credit < 0:
+                    self.extra_onset_time_credit = 0
+                self.displace_tick += \
+                    self.displace_tick_increase - credit_get
+            if self.displace_tick >= 1.0:
+                self.displace_tick = self.displace_tick % 1.0
+                return f_result
+            f_result.append(self.displace_tick)
+
+
+class PhaseBlocks:
+    """ The random phase factors of the output windows.  They are
+        generated PHASE_BLOCK_SIZE windows at a time from a seed derived
+        from a_seed and the block number, so that any range of output
+        windows can be rendered on it's own and get the same phases.
+    """
+    def __init__(self, a_seed, a_channels, a_bins):
+        self.seed = a_seed
+        self.shape = (PHASE_BLOCK_SIZE, a_channels, a_bins)
+        self.block_num = None
+        self.block = None
+
+    def get_block(self, a_block_num):
+        if a_block_num != self.block_num:
+            f_random = numpy.random.RandomState(
+                [self.seed, a_block_num]).randint(
+                    0, PHASE_TABLE_SIZE, self.shape, dtype=numpy.uint16)
+            self.block = PHASE_TABLE.take(f_random)
+            self.block_num = a_block_num
+        return self.block
+
+    def get(self, a_start, a_count):
+        """ The phase factors of output windows a_start to
+            a_start + a_count as a (windows, channels, bins) array
+        """
+        f_result = []
+        f_pos = a_start
+        f_end = a_start + a_count
+        while f_pos < f_end:
+            f_block_num, f_offset = divmod(f_pos, PHASE_BLOCK_SIZE)
+            f_count = min(PHASE_BLOCK_SIZE - f_offset, f_end - f_pos)
+            f_result.append(
+                self.get_block(f_block_num)[f_offset:f_offset + f_count])
+            f_pos += f_count
+        if len(f_result) == 1:
+            return f_result[0]
+        return numpy.concatenate(f_result)
+
+
+class FrameSynthesizer:
+    """ Renders a batch of output windows with one inverse FFT """
+    def __init__(self, a_window, a_hinv_buf, a_phases, a_channels):
+        self.window = a_window
+        self.hinv_buf = a_hinv_buf
+        self.phases = a_phases
+        self.half_windowsize = len(a_window) // 2
+        self.old_windowed_buf = numpy.zeros((a_channels, len(a_window)))
+
+    def render(self, a_freqs, a_old_freqs, a_ticks, a_start):
+        """ Returns the output of windows a_start to a_start + len(a_ticks)
+            as a (channels, frames) array
+
+            @a_freqs:      The spectrum of the current analysis window of
+                           each output window
+            @a_old_freqs:  The spectrum of the previous analysis window of
+                           each output window
+            @a_ticks:      The position between them of each output window
+        """
+        f_count, f_channels, f_bins = a_freqs.shape
+        f_ticks = numpy.asarray(a_ticks)[:,numpy.newaxis,numpy.newaxis]
+        cfreqs = (a_freqs * f_ticks) + (a_old_freqs * (1.0 - f_ticks))
+        cfreqs = cfreqs * self.phases.get(a_start, f_count)
+        buf = numpy.fft.irfft(cfreqs)
+        buf *= self.window
+        half = self.half_windowsize
+        output = buf[:,:,:half].copy()
+        output[0] += self.old_windowed_buf[:,half:]
+        output[1:] += buf[:-1,:,half:]
+        self.old_windowed_buf = buf[-1]
+        output *= self.hinv_buf
+        return output.transpose(1, 0, 2).reshape(f_channels, f_count * half)
+
+
+def render_schedule(
+        a_analyzer, a_synth, a_windows, a_ticks, a_start, a_write,
+        a_batch_size):
+    """ Render the output windows a_start to a_start + len(a_windows), one
+        batch at a time
+
+        @a_windows:  The analysis window of each output window
+        @a_ticks:    The position of each output window between the
+                     previous and current analysis window
+        @a_write:    callable((channels, frames) array)
+    """
+    for f_i in range(0, len(a_windows), a_batch_size):
+        f_windows = a_windows[f_i:f_i + a_batch_size]
+        f_first = f_windows[0] - 1
+        f_freqs = a_analyzer.get(f_first, f_windows[-1])
+        a_write(
+            a_synth.render(
+                f_freqs[f_windows - f_first], f_freqs[f_windows - f_first - 1],
+                a_ticks[f_i:f_i + a_batch_size], a_start + f_i))
+
+
+def render_segment(a_args):
+    """ Process pool worker for paulstretch_batched(), renders part of the
+        output windows to a raw float64 file of interleaved frames.
+        When a_skip_first is True, the first window only overlaps the
+        previous segment and is not written.
+    """
+    (a_source, a_tmp_path, windowsize, end_size, window, hinv_buf, a_seed,
+     a_windows, a_ticks, a_start, a_skip_first, a_batch_size) = a_args
+    f_reader = open_source(*a_source)
+    f_analyzer = FrameAnalyzer(f_reader, windowsize, end_size, window)
+    f_synth = FrameSynthesizer(
+        window, hinv_buf,
+        PhaseBlocks(a_seed, f_reader.channels, windowsize // 2 + 1),
+        f_reader.channels)
+    f_skip = [windowsize // 2 if a_skip_first else 0]
+    with open(a_tmp_path, "wb") as f_file:
+        def write(a_data):
+            a_data.T[f_skip[0]:].tofile(f_file)
+            f_skip[0] = 0
+        render_schedule(
+            f_analyzer, f_synth, a_windows, a_ticks, a_start, write,
+            a_batch_size)
+    f_reader.close()
+    return a_tmp_path
+
+
+def split_schedule(a_window_starts, a_onsets, a_onset_level, a_count, a_jobs):
+    """ Returns the output windows to split the output at for a_jobs
+        segments, at the nearest analysis window with no onset to equal
+        sized segments
+    """
+    f_candidates = a_window_starts[a_onsets <= a_onset_level]
+    f_result = []
+    for f_i in range(1, a_jobs):
+        if not len(f_candidates):
+            break
+        f_target = (a_count * f_i) // a_jobs
+        f_split = int(f_candidates[
+            numpy.argmin(numpy.abs(f_candidates - f_target))])
+        if f_split > 0 and f_split < a_count and \
+        (not f_result or f_split > f_result[-1]):
+            f_result.append(f_split)
+    return f_result
+
+
+def paulstretch_batched(
+        a_source, outfilename, f_reader, outfile, stretch, onset_level,
+        windowsize, end_size, window, hinv_buf, a_seed, a_batch_size,
+        a_jobs):
+    """ Paulstretch with a_batch_size windows per FFT call.  With a_jobs
+        greater than 1 the onsets are found first, and the output is
+        split into that many segments rendered by a process pool.  The
+        output for a given seed does not depend on a_batch_size or
+        a_jobs, but is not the same as paulstretch_frames()
+    """
+    nchannels = f_reader.channels
+    half_windowsize = windowsize // 2
+    f_count = -(-f_reader.frames // half_windowsize)
+    if a_seed is None:
+        a_seed = numpy.random.randint(2 ** 31)
+    f_analyzer = FrameAnalyzer(f_reader, windowsize, end_size, window)
+    f_schedule = StretchSchedule(stretch, onset_level)
+    freqs_scaled = numpy.zeros(NUM_BINS_SCALED_FREQ)
+
+    if a_jobs <= 1:
+        f_synth = FrameSynthesizer(
+            window, hinv_buf,
+            PhaseBlocks(a_seed, nchannels, half_windowsize + 1), nchannels)
+        f_frames = 0
+        for f_first in range(0, f_count, a_batch_size):
+            f_last = min(f_first + a_batch_size, f_count) - 1
+            f_freqs = f_analyzer.get(f_first - 1, f_last)
+            f_onsets, freqs_scaled = frame_onsets(f_freqs[1:], freqs_scaled)
+            f_windows = []
+            f_ticks = []
+            for f_k, f_onset in zip(range(f_first, f_last + 1), f_onsets):
+                f_tick_list = f_schedule.frame(f_onset, f_k == f_count - 1)
+                f_windows.extend([f_k] * len(f_tick_list))
+                f_ticks.extend(f_tick_list)
+            render_schedule(
+                f_analyzer, f_synth, numpy.array(f_windows),
+                numpy.array(f_ticks), f_frames, outfile.write, a_batch_size)
+            f_frames += len(f_windows)
+        return f_frames
+
+    f_onsets = []
+    for f_first in range(0, f_count, a_batch_size):
+        f_last = min(f_first + a_batch_size, f_count) - 1
+        f_freqs = f_analyzer.get(f_first - 1, f_last)
+        f_block, freqs_scaled = frame_onsets(f_freqs[1:], freqs_scaled)
+        f_onsets.append(f_block)
+    f_onsets = numpy.concatenate(f_onsets)
+    f_windows = []
+    f_ticks = []
+    f_window_starts = numpy.zeros(f_count, dtype=numpy.intp)
+    for f_k, f_onset in enumerate(f_onsets.tolist()):
+        f_window_starts[f_k] = len(f_windows)
+        f_tick_list = f_schedule.frame(f_onset, f_k == f_count - 1)
+        f_windows.extend([f_k] * len(f_tick_list))
+        f_ticks.extend(f_tick_list)
+    f_windows = numpy.array(f_windows)
+    f_ticks = numpy.array(f_ticks)
+    f_frames = len(f_windows)
+
+    f_splits = [0] + split_schedule(
+        f_window_starts, f_onsets, onset_level, f_frames, a_jobs) + \
+        [f_frames]
+    f_args = []
+    for f_i in range(len(f_splits) - 1):
+        # Each segment after the first also renders the window before
+        # it, it's second half overlaps the first window of the segment
+        f_start = max(f_splits[f_i] - 1, 0)
+        f_end = f_splits[f_i + 1]
+        f_args.append((
+            a_source, "{}.{}.tmp".format(outfilename, f_i),
+            windowsize, end_size, window, hinv_buf, a_seed,
+            f_windows[f_start:f_end], f_ticks[f_start:f_end], f_start,
+            f_start != f_splits[f_i], a_batch_size))
+    f_pool = multiprocessing.Pool(min(a_jobs, len(f_args)))
+    try:
+        f_paths = f_pool.map(render_segment, f_args)
+    finally:
+        f_pool.close()
+        f_pool.join()
+    f_block_size = WRITE_BLOCK_SIZE * nchannels
+    for f_path in f_paths:
+        with open(f_path, "rb") as f_file:
+            while True:
+                f_data = numpy.fromfile(f_file, numpy.float64, f_block_size)
+                if not len(f_data):
+                    break
+                outfile.write(f_data.reshape(-1, nchannels).T)
+        os.remove(f_path)
+    return f_frames
+
+
+def benchmark(a_seconds, a_stretch, a_window_size, a_jobs):
+    """ Print the windows per second rendered by the original loop, the
+        batched loop, and the batched loop on a_jobs processes, for
+        a_seconds of generated stereo audio
+    """
+    f_dir = tempfile.mkdtemp()
+    f_src = os.path.join(f_dir, "src.wav")
+    f_samplerate = 44100
+    f_time = numpy.arange(int(a_seconds * f_samplerate)) / f_samplerate
+    f_smp = numpy.vstack((
+        numpy.sin(f_time * 2.0 * numpy.pi * 220.0),
+        numpy.sin(f_time * 2.0 * numpy.pi * 330.0))) * 0.3
+    f_smp += numpy.random.random(f_smp.shape) * 0.05
+    with wavefile.WaveWriter(
+    f_src, channels=2, samplerate=f_samplerate) as f_writer:
+        f_writer.write(f_smp.astype(numpy.float32))
+    f_base = None
+    try:
+        for f_name, f_batch_size, f_jobs in (
+        ("original", 0, 1),
+        ("batched", PAULSTRETCH_BATCH_SIZE, 1),
+        ("batched, {} jobs".format(a_jobs), PAULSTRETCH_BATCH_SIZE, a_jobs)):
+            f_start = time.perf_counter()
+            f_frames = paulstretch(
+                f_src, a_stretch, a_window_size, 10.0,
+                os.path.join(f_dir, "{}.wav".format(f_batch_size)),
+                None, None, f_src, 1, f_batch_size, f_jobs)
+            f_time = time.perf_counter() - f_start
+            f_rate = f_frames / f_time
+            if f_base is None:
+                f_base = f_rate
+            print("{}: {} windows in {}s, {} windows/s, {}x".format(
+                f_name, f_frames, round(f_time, 3), round(f_rate, 1),
+                round(f_rate / f_base, 2)))
+    finally:
+        shutil.rmtree(f_dir)
 
 
 ########################################
-print("Paul's Extreme Sound Stretch (Paulstretch) - Python version 20110223")
-print("new method: using onsets information")
-print("by Nasca Octavian PAUL, Targu Mures, Romania\n")
-parser = OptionParser(usage="usage: %prog [options] input_wav output_wav")
-parser.add_option("-s", "--stretch",
-                  dest="stretch", help="stretch amount (1.0 = no stretch)",
-                  type="float",default=8.0)
-parser.add_option("-w", "--window_size",
-                  dest="window_size", help="window size (seconds)",
-                  type="float", default=0.25)
-parser.add_option("-t", "--onset", dest="onset",
-                  help="onset sensitivity (0.0=max, 1.0=min)",
-                  type="float", default=10.0)
-parser.add_option("-p", "--start-pitch", dest="start_pitch",
-                  help="start pitch (36.0=max, -36.0=min)",
-                  type="float", default=None)
-parser.add_option("-e", "--end-pitch", dest="end_pitch",
-                  help="end pitch (36.0=max, -36.0=min)",
-                  type="float", default=None)
-
-(options, args) = parser.parse_args()
-
-if (len(args) < 2) or \
-(options.stretch <= 0.0) or \
-(options.window_size <= 0.001):
-    print("Error in command line parameters. Run this program with "
-        "--help for help.")
-    sys.exit(1)
-
-print("stretch amount = {}".format(options.stretch))
-print("window size = {} seconds".format(options.window_size))
-print("onset sensitivity = {}".format(options.onset))
-
-paulstretch(args[0], numpy.double(options.stretch),
-            numpy.double(options.window_size),
-            numpy.double(options.onset),
-            args[1], options.start_pitch,
-            options.end_pitch, args[0])
+if __name__ == "__main__":
+    print("Paul's Extreme Sound Stretch (Paulstretch) - "
+        "Python version 20110223")
+    print("new method: using onsets information")
+    print("by Nasca Octavian PAUL, Targu Mures, Romania\n")
+    parser = OptionParser(
+        usage="usage: %prog [options] input_wav output_wav")
+    parser.add_option("-s", "--stretch",
+                      dest="stretch", help="stretch amount (1.0 = no stretch)",
+                      type="float",default=8.0)
+    parser.add_option("-w", "--window_size",
+                      dest="window_size", help="window size (seconds)",
+                      type="float", default=0.25)
+    parser.add_option("-t", "--onset", dest="onset",
+                      help="onset sensitivity (0.0=max, 1.0=min)",
+                      type="float", default=10.0)
+    parser.add_option("-p", "--start-pitch", dest="start_pitch",
+                      help="start pitch (36.0=max, -36.0=min)",
+                      type="float", default=None)
+    parser.add_option("-e", "--end-pitch", dest="end_pitch",
+                      help="end pitch (36.0=max, -36.0=min)",
+                      type="float", default=None)
+    parser.add_option("-r", "--seed", dest="seed",
+                      help="random seed, for repeatable output",
+                      type="int", default=None)
+    parser.add_option("-b", "--batch-size", dest="batch_size",
+                      help="windows per FFT, 0 for the original loop",
+                      type="int", default=PAULSTRETCH_BATCH_SIZE)
+    parser.add_option("-j", "--jobs", dest="jobs",
+                      help="processes to render with, 0 for all CPUs",
+                      type="int", default=1)
+    parser.add_option("--benchmark", dest="benchmark",
+                      help="compare the speed of each method on 30 "
+                      "seconds of generated audio", action="store_true",
+                      default=False)
+
+    (options, args) = parser.parse_args()
+
+    if options.jobs <= 0:
+        options.jobs = multiprocessing.cpu_count()
+
+    if options.benchmark:
+        benchmark(
+            30.0, options.stretch, options.window_size,
+            options.jobs if options.jobs > 1 else
+            multiprocessing.cpu_count())
+        sys.exit(0)
+
+    if (len(args) < 2) or \
+    (options.stretch <= 0.0) or \
+    (options.window_size <= 0.001):
+        print("Error in command line parameters. Run this program with "
+            "--help for help.")
+        sys.exit(1)
+
+    print("stretch amount = {}".format(options.stretch))
+    print("window size = {} seconds".format(options.window_size))
+    print("onset sensitivity = {}".format(options.onset))
+
+    paulstretch(args[0], numpy.double(options.stretch),
+                numpy.double(options.window_size),
+                numpy.double(options.onset),
+                args[1], options.start_pitch,
+                options.end_pitch, args[0], options.seed,
+                options.batch_size, options.jobs)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Resampling with a rate or pitch envelope, the time-stretch modes where
+pitch and time change together.  The same cubic interpolation as
+v_pydaw_rate_envelope() and v_pydaw_pitch_envelope() in the engine, but
+the input is read and the output written a block at a time.
+"""
+
+import math
+import numpy
+
+try:
+    import wavefile
+except Exception:
+    # wavefile raises Exception if libsndfile can not be loaded
+    wavefile = None
+
+# Change this when changes to the algorithm change the output, it is part
+# of the key of cached results
+RESAMPLE_VERSION = 1
+# The number of frames to read or resample at once
+RESAMPLE_BLOCK_SIZE = 65536
+SEMITONE_LOG = math.log(2.0) / 12.0
+
+
+class pydaw_envelope_map:
+    """ Maps output frames to positions in the input.  The rate (or for
+        pitch envelopes 2 ** (semitones / 12)) changes linearly with the
+        position in the input from a_start at the start to a_end at the
+        end of a_frames.  The positions are the closed-form solution of
+        dp/dn = rate(p), so any range of them can be computed at once.
+    """
+    def __init__(self, a_frames, a_start, a_end, a_is_pitch):
+        self.frames = a_frames
+        if a_is_pitch:
+            self.rate = math.exp(SEMITONE_LOG * a_start)
+            # rate(p) = rate * exp(slope * p)
+            self.slope = SEMITONE_LOG * (a_end - a_start) / max(a_frames, 1)
+        else:
+            if a_start <= 0.0 or a_end <= 0.0:
+                raise ValueError(
+                    "The rate must be greater than 0, not {} to {}".format(
+                        a_start, a_end))
+            self.rate = float(a_start)
+            # rate(p) = rate + slope * p
+            self.slope = (a_end - a_start) / max(a_frames, 1)
+        self.is_pitch = a_is_pitch
+        self.count = self.get_count()
+
+    def position(self, a_n):
+        """ The position in the input of output frames a_n """
+        a_n = numpy.asarray(a_n, dtype=numpy.float64)
+        if self.slope == 0.0:
+            return a_n * self.rate
+        if self.is_pitch:
+            return -numpy.log1p(-a_n * self.slope * self.rate) / self.slope
+        else:
+            return self.rate * numpy.expm1(self.slope * a_n) / self.slope
+
+    def get_count(self):
+        """ The number of output frames, the number of positions before
+            the end of the input
+        """
+        if self.slope == 0.0:
+            f_n = self.frames / self.rate
+        elif self.is_pitch:
+            f_n = -math.expm1(-self.slope * self.frames) / \
+                (self.slope * self.rate)
+        else:
+            f_n = math.log1p(self.slope * self.frames / self.rate) / \
+                self.slope
+        f_count = max(int(math.ceil(f_n)), 0)
+        # Correct for rounding either way
+        while f_count > 0 and self.position(f_count - 1) >= self.frames:
+            f_count -= 1
+        while self.position(f_count) < self.frames:
+            f_count += 1
+        return f_count
+
+
+class pydaw_stream_input:
+    """ Random access to the frames of a WaveReader, reading forward a
+        block at a time.  Frames before the start or after the end wrap
+        around to the other end of the file, as in
+        f_cubic_interpolate_ptr_wrap()
+    """
+    def __init__(self, a_reader):
+        self.reader = a_reader
+        self.channels = a_reader.channels
+        self.frames = a_reader.frames
+        self.all = None
+        if self.frames <= RESAMPLE_BLOCK_SIZE:
+            self.all = self.read(self.frames)
+            return
+        self.reader.seek(self.frames - 2)
+        self.tail = self.read(2)
+        self.reader.seek(0)
+        self.head = self.read(1)
+        self.buf = self.head
+        self.buf_start = 0
+
+    def read(self, a_count):
+        f_result = numpy.zeros(
+            (self.channels, a_count), numpy.float32, order='F')
+        self.reader.read(f_result)
+        return f_result
+
+    def get(self, a_lo, a_hi):
+        """ Returns frames a_lo to a_hi, a_lo should not decrease between
+            calls or the file will be read again
+        """
+        if self.all is not None:
+            return self.all.take(numpy.arange(a_lo, a_hi), 1, mode='wrap')
+        f_parts = []
+        if a_lo < 0:
+            f_parts.append(self.tail[:,a_lo:])
+        f_lo = max(a_lo, 0)
+        f_hi = min(a_hi, self.frames)
+        f_buf_end = self.buf_start + self.buf.shape[1]
+        if f_lo < self.buf_start or f_lo > f_buf_end:
+            self.reader.seek(f_lo)
+            self.buf = self.buf[:,:0]
+            self.buf_start = f_buf_end = f_lo
+        else:
+            self.buf = self.buf[:,f_lo - self.buf_start:]
+            self.buf_start = f_lo
+        if f_hi > f_buf_end:
+            f_count = min(
+                max(f_hi - f_buf_end, RESAMPLE_BLOCK_SIZE),
+                self.frames - f_buf_end)
+            self.buf = numpy.concatenate((self.buf, self.read(f_count)), 1)
+        f_parts.append(self.buf[:,:f_hi - f_lo])
+        if a_hi > self.frames:
+            f_parts.append(self.head[:,:a_hi - self.frames])
+        if len(f_parts) == 1:
+            return f_parts[0]
+        return numpy.concatenate(f_parts, 1)
+
+
+class pydaw_envelope_reader:
+    """ A WaveReader of the audio of a_reader resampled with a rate or
+        pitch envelope, so that it can be used without writing it to a
+        file first
+    """
+    def __init__(self, a_reader, a_start, a_end, a_is_pitch):
+        self.source = pydaw_stream_input(a_reader)
+        self.map = pydaw_envelope_map(
+            a_reader.frames, a_start, a_end, a_is_pitch)
+        self.reader = a_reader
+        self.channels = a_reader.channels
+        self.samplerate = a_reader.samplerate
+        self.source_frames = a_reader.frames
+        self.frames = self.map.count
+        self.pos = 0
+
+    def seek(self, a_frames, a_whence=0):
+        self.pos = a_frames
+
+    def read(self, a_data):
+        """ Fill a_data, a (channels, frames) array, returns the number of
+            frames read
+        """
+        f_count = max(min(a_data.shape[1], self.frames - self.pos), 0)
+        if not f_count:
+            return 0
+        f_pos = self.map.position(
+            numpy.arange(self.pos, self.pos + f_count))
+        f_int = f_pos.astype(numpy.intp)
+        f_mu = (f_pos - f_int).astype(numpy.float32)
+        f_lo = f_int[0] - 2
+        f_smp = self.source.get(f_lo, f_int[-1] + 2)
+        f_int -= f_lo
+        y0 = f_smp[:,f_int - 2]
+        y1 = f_smp[:,f_int - 1]
+        y2 = f_smp[:,f_int]
+        y3 = f_smp[:,f_int + 1]
+        a0 = y3 - y2 - y0 + y1
+        a1 = y0 - y1 - a0
+        a2 = y2 - y0
+        a_data[:,:f_count] = (((a0 * f_mu) + a1) * f_mu + a2) * f_mu + y1
+        self.pos += f_count
+        return f_count
+
+    def close(self):
+        self.reader.close()
+
+
+def pydaw_render_envelope(a_file_in, a_file_out, a_start, a_end, a_is_pitch):
+    f_reader = pydaw_envelope_reader(
+        wavefile.WaveReader(a_file_in), a_start, a_end, a_is_pitch)
+    try:
+        with wavefile.WaveWriter(
+        a_file_out, channels=f_reader.channels,
+        samplerate=f_reader.samplerate) as f_writer:
+            f_buf = numpy.zeros(
+                (f_reader.channels, RESAMPLE_BLOCK_SIZE), numpy.float32,
+                order='F')
+            while True:
+                f_count = f_reader.read(f_buf)
+                if not f_count:
+                    break
+                f_writer.write(f_buf[:,:f_count])
+    finally:
+        f_reader.close()
+
+def pydaw_rate_envelope(a_file_in, a_file_out, a_start, a_end):
+    """ Resample a_file_in to a_file_out, changing pitch and time by a
+        rate that goes from a_start to a_end
+    """
+    pydaw_render_envelope(a_file_in, a_file_out, a_start, a_end, False)
+
+def pydaw_pitch_envelope(a_file_in, a_file_out, a_start, a_end):
+    """ Resample a_file_in to a_file_out, changing pitch and time by a
+        number of semitones that goes from a_start to a_end
+    """
+    pydaw_render_envelope(a_file_in, a_file_out, a_start, a_end, True)
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+"""
+
+import hashlib
+import json
+import lzma
+import os
+import tarfile
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+SNAPSHOT_FORMAT = "musikernel-snapshot"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXT = ".mksnap"
+OBJECTS_FOLDER = "objects"
+# The snapshots that existed at the last gc(), used to only collect blobs
+# when a snapshot was deleted
+GC_STATE_FILE = "gc.json"
+# Also collect blobs this often, for those left by interrupted snapshots
+GC_MAX_AGE = 7 * 24 * 60 * 60
+# Re-scan the project this many times looking for a pass where nothing
+# changed before giving up on a snapshot
+SNAPSHOT_MAX_PASSES = 5
+
+LZMA_MAGIC = b"\xfd7zXZ\x00"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+SNAPSHOT_CODECS = {
+    "fast": lambda x: zlib.compress(x, 1),
+    "zlib": lambda x: zlib.compress(x, 6),
+    "xz": lambda x: lzma.compress(x, preset=6),
+}
+
+if zstandard:
+    SNAPSHOT_CODECS["zstd"] = lambda x: \
+        zstandard.ZstdCompressor(level=3).compress(x)
+
+
+def pydaw_decompress_blob(a_data):
+    """ Blobs are decompressed according to their magic number, so that
+        changing the codec never breaks existing backups
+    """
+    if a_data.startswith(LZMA_MAGIC):
+        return lzma.decompress(a_data)
+    elif a_data.startswith(ZSTD_MAGIC):
+        if not zstandard:
+            raise Exception(
+                "The zstandard module is required to read this backup")
+        return zstandard.ZstdDecompressor().decompress(
+            a_data, max_output_size=2 ** 31)
+    else:
+        return zlib.decompress(a_data)
+
+
+class SnapshotCancelled(Exception):
+    pass
+
+
+class pydaw_snapshot_store:
+    """ Content-addressed project backups.  Each file is stored once as a
+        blob in a_backups_folder/objects, compressed with a_codec (one of
+        SNAPSHOT_CODECS) and named by the SHA-1 of its contents.  A
+        snapshot is a JSON manifest in a_backups_folder that maps each
+        relative path to a blob, along with the size and mtime the file
+        had, so that unchanged files don't need to be read again for the
+        next snapshot.
+    """
+    def __init__(self, a_backups_folder, a_codec="fast"):
+        self.backups_folder = str(a_backups_folder)
+        self.objects_folder = os.path.join(
+            self.backups_folder, OBJECTS_FOLDER)
+        if a_codec not in SNAPSHOT_CODECS:
+            print("Unknown backup codec '{}', using 'fast'".format(a_codec))
+            a_codec = "fast"
+        self.compress = SNAPSHOT_CODECS[a_codec]
+
+    def blob_path(self, a_hash):
+        return os.path.join(self.objects_folder, a_hash[:2], a_hash[2:])
+
+    def read_manifest(self, a_name):
+        f_path = os.path.join(self.backups_folder, a_name)
+        if not os.path.isfile(f_path) or tarfile.is_tarfile(f_path):
+            return None
+        try:
+            with open(f_path) as f_handle:
+                f_result = json.load(f_handle)
+        except (ValueError, UnicodeDecodeError):
+            return None
+        if not isinstance(f_result, dict) or \
+        f_result.get("format") != SNAPSHOT_FORMAT:
+            return None
+        return f_result
+
+    def list_files(self, a_project_folder, a_arcname):
+        """ Return (dirs, files) lists of paths relative to
+            a_project_folder for everything under a_arcname
+        """
+        f_dirs = []
+        f_files = []
+        f_root = os.path.join(a_project_folder, a_arcname)
+        for f_dir, f_subdirs, f_names in os.walk(f_root):
+            f_subdirs.sort()
+            f_rel_dir = os.path.relpath(f_dir, a_project_folder)
+            f_dirs.append(f_rel_dir.replace(os.sep, "/"))
+            for f_name in sorted(f_names):
+                f_files.append(
+                    os.path.join(f_rel_dir, f_name).replace(os.sep, "/"))
+        return f_dirs, f_files
+
+    def store_blob(self, a_data):
+        f_hash = hashlib.sha1(a_data).hexdigest()
+        f_path = self.blob_path(f_hash)
+        if not os.path.exists(f_path):
+            f_dir = os.path.dirname(f_path)
+            if not os.path.isdir(f_dir):
+                os.makedirs(f_dir)
+            f_tmp = "{}.tmp".format(f_path)
+            with open(f_tmp, "wb") as f_handle:
+                f_handle.write(self.compress(a_data))
+            os.replace(f_tmp, f_path)
+        return f_hash
+
+    def read_blob(self, a_hash):
+        with open(self.blob_path(a_hash), "rb") as f_handle:
+            f_result = pydaw_decompress_blob(f_handle.read())
+        if hashlib.sha1(f_result).hexdigest() != a_hash:
+            raise Exception("Corrupt backup object {}".format(a_hash))
+        return f_result
+
+    def create(
+            self, a_name, a_project_folder, a_arcname, a_parent=None,
+            a_progress_callback=None, a_is_cancelled=None):
+        """ Snapshot everything under a_project_folder/a_arcname.  Safe to
+            call from a worker thread while the project is being edited:
+            files that change while being read are read again, and the
+            manifest is only written after a full pass over the project
+            finds every file unchanged from what was stored.
+
+            @a_name:   The file name of the new manifest
+            @a_parent: The name of the previous snapshot, it's files are
+                       not re-read if their size and mtime are unchanged
+            @a_progress_callback:  callable(files_done, files_total)
+            @a_is_cancelled:       callable() that returns True to abort
+        """
+        f_parent = self.read_manifest(a_parent) if a_parent else None
+        f_known = dict(f_parent["files"]) if f_parent else {}
+        for f_pass in range(SNAPSHOT_MAX_PASSES):
+            f_dirs, f_paths = self.list_files(a_project_folder, a_arcname)
+            f_files = {}
+            f_changed = False
+            for f_index, f_rel_path in enumerate(f_paths):
+                if a_is_cancelled and a_is_cancelled():
+                    raise SnapshotCancelled()
+                f_path = os.path.join(a_project_folder, f_rel_path)
+                f_file = self.stat_file(f_path, f_known.get(f_rel_path))
+                if f_file is None:
+                    f_changed = True
+                    f_file = self.read_file(f_path)
+                    if f_file is None:
+                        continue
+                    f_known[f_rel_path] = f_file
+                f_files[f_rel_path] = f_file
+                if a_progress_callback:
+                    a_progress_callback(f_index + 1, len(f_paths))
+            if not f_changed:
+                break
+        else:
+            raise Exception(
+                "The project kept changing while creating backup "
+                "'{}'".format(a_name))
+        f_manifest = {
+            "format": SNAPSHOT_FORMAT, "version": SNAPSHOT_VERSION,
+            "parent": a_parent, "dirs": f_dirs, "files": f_files}
+        self.write_manifest(a_name, f_manifest)
+        return f_manifest
+
+    def stat_file(self, a_path, a_file):
+        """ Return a_file if the file at a_path still matches it and
+            it's blob exists, otherwise None
+        """
+        if not a_file:
+            return None
+        try:
+            f_stat = os.stat(a_path)
+        except FileNotFoundError:
+            return None
+        if a_file["size"] == f_stat.st_size and \
+        a_file["mtime"] == f_stat.st_mtime_ns and \
+        os.path.exists(self.blob_path(a_file["hash"])):
+            return a_file
+        return None
+
+    def read_file(self, a_path):
+        """ Store the contents of a_path, return None if it was deleted or
+            modified while being read
+        """
+        try:
+            f_stat = os.stat(a_path)
+            with open(a_path, "rb") as f_handle:
+                f_data = f_handle.read()
+            f_stat2 = os.stat(a_path)
+        except FileNotFoundError:
+            return None
+        if f_stat.st_mtime_ns != f_stat2.st_mtime_ns or \
+        len(f_data) != f_stat2.st_size:
+            return None
+        return {
+            "hash": self.store_blob(f_data), "size": f_stat2.st_size,
+            "mtime": f_stat2.st_mtime_ns}
+
+    def write_manifest(self, a_name, a_manifest):
+        f_path = os.path.join(self.backups_folder, a_name)
+        f_tmp = "{}.tmp".format(f_path)
+        with open(f_tmp, "w", newline="\n") as f_handle:
+            json.dump(a_manifest, f_handle, sort_keys=True, indent=1)
+        os.replace(f_tmp, f_path)
+
+    def list_snapshots(self):
+        """ The names of the snapshots and legacy archives, without
+            reading them
+        """
+        return sorted(
+            x for x in os.listdir(self.backups_folder)
+            if x != GC_STATE_FILE and not x.endswith(".tmp") and
+            os.path.isfile(os.path.join(self.backups_folder, x)))
+
+    def gc_needed(self):
+        """ True if a snapshot was deleted since the last gc(), or it was
+            not run for GC_MAX_AGE seconds
+        """
+        if not os.path.isdir(self.objects_folder):
+            return False
+        try:
+            with open(os.path.join(
+            self.backups_folder, GC_STATE_FILE)) as f_handle:
+                f_state = json.load(f_handle)
+            f_last = set(f_state["snapshots"])
+            f_time = float(f_state["time"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return True
+        if time.time() - f_time > GC_MAX_AGE:
+            return True
+        return not f_last.issubset(self.list_snapshots())
+
+    def gc(self):
+        """ Delete the blobs that no snapshot refers to any more, and any
+            left behind by an interrupted write.  Must not be called while
+            a snapshot is being created.  This reads every manifest, call
+            it when gc_needed().  Returns the number of files deleted
+        """
+        if not os.path.isdir(self.objects_folder):
+            return 0
+        f_used = set()
+        f_snapshots = self.list_snapshots()
+        for f_name in f_snapshots:
+            f_manifest = self.read_manifest(f_name)
+            if f_manifest is not None:
+                f_used.update(
+                    x["hash"] for x in f_manifest["files"].values())
+        f_count = 0
+        for f_prefix in os.listdir(self.objects_folder):
+            f_dir = os.path.join(self.objects_folder, f_prefix)
+            if not os.path.isdir(f_dir):
+                continue
+            for f_name in os.listdir(f_dir):
+                if f_prefix + f_name not in f_used:
+                    os.remove(os.path.join(f_dir, f_name))
+                    f_count += 1
+            if not os.listdir(f_dir):
+                os.rmdir(f_dir)
+        self.write_manifest(
+            GC_STATE_FILE, {"snapshots": f_snapshots, "time": time.time()})
+        return f_count
+
+    def extract(self, a_name, a_dest_folder):
+        """ Recreate the files of snapshot or legacy tar archive a_name
+            in a_dest_folder
+        """
+        f_manifest = self.read_manifest(a_name)
+        if f_manifest is None:
+            f_path = os.path.join(self.backups_folder, a_name)
+            with tarfile.open(f_path, "r:bz2") as f_tar:
+                f_tar.extractall(a_dest_folder)
+            return
+        for f_dir in f_manifest["dirs"]:
+            f_path = os.path.join(a_dest_folder, *f_dir.split("/"))
+            if not os.path.isdir(f_path):
+                os.makedirs(f_path)
+        for f_rel_path, f_file in f_manifest["files"].items():
+            f_path = os.path.join(a_dest_folder, *f_rel_path.split("/"))
+            with open(f_path, "wb") as f_handle:
+                f_handle.write(self.read_blob(f_file["hash"]))
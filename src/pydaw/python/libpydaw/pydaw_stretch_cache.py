@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import time
+
+STRETCH_CACHE_FORMAT = "musikernel-stretch-cache"
+STRETCH_CACHE_VERSION = 1
+STRETCH_CACHE_INDEX = "index.json"
+STRETCH_CACHE_LOCK = "index.lock"
+OBJECTS_FOLDER = "objects"
+HASH_BLOCK_SIZE = 1024 * 1024
+# Seconds to wait for another process to release the lock
+LOCK_TIMEOUT = 30.0
+# A lock older than this many seconds was left by a process that crashed,
+# nothing holds the lock for longer than it takes to write the index
+LOCK_STALE_AGE = 120.0
+# Temporary files older than this many seconds were left by a process
+# that crashed while copying into the cache
+TMP_STALE_AGE = 3600.0
+
+_TOOL_VERSIONS = {}
+
+
+def pydaw_hash_file(a_path):
+    """ The SHA-1 of the contents of a_path """
+    f_hash = hashlib.sha1()
+    with open(a_path, "rb") as f_handle:
+        while True:
+            f_data = f_handle.read(HASH_BLOCK_SIZE)
+            if not f_data:
+                break
+            f_hash.update(f_data)
+    return f_hash.hexdigest()
+
+def pydaw_stretch_tool_version(a_path, a_default):
+    """ Identify the version of the time-stretch tool at a_path by the
+        size and mtime of the executable, the tools have no common way to
+        report a version.  Returns a_default if a_path does not exist
+    """
+    if a_path not in _TOOL_VERSIONS:
+        try:
+            f_stat = os.stat(a_path)
+            _TOOL_VERSIONS[a_path] = "{}:{}:{}".format(
+                os.path.basename(a_path), f_stat.st_size,
+                f_stat.st_mtime_ns)
+        except (OSError, TypeError):
+            _TOOL_VERSIONS[a_path] = a_default
+    return _TOOL_VERSIONS[a_path]
+
+
+class pydaw_stretch_cache:
+    """ Time-stretched audio shared by every project on this machine,
+        named by the hash of the source audio, the stretch parameters and
+        the version of the tool that rendered it, so that renaming or
+        re-importing a file, or re-using it in another project does not
+        render it again.  Files are hard-linked into the project when
+        possible.  The least recently used files are deleted when the
+        cache grows larger than a_max_bytes.
+
+        index.json holds the hash and size of each file, used to check
+        it's integrity before it is used, and the hashes of the source
+        files keyed by their path, size and mtime.  Every change to it is
+        made while holding index.lock, so that several instances can
+        share the cache.
+    """
+    def __init__(self, a_folder, a_max_bytes):
+        self.folder = str(a_folder)
+        self.max_bytes = a_max_bytes
+        self.objects_folder = os.path.join(self.folder, OBJECTS_FOLDER)
+        self.index_file = os.path.join(self.folder, STRETCH_CACHE_INDEX)
+        self.lock_file = os.path.join(self.folder, STRETCH_CACHE_LOCK)
+        self.lock_depth = 0
+        self.index = None
+        self.index_stat = None
+        # Files that were verified this session, {path: (size, mtime)}
+        self.verified = {}
+
+    def object_path(self, a_key):
+        return os.path.join(
+            self.objects_folder, a_key[:2], "{}.wav".format(a_key[2:]))
+
+    def _get_index_stat(self):
+        try:
+            f_stat = os.stat(self.index_file)
+        except OSError:
+            return None
+        return (f_stat.st_mtime_ns, f_stat.st_ino, f_stat.st_size)
+
+    @contextlib.contextmanager
+    def locked(self):
+        """ Hold the lock file for a read-modify-write of the index, the
+            index is re-read when the lock is acquired.  Raises
+            TimeoutError if another process holds it for too long
+        """
+        if self.lock_depth:
+            self.lock_depth += 1
+            try:
+                yield
+            finally:
+                self.lock_depth -= 1
+            return
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        f_timeout = time.time() + LOCK_TIMEOUT
+        while True:
+            try:
+                f_fd = os.open(
+                    self.lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                os.write(f_fd, str(os.getpid()).encode("ascii"))
+                os.close(f_fd)
+                break
+            except FileExistsError:
+                try:
+                    f_age = time.time() - os.stat(self.lock_file).st_mtime
+                except OSError:
+                    continue
+                if f_age > LOCK_STALE_AGE:
+                    print("Removing stale lock {}".format(self.lock_file))
+                    try:
+                        os.remove(self.lock_file)
+                    except OSError:
+                        pass
+                elif time.time() > f_timeout:
+                    raise TimeoutError(
+                        "Timed out waiting for {}".format(self.lock_file))
+                else:
+                    time.sleep(0.01)
+        self.lock_depth = 1
+        # The mtime may not change if another process wrote the index
+        # within the resolution of the filesystem's timestamps
+        self.index = None
+        try:
+            yield
+        finally:
+            self.lock_depth = 0
+            try:
+                os.remove(self.lock_file)
+            except OSError as ex:
+                print("Error removing {}: {}".format(self.lock_file, ex))
+
+    def get_index(self):
+        """ The index, re-read if another process has changed it """
+        f_stat = self._get_index_stat()
+        if self.index is None or f_stat != self.index_stat:
+            f_index = None
+            if f_stat is not None:
+                try:
+                    with open(self.index_file) as f_handle:
+                        f_index = json.load(f_handle)
+                except (OSError, ValueError, UnicodeDecodeError) as ex:
+                    print("Error reading {}: {}".format(self.index_file, ex))
+            if not isinstance(f_index, dict) or \
+            f_index.get("format") != STRETCH_CACHE_FORMAT or \
+            f_index.get("version") != STRETCH_CACHE_VERSION:
+                f_index = {
+                    "format": STRETCH_CACHE_FORMAT,
+                    "version": STRETCH_CACHE_VERSION,
+                    "entries": {}, "sources": {}}
+            self.index = f_index
+            self.index_stat = f_stat
+        return self.index
+
+    def save_index(self):
+        """ Must be called while holding locked() """
+        assert self.lock_depth, "save_index() without the lock"
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        f_tmp = "{}.{}.tmp".format(self.index_file, os.getpid())
+        with open(f_tmp, "w", newline="\n") as f_handle:
+            json.dump(self.index, f_handle, sort_keys=True, indent=1)
+        os.replace(f_tmp, self.index_file)
+        self.index_stat = self._get_index_stat()
+
+    def hash_source(self, a_path):
+        """ The hash of source file a_path, only re-read if it's size or
+            mtime changed.  Returns None if it does not exist
+        """
+        try:
+            f_stat = os.stat(a_path)
+        except OSError:
+            return None
+        f_sources = self.get_index()["sources"]
+        f_known = f_sources.get(a_path)
+        if f_known and f_known[0] == f_stat.st_size and \
+        f_known[1] == f_stat.st_mtime_ns:
+            return f_known[2]
+        f_hash = pydaw_hash_file(a_path)
+        with self.locked():
+            self.get_index()["sources"][a_path] = [
+                f_stat.st_size, f_stat.st_mtime_ns, f_hash]
+            self.save_index()
+        return f_hash
+
+    def make_key(self, a_src_path, a_params, a_tool_version):
+        """ Returns the cache key for stretching a_src_path with a_params,
+            a tuple of the mode and stretch parameters, or None if
+            a_src_path does not exist
+        """
+        f_hash = self.hash_source(a_src_path)
+        if f_hash is None:
+            return None
+        f_key = json.dumps([f_hash, list(a_params), a_tool_version])
+        return hashlib.sha1(f_key.encode("utf-8")).hexdigest()
+
+    def verify(self, a_key):
+        """ Returns True if the file for a_key exists and matches the
+            index, otherwise removes it from the cache
+        """
+        f_entry = self.get_index()["entries"].get(a_key)
+        if f_entry is None:
+            return False
+        f_path = self.object_path(a_key)
+        try:
+            f_stat = os.stat(f_path)
+        except OSError:
+            f_stat = None
+        if f_stat is not None and f_stat.st_size == f_entry["size"]:
+            f_sig = (f_stat.st_size, f_stat.st_mtime_ns)
+            if self.verified.get(f_path) == f_sig:
+                return True
+            if pydaw_hash_file(f_path) == f_entry["hash"]:
+                self.verified[f_path] = f_sig
+                return True
+        with self.locked():
+            # Another process may have replaced it since it was checked
+            if self.get_index()["entries"].get(a_key) == f_entry:
+                print("Removing corrupt or missing time-stretch cache "
+                    "file {}".format(f_path))
+                self.remove(a_key)
+                self.save_index()
+        return False
+
+    def lookup(self, a_key, a_dest_path):
+        """ Hard-link or copy the cached file for a_key to a_dest_path,
+            returns False if it is not in the cache
+        """
+        if not self.verify(a_key):
+            return False
+        f_path = self.object_path(a_key)
+        f_dir = os.path.dirname(a_dest_path)
+        if not os.path.isdir(f_dir):
+            os.makedirs(f_dir)
+        if os.path.exists(a_dest_path):
+            os.remove(a_dest_path)
+        # Hold the lock so that another process can not delete the file
+        # before it is linked
+        with self.locked():
+            f_entry = self.get_index()["entries"].get(a_key)
+            if f_entry is None:
+                return False
+            try:
+                os.link(f_path, a_dest_path)
+            except OSError:
+                shutil.copyfile(f_path, a_dest_path)
+            f_entry["atime"] = time.time()
+            self.save_index()
+        return True
+
+    def store(self, a_key, a_path):
+        """ Add rendered file a_path to the cache as a_key """
+        f_dest = self.object_path(a_key)
+        f_dir = os.path.dirname(f_dest)
+        if not os.path.isdir(f_dir):
+            os.makedirs(f_dir)
+        f_tmp = "{}.{}.tmp".format(f_dest, os.getpid())
+        # Copy rather than link, so that the cache does not depend on
+        # what happens to the project's file later
+        shutil.copyfile(a_path, f_tmp)
+        f_hash = pydaw_hash_file(f_tmp)
+        with self.locked():
+            os.replace(f_tmp, f_dest)
+            f_stat = os.stat(f_dest)
+            self.get_index()["entries"][a_key] = {
+                "hash": f_hash, "size": f_stat.st_size,
+                "atime": time.time()}
+            self.verified[f_dest] = (f_stat.st_size, f_stat.st_mtime_ns)
+            self.gc()
+            self.save_index()
+
+    def remove(self, a_key):
+        """ Must be called while holding locked() """
+        self.get_index()["entries"].pop(a_key, None)
+        f_path = self.object_path(a_key)
+        self.verified.pop(f_path, None)
+        if os.path.isfile(f_path):
+            os.remove(f_path)
+
+    def gc(self, a_max_bytes=None):
+        """ Delete the least recently used files until the cache is no
+            larger than a_max_bytes, files in objects/ that are not in the
+            index, and forget source files that no longer exist.  Must be
+            called while holding locked(), the caller must save_index()
+        """
+        if a_max_bytes is None:
+            a_max_bytes = self.max_bytes
+        f_index = self.get_index()
+        f_entries = f_index["entries"]
+        f_total = sum(x["size"] for x in f_entries.values())
+        for f_key in sorted(f_entries, key=lambda x: f_entries[x]["atime"]):
+            if f_total <= a_max_bytes:
+                break
+            f_total -= f_entries[f_key]["size"]
+            self.remove(f_key)
+        self.remove_orphans()
+        f_sources = f_index["sources"]
+        for f_path in [x for x in f_sources if not os.path.isfile(x)]:
+            f_sources.pop(f_path)
+        return f_total
+
+    def remove_orphans(self):
+        """ Delete files in objects/ that are not in the index, left by
+            a process that crashed or an index that could not be read,
+            and stale temporary files.  Must be called while holding
+            locked()
+        """
+        if not os.path.isdir(self.objects_folder):
+            return
+        f_entries = self.get_index()["entries"]
+        f_now = time.time()
+        for f_prefix in os.listdir(self.objects_folder):
+            f_dir = os.path.join(self.objects_folder, f_prefix)
+            if not os.path.isdir(f_dir):
+                continue
+            for f_name in os.listdir(f_dir):
+                f_path = os.path.join(f_dir, f_name)
+                try:
+                    if f_name.endswith(".tmp"):
+                        # Another process may still be copying it
+                        if f_now - os.stat(f_path).st_mtime < TMP_STALE_AGE:
+                            continue
+                    elif f_name.endswith(".wav") and \
+                    "{}{}".format(f_prefix, f_name[:-4]) in f_entries:
+                        continue
+                    print("Removing unreferenced time-stretch cache "
+                        "file {}".format(f_path))
+                    os.remove(f_path)
+                    self.verified.pop(f_path, None)
+                except OSError as ex:
+                    print("Error removing {}: {}".format(f_path, ex))
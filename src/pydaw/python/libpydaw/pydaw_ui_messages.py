@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+This file is part of the MusiKernel project, Copyright MusiKernel Team
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3 of the License.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+Decoding and dispatch of the messages the engine sends to the UI.
+Text messages are newline delimited key|value lines, when the engine
+runs as a shared library the peak meters and playback cursor are also
+sent as binary records, see i_ui_pack_header() in the engine.
+"""
+
+import numpy
+
+# Must match MK_UI_MSG_* in musikernel.h
+UI_MSG_PEAK = 1
+UI_MSG_CURSOR = 2
+
+UI_MSG_HEADER_DTYPE = numpy.dtype([("type", "=i4"), ("count", "=i4")])
+# t_ui_peak
+UI_PEAK_DTYPE = numpy.dtype(
+    [("track_num", "=i4"), ("left", "=f4"), ("right", "=f4")])
+
+UI_MSG_DTYPES = {
+    UI_MSG_PEAK: UI_PEAK_DTYPE,
+    UI_MSG_CURSOR: numpy.dtype("=f8"),
+}
+
+
+def pydaw_decode_binary(a_data):
+    """ Returns a list of (type, numpy array) for each record of a
+        binary message
+    """
+    f_result = []
+    f_pos = 0
+    f_len = len(a_data)
+    f_header_size = UI_MSG_HEADER_DTYPE.itemsize
+    while f_pos + f_header_size <= f_len:
+        f_type, f_count = numpy.frombuffer(
+            a_data, UI_MSG_HEADER_DTYPE, 1, f_pos)[0].tolist()
+        f_pos += f_header_size
+        if f_type not in UI_MSG_DTYPES:
+            print("Unknown binary UI message type {}".format(f_type))
+            break
+        f_dtype = UI_MSG_DTYPES[f_type]
+        f_size = f_dtype.itemsize * f_count
+        if f_count < 0 or f_pos + f_size > f_len:
+            print("Truncated binary UI message type {}".format(f_type))
+            break
+        f_result.append(
+            (f_type, numpy.frombuffer(a_data, f_dtype, f_count, f_pos)))
+        f_pos += f_size
+    return f_result
+
+def pydaw_decode_peaks(a_val):
+    """ Decode the text form of a peak message,
+        "track:left:right|track:left:right..." into a UI_PEAK_DTYPE array
+    """
+    f_fields = a_val.replace(":", "|").split("|")
+    f_result = numpy.zeros(len(f_fields) // 3, dtype=UI_PEAK_DTYPE)
+    for f_i, f_name in enumerate(UI_PEAK_DTYPE.names):
+        f_result[f_name] = numpy.array(
+            f_fields[f_i::3], dtype=UI_PEAK_DTYPE[f_name])
+    return f_result
+
+
+class pydaw_ui_message_dispatcher:
+    """ Dispatches engine messages to handlers with dict lookups
+
+        @a_handlers:   {key: callable(value)} called for each text message
+        @a_coalesced:  {key: callable(dict)} for messages of the form
+                       key|id1|id2|value where only the last value for
+                       each (id1, id2) matters, the handler is called
+                       once per message with {(id1, id2): value}
+        @a_binary:     {UI_MSG_*: callable(numpy array)} for each record
+                       of a binary message
+    """
+    def __init__(self, a_handlers, a_coalesced=None, a_binary=None):
+        self.handlers = a_handlers
+        self.coalesced = a_coalesced if a_coalesced else {}
+        self.binary = a_binary if a_binary else {}
+
+    def dispatch(self, a_msg):
+        """ a_msg is bytes for binary messages, else str """
+        if isinstance(a_msg, bytes):
+            self.dispatch_binary(a_msg)
+        else:
+            self.dispatch_text(a_msg)
+
+    def dispatch_binary(self, a_data):
+        for f_type, f_arr in pydaw_decode_binary(a_data):
+            if f_type in self.binary:
+                self.binary[f_type](f_arr)
+
+    def dispatch_text(self, a_text):
+        f_handlers = self.handlers
+        f_coalesced = self.coalesced
+        f_values = {}
+        for f_line in a_text.split("\n"):
+            if f_line == "":
+                break
+            f_key, f_val = f_line.split("|", 1)
+            if f_key in f_coalesced:
+                f_id1, f_id2, f_val = f_val.split("|", 2)
+                if f_key not in f_values:
+                    f_values[f_key] = {}
+                f_values[f_key][(f_id1, f_id2)] = f_val
+            elif f_key in f_handlers:
+                f_handlers[f_key](f_val)
+        # Call the coalesced handlers in the order that they are declared
+        for f_key, f_handler in f_coalesced.items():
+            if f_key in f_values:
+                f_handler(f_values[f_key])
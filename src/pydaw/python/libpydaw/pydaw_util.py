@@ -18,6 +18,7 @@ import sys
 import ctypes
 import random
 import re
+import struct
 import subprocess
 import time
 import math
@@ -125,6 +126,9 @@ ENGINE_LIB = None
 ENGINE_LIB_THREAD = None
 ENGINE_LIB_CALLBACK = None
 ENGINE_LIB_CALLBACK_SIG = None
+ENGINE_LIB_BINARY_CALLBACK = None
+# False if the engine library predates v_configure_bulk()
+ENGINE_LIB_BULK = False
 
 ICON_PATH = os.path.join(
     INSTALL_PREFIX, "share", "pixmaps",
@@ -141,8 +145,12 @@ elif IS_LINUX:
 elif IS_MAC_OSX:
     DLL_EXT = ".dylib"
 
-def load_engine_lib(a_engine_callback):
-    global ENGINE_LIB, ENGINE_LIB_CALLBACK, ENGINE_LIB_CALLBACK_SIG
+def load_engine_lib(a_engine_callback, a_engine_binary_callback=None):
+    """ a_engine_binary_callback:  callable(path, data) for the binary
+            messages of the engine, data is bytes
+    """
+    global ENGINE_LIB, ENGINE_LIB_CALLBACK, ENGINE_LIB_CALLBACK_SIG, \
+        ENGINE_LIB_BULK, ENGINE_LIB_BINARY_CALLBACK
     f_dll_name = "{}{}".format(global_pydaw_version_string, DLL_EXT)
     f_dll = os.path.join(MKENGINE_DIR, f_dll_name)
     print("Using {}".format(f_dll))
@@ -152,6 +160,15 @@ def load_engine_lib(a_engine_callback):
     ENGINE_LIB.v_configure.argstype = [
         ctypes.c_char_p, ctypes.c_char_p, ctypes.c_char_p]
     ENGINE_LIB.v_configure.restype = ctypes.c_int
+    try:
+        ENGINE_LIB.v_configure_bulk.argtypes = [
+            ctypes.c_char_p, ctypes.c_char_p, ctypes.c_int]
+        ENGINE_LIB.v_configure_bulk.restype = ctypes.c_int
+        ENGINE_LIB_BULK = True
+    except AttributeError:
+        print("{} has no v_configure_bulk, sending configure messages "
+            "one at a time".format(f_dll_name))
+        ENGINE_LIB_BULK = False
     if IS_WINDOWS:
         ENGINE_LIB_CALLBACK_SIG = ctypes.WINFUNCTYPE(
             None, ctypes.c_char_p, ctypes.c_char_p)
@@ -161,6 +178,17 @@ def load_engine_lib(a_engine_callback):
     ENGINE_LIB_CALLBACK = ENGINE_LIB_CALLBACK_SIG(a_engine_callback)
     ENGINE_LIB.v_set_ui_callback.restype = None
     ENGINE_LIB.v_set_ui_callback(ENGINE_LIB_CALLBACK)
+    if a_engine_binary_callback and \
+    hasattr(ENGINE_LIB, "v_set_ui_binary_callback"):
+        f_func_type = ctypes.WINFUNCTYPE if IS_WINDOWS else ctypes.CFUNCTYPE
+        f_sig = f_func_type(
+            None, ctypes.c_char_p, ctypes.c_void_p, ctypes.c_int)
+        # The engine frees the buffer when the callback returns
+        ENGINE_LIB_BINARY_CALLBACK = f_sig(
+            lambda path, data, size: a_engine_binary_callback(
+                path, ctypes.string_at(data, size)))
+        ENGINE_LIB.v_set_ui_binary_callback.restype = None
+        ENGINE_LIB.v_set_ui_binary_callback(ENGINE_LIB_BINARY_CALLBACK)
 
 ENGINE_RETCODE = None
 
@@ -224,6 +252,37 @@ def engine_lib_configure(a_path, a_key, a_val):
     ENGINE_LIB.v_configure(
         a_path.encode("ascii"), a_key.encode("ascii"), a_val.encode("ascii"))
 
+def pydaw_pack_configure(a_messages):
+    """ Pack a list of (key, value) or (key, value, data) tuples into the
+        buffer format of the engine's v_configure_bulk(): 3 native int32
+        lengths, then the key, value and data bytes.  data is the text of
+        a file the engine would otherwise read from disk, a length of -1
+        means no data
+    """
+    f_result = []
+    for f_message in a_messages:
+        f_key = f_message[0].encode("ascii")
+        f_val = str(f_message[1]).encode("ascii")
+        if len(f_message) > 2 and f_message[2] is not None:
+            f_data = str(f_message[2]).encode("utf-8")
+            f_data_len = len(f_data)
+        else:
+            f_data = b""
+            f_data_len = -1
+        f_result.append(struct.pack(
+            "=iii", len(f_key), len(f_val), f_data_len))
+        f_result.extend((f_key, f_val, f_data))
+    return b"".join(f_result)
+
+def engine_lib_configure_bulk(a_path, a_messages):
+    """ Send many configure messages to the engine library in one call,
+        the engine reads them directly from the packed buffer.  Returns
+        the number of messages the engine did not handle
+    """
+    f_buffer = pydaw_pack_configure(a_messages)
+    return ENGINE_LIB.v_configure_bulk(
+        a_path.encode("ascii"), f_buffer, len(f_buffer))
+
 
 def pydaw_set_bin_path():
     global BIN_PATH
@@ -1174,8 +1233,10 @@ def pydaw_rgb_plus(a_rgb, a_amt):
     return f_result
 
 class pydaw_name_uid_dict:
-    def gen_file_name_uid(self):
-        while self.high_uid in self.name_lookup:
+    def gen_file_name_uid(self, a_reserved=()):
+        """ @a_reserved:  uids that are in use but not in the dict yet """
+        while self.high_uid in self.name_lookup or \
+        self.high_uid in a_reserved:
             self.high_uid += 1
         return self.high_uid
 
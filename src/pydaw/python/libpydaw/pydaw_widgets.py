@@ -1113,11 +1113,13 @@ def add_mul_dialog(a_update_callback, a_save_callback):
     return f_dialog.retval
 
 
-def lfo_dialog(a_update_callback, a_save_callback):
+def lfo_dialog(a_update_callback, a_save_callback, a_shapes=None):
     """ Generic dialog for doing event transforms that are LFO-like.
         The actual transforms are performed by the caller using the
         event callbacks.  The caller should create a list of event
-        objects and their original values.
+        objects and their original values.  If a_shapes is a list of
+        waveform names, the selected one is passed as the last argument
+        to a_update_callback
     """
     def ok_handler():
         f_dialog.close()
@@ -1127,6 +1129,8 @@ def lfo_dialog(a_update_callback, a_save_callback):
         f_vals = [x.control.value() for x in f_controls]
         f_vals += [x.control.value() if y.isChecked() else z.control.value()
             for x, y, z in f_optional_controls]
+        if a_shapes:
+            f_vals.append(str(f_shape_combobox.currentText()))
         a_update_callback(*f_vals)
 
     def save(*args):
@@ -1152,6 +1156,14 @@ def lfo_dialog(a_update_callback, a_save_callback):
         0, 100, 0, KC_DECIMAL)
     f_phase_knob.add_to_grid_layout(f_layout, 0)
 
+    if a_shapes:
+        f_layout.addWidget(QLabel(_("Shape")), 4, 0)
+        f_shape_combobox = QComboBox()
+        f_shape_combobox.setMinimumWidth(90)
+        f_shape_combobox.addItems(list(a_shapes))
+        f_shape_combobox.currentIndexChanged.connect(update_and_save)
+        f_layout.addWidget(f_shape_combobox, 5, 0)
+
     f_start_freq_knob = pydaw_knob_control(
         f_knob_size, _("Start Freq"), 0, save, update,
         10, 400, 100, KC_DECIMAL)
@@ -37,6 +37,140 @@ import subprocess
 HOST_INDEX_DAW_NEXT = 0
 HOST_INDEX_WAVE_NEXT = 1
 
+# Hand the OSC messages from the engine to the UI at most this often
+OSC_FRAME_MS = pydaw_util.get_file_setting("osc_frame_ms", int, 16)
+# Only the last of these messages received in a frame is delivered
+OSC_LATEST_ONLY_KEYS = ("cur", "wec")
+
+
+class OscReceiverThread(QtCore.QThread):
+    """ Drains the OSC server on it's own thread and hands everything
+        received for a path to the UI thread as one message per frame.
+        Older cursor messages are dropped, and peak messages are merged
+        so that only the latest value for each track is delivered.
+    """
+    batch_ready = QtCore.pyqtSignal(str, list, float)
+
+    def __init__(self, a_server, a_paths):
+        QtCore.QThread.__init__(self)
+        self.server = a_server
+        self.stopped = False
+        # {path: (lines, {key: line}, {track: peak}, first receive time)}
+        self.pending = {}
+        self.received = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.delivered = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        for f_path in a_paths:
+            a_server.add_method(f_path, "s", self.on_message)
+
+    def stop(self):
+        self.stopped = True
+
+    def on_message(self, a_path, a_args):
+        """ Called from self.server.recv() on the receiver thread """
+        self.received += 1
+        if a_path not in self.pending:
+            self.pending[a_path] = ([], {}, {}, time.perf_counter())
+        f_lines, f_latest, f_peaks, f_time = self.pending[a_path]
+        for f_line in a_args[0].split("\n"):
+            if f_line == "":
+                break
+            try:
+                self.add_line(f_line, f_lines, f_latest, f_peaks)
+            except Exception as ex:
+                self.errors += 1
+                print("Error parsing OSC message {} {}: {}".format(
+                    a_path, repr(f_line), ex))
+        self.queue_depth += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+
+    def add_line(self, a_line, a_lines, a_latest, a_peaks):
+        f_key, f_val = a_line.split("|", 1)
+        if f_key == "peak":
+            for f_peak in f_val.split("|"):
+                f_track = f_peak.split(":", 1)[0]
+                if f_track in a_peaks:
+                    self.coalesced += 1
+                a_peaks[f_track] = f_peak
+        elif f_key in OSC_LATEST_ONLY_KEYS:
+            if f_key in a_latest:
+                self.coalesced += 1
+            a_latest[f_key] = a_line
+        else:
+            a_lines.append(a_line)
+
+    def flush(self):
+        for f_path, (f_lines, f_latest, f_peaks, f_time) in \
+        self.pending.items():
+            f_lines.extend(f_latest.values())
+            if f_peaks:
+                f_lines.append("peak|{}".format("|".join(f_peaks.values())))
+            f_lines.append("")
+            self.batch_ready.emit(f_path, ["\n".join(f_lines)], f_time)
+        self.pending = {}
+        self.queue_depth = 0
+
+    def run(self):
+        f_frame = OSC_FRAME_MS * 0.001
+        f_next = time.perf_counter() + f_frame
+        while not self.stopped:
+            # Keep receiving if one message or batch fails, otherwise
+            # the UI would silently stop getting updates from the engine
+            try:
+                f_timeout = int((f_next - time.perf_counter()) * 1000.0)
+                if self.server.recv(max(f_timeout, 0)):
+                    while self.server.recv(0):
+                        pass
+            except Exception as ex:
+                self.errors += 1
+                print("Error receiving OSC messages: {}".format(ex))
+            if time.perf_counter() >= f_next:
+                try:
+                    if self.pending:
+                        self.flush()
+                except Exception as ex:
+                    self.errors += 1
+                    print("Error delivering OSC messages: {}".format(ex))
+                    self.pending = {}
+                    self.queue_depth = 0
+                f_next = time.perf_counter() + f_frame
+
+    def add_latency(self, a_time):
+        """ Called by the UI thread when it processes a batch with the
+            time that the oldest message in it was received
+        """
+        f_latency = time.perf_counter() - a_time
+        self.delivered += 1
+        self.last_latency = f_latency
+        self.max_latency = max(self.max_latency, f_latency)
+        self.total_latency += f_latency
+
+    def get_metrics(self):
+        """ Returns a dict of the receive statistics, latencies are the
+            time from receiving a message to the UI thread processing it,
+            in milliseconds
+        """
+        return {
+            "received": self.received,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "delivered": self.delivered,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "last_latency_ms": round(self.last_latency * 1000.0, 3),
+            "max_latency_ms": round(self.max_latency * 1000.0, 3),
+            "avg_latency_ms": round(
+                self.total_latency * 1000.0 / self.delivered, 3)
+                if self.delivered else 0.0,
+        }
+
+
 class MkIpc(libmk.AbstractIPC):
     def __init__(self):
         libmk.AbstractIPC.__init__(self, True, "/musikernel/master")
@@ -51,11 +185,12 @@ class MkIpc(libmk.AbstractIPC):
         self.send_configure("abort", "")
 
     def pydaw_master_vol(self, a_vol):
-        self.send_configure("mvol", str(round(a_vol, 8)))
+        self.send_configure_coalesced("mvol", None, str(round(a_vol, 8)))
 
     def pydaw_update_plugin_control(self, a_plugin_uid, a_port, a_val):
-        self.send_configure(
-            "pc", "|".join(str(x) for x in (a_plugin_uid, a_port, a_val)))
+        self.send_configure_coalesced(
+            "pc", (a_plugin_uid, a_port),
+            "|".join(str(x) for x in (a_plugin_uid, a_port, a_val)))
 
     def pydaw_configure_plugin(self, a_plugin_uid, a_key, a_message):
         self.send_configure(
@@ -102,8 +237,8 @@ class MkIpc(libmk.AbstractIPC):
         self.send_configure("wr", str(a_uid))
 
     def audio_input_volume(self, a_index, a_vol):
-        self.send_configure(
-            "aiv", "|".join(str(x) for x in (a_index, a_vol)))
+        self.send_configure_coalesced(
+            "aiv", a_index, "|".join(str(x) for x in (a_index, a_vol)))
 
     def pause_engine(self):
         self.send_configure("engine", "1")
@@ -261,6 +396,9 @@ class SplashScreen(QSplashScreen):
 def engine_lib_callback(a_path, a_msg):
     MAIN_WINDOW.engine_lib_callback(a_path, a_msg)
 
+def engine_lib_binary_callback(a_path, a_data):
+    MAIN_WINDOW.engine_lib_binary_callback(a_path, a_data)
+
 
 class MkMainWindow(QMainWindow):
     dawnext_callback = QtCore.pyqtSignal(str, list)
@@ -309,6 +447,16 @@ class MkMainWindow(QMainWindow):
             self.transport_stack, alignment=QtCore.Qt.AlignLeft)
         self.transport_hlayout.addItem(QSpacerItem(
             1, 1, QSizePolicy.Expanding))
+        self.backup_progress = QProgressBar()
+        self.backup_progress.setMaximumWidth(180)
+        self.backup_progress.setFormat(_("Backup %p%"))
+        self.backup_progress.hide()
+        self.transport_hlayout.addWidget(self.backup_progress)
+        self.backup_cancel_button = QPushButton(_("Cancel"))
+        self.backup_cancel_button.setToolTip(_("Cancel the current backup"))
+        self.backup_cancel_button.pressed.connect(self.on_backup_cancel)
+        self.backup_cancel_button.hide()
+        self.transport_hlayout.addWidget(self.backup_cancel_button)
 
         self.main_stack = QStackedWidget()
         self.transport_splitter.addWidget(self.main_stack)
@@ -471,7 +619,8 @@ class MkMainWindow(QMainWindow):
                 "musikernel/wavenext": self.wavenext_callback,
                 "musikernel/dawnext": self.dawnext_callback
                 }
-            pydaw_util.load_engine_lib(engine_lib_callback)
+            pydaw_util.load_engine_lib(
+                engine_lib_callback, engine_lib_binary_callback)
         else:
             try:
                 self.osc_server = liblo.Server(30321)
@@ -480,17 +629,17 @@ class MkMainWindow(QMainWindow):
                 self.osc_server = None
             if self.osc_server is not None:
                 print(self.osc_server.get_url())
-                self.osc_server.add_method(
-                    "musikernel/wavenext", 's',
-                    wavenext.MAIN_WINDOW.configure_callback)
-                self.osc_server.add_method(
-                    "musikernel/dawnext", 's',
-                    dawnext.MAIN_WINDOW.configure_callback)
+                self.osc_callback_dict = {
+                    "musikernel/wavenext":
+                        wavenext.MAIN_WINDOW.configure_callback,
+                    "musikernel/dawnext":
+                        dawnext.MAIN_WINDOW.configure_callback,
+                }
+                self.osc_receiver = OscReceiverThread(
+                    self.osc_server, self.osc_callback_dict)
                 self.osc_server.add_method(None, None, self.osc_fallback)
-                self.osc_timer = QtCore.QTimer(self)
-                self.osc_timer.setSingleShot(False)
-                self.osc_timer.timeout.connect(self.osc_time_callback)
-                self.osc_timer.start(0)
+                self.osc_receiver.batch_ready.connect(self.on_osc_batch)
+                self.osc_receiver.start()
 
             if pydaw_util.global_pydaw_with_audio:
                 self.subprocess_timer = QtCore.QTimer(self)
@@ -511,6 +660,11 @@ class MkMainWindow(QMainWindow):
         f_msg = [a_msg.decode("utf-8")]
         self.engine_callback_dict[f_path].emit(f_path, f_msg)
 
+    def engine_lib_binary_callback(self, a_path, a_data):
+        """ The hosts' configure_callback()s receive a_data as bytes """
+        f_path = a_path.decode("utf-8")
+        self.engine_callback_dict[f_path].emit(f_path, [a_data])
+
     def resizeEvent(self, a_event):
         if self.suppress_resize_events:
             return
@@ -666,8 +820,9 @@ class MkMainWindow(QMainWindow):
         except Exception as ex:
             print("subprocess_monitor: {}".format(ex))
 
-    def osc_time_callback(self):
-        self.osc_server.recv(1)
+    def on_osc_batch(self, a_path, a_msg, a_time):
+        self.osc_receiver.add_latency(a_time)
+        self.osc_callback_dict[a_path](a_path, a_msg)
 
     def osc_fallback(self, path, args, types, src):
         print("got unknown message '{}' from '{}'".format(path, src))
@@ -701,6 +856,21 @@ class MkMainWindow(QMainWindow):
             self.ignore_close_event = False
             self.prepare_to_quit()
 
+    def on_backup_progress(self, a_name, a_done, a_total):
+        """ a_total == 0 means that the backup has finished """
+        if a_total:
+            self.backup_progress.setMaximum(a_total)
+            self.backup_progress.setValue(a_done)
+            self.backup_progress.setToolTip(a_name)
+            self.backup_progress.show()
+            self.backup_cancel_button.show()
+        else:
+            self.backup_progress.hide()
+            self.backup_cancel_button.hide()
+
+    def on_backup_cancel(self):
+        libmk.PROJECT.cancel_backups()
+
     def on_save(self):
         libmk.PLUGIN_UI_DICT.save_all_plugin_state()
         libmk.PROJECT.create_backup()
@@ -780,7 +950,10 @@ class MkMainWindow(QMainWindow):
             close_pydaw_engine()
             libmk.PLUGIN_UI_DICT.close_all_plugin_windows()
             if self.osc_server is not None:
-                self.osc_timer.stop()
+                self.osc_receiver.stop()
+                self.osc_receiver.wait()
+                print("OSC receiver: {}".format(
+                    self.osc_receiver.get_metrics()))
                 self.osc_server.free()
             for f_host in self.host_windows:
                 f_host.prepare_to_quit()
@@ -795,6 +968,9 @@ class MkMainWindow(QMainWindow):
             self.ignore_close_event = False
             if self.subprocess_timer:
                 self.subprocess_timer.stop()
+            if libmk.PROJECT:
+                libmk.PROJECT.timestretch_scheduler.cancel_all()
+                libmk.PROJECT.wait_for_backups()
             libmk.prepare_to_quit()
             f_quit_timer = QtCore.QTimer(self)
             f_quit_timer.setSingleShot(True)
@@ -1397,6 +1573,9 @@ PROJECT_FILE = None
 def global_open_project(a_project_file, a_wait=True):
     global PROJECT_FILE
     PROJECT_FILE = a_project_file
+    if libmk.PROJECT:
+        libmk.PROJECT.timestretch_scheduler.cancel_all()
+        libmk.PROJECT.wait_for_backups()
     open_pydaw_engine(a_project_file)
     libmk.PROJECT = mk_project.MkProject()
     libmk.PROJECT.suppress_updates = True
@@ -1414,6 +1593,8 @@ def global_open_project(a_project_file, a_wait=True):
 def global_new_project(a_project_file, a_wait=True):
     global PROJECT_FILE
     PROJECT_FILE = a_project_file
+    if libmk.PROJECT:
+        libmk.PROJECT.timestretch_scheduler.cancel_all()
     libmk.PROJECT = mk_project.MkProject()
     libmk.PROJECT.new_project(a_project_file)
     MAIN_WINDOW.last_offline_dir = libmk.PROJECT.user_folder
@@ -26,6 +26,7 @@ from libpydaw.pydaw_util import *
 from libpydaw.pydaw_widgets import *
 from libpydaw.translate import _
 import libpydaw.strings
+from libpydaw import pydaw_ui_messages
 import libmk
 
 TRACK_COUNT_ALL = 1
@@ -502,6 +503,26 @@ class MainWindow(QScrollArea):
         self.first_offline_render = True
         self.last_offline_dir = global_home
         self.copy_to_clipboard_checked = True
+        self.ui_messages = pydaw_ui_messages.pydaw_ui_message_dispatcher(
+            {
+                "peak": lambda x: global_update_peak_meters(
+                    pydaw_ui_messages.pydaw_decode_peaks(x)),
+                "ml": self.on_engine_midi_learn,
+                "wec": lambda x: self.on_engine_cursor(float(x)),
+                "ready": lambda x: libmk.on_ready(),
+            },
+            #This prevents multiple events from moving the same control,
+            #only the last goes through
+            {
+                "ui": self.on_engine_ui_messages,
+                "pc": self.on_engine_controls,
+                "cc": self.on_engine_ccs,
+            },
+            {
+                pydaw_ui_messages.UI_MSG_PEAK: global_update_peak_meters,
+                pydaw_ui_messages.UI_MSG_CURSOR:
+                    lambda x: self.on_engine_cursor(float(x[-1])),
+            })
 
         self.setObjectName("plugin_ui")
         self.widget = QWidget()
@@ -550,56 +571,31 @@ class MainWindow(QScrollArea):
         PROJECT.write_notes(self.notes_tab.toPlainText())
 
     def configure_callback(self, path, arr):
-        f_pc_dict = {}
-        f_ui_dict = {}
-        f_cc_dict = {}
-        for f_line in arr[0].split("\n"):
-            if f_line == "":
-                break
-            a_key, a_val = f_line.split("|", 1)
-            if a_key == "pc":
-                f_plugin_uid, f_port, f_val = a_val.split("|")
-                f_pc_dict[(f_plugin_uid, f_port)] = f_val
-            elif a_key == "cur":
-                if libmk.IS_PLAYING:
-                    f_region, f_bar, f_beat = a_val.split("|")
-                    TRANSPORT.set_pos_from_cursor(f_region, f_bar, f_beat)
-                    for f_editor in (AUDIO_SEQ, REGION_EDITOR):
-                        f_editor.set_playback_pos(f_bar, f_beat)
-            elif a_key == "peak":
-                global_update_peak_meters(a_val)
-            elif a_key == "cc":
-                f_track_num, f_cc, f_val = a_val.split("|")
-                f_cc_dict[(f_track_num, f_cc)] = f_val
-            elif a_key == "ui":
-                f_plugin_uid, f_name, f_val = a_val.split("|", 2)
-                f_ui_dict[(f_plugin_uid, f_name)] = f_val
-            elif a_key == "mrec":
-                MREC_EVENTS.append(a_val)
-            elif a_key == "ne":
-                f_state, f_note = a_val.split("|")
-                PIANO_ROLL_EDITOR.highlight_keys(f_state, f_note)
-            elif a_key == "ml":
-                libmk.PLUGIN_UI_DICT.midi_learn_control[0].update_cc_map(
-                    a_val, libmk.PLUGIN_UI_DICT.midi_learn_control[1])
-            elif a_key == "wec":
-                if libmk.IS_PLAYING:
-                    WAVE_EDITOR.set_playback_cursor(float(a_val))
-            elif a_key == "ready":
-                libmk.on_ready()
-        #This prevents multiple events from moving the same control,
-        #only the last goes through
-        for k, f_val in f_ui_dict.items():
-            f_plugin_uid, f_name = k
-            if int(f_plugin_uid) in libmk.PLUGIN_UI_DICT:
-                libmk.PLUGIN_UI_DICT[int(f_plugin_uid)].ui_message(
-                    f_name, f_val)
-        for k, f_val in f_pc_dict.items():
+        self.ui_messages.dispatch(arr[0])
+
+    def on_engine_cursor(self, a_frac):
+        if libmk.IS_PLAYING:
+            WAVE_EDITOR.set_playback_cursor(a_frac)
+
+    def on_engine_midi_learn(self, a_val):
+        libmk.PLUGIN_UI_DICT.midi_learn_control[0].update_cc_map(
+            a_val, libmk.PLUGIN_UI_DICT.midi_learn_control[1])
+
+    def on_engine_ui_messages(self, a_vals):
+        for (f_plugin_uid, f_name), f_val in a_vals.items():
+            f_plugin_uid = int(f_plugin_uid)
+            if f_plugin_uid in libmk.PLUGIN_UI_DICT:
+                libmk.PLUGIN_UI_DICT[f_plugin_uid].ui_message(f_name, f_val)
+
+    def on_engine_controls(self, a_vals):
+        for k, f_val in a_vals.items():
             f_plugin_uid, f_port = (int(x) for x in k)
             if f_plugin_uid in libmk.PLUGIN_UI_DICT:
                 libmk.PLUGIN_UI_DICT[f_plugin_uid].set_control_val(
                     f_port, float(f_val))
-        for k, f_val in f_cc_dict.items():
+
+    def on_engine_ccs(self, a_vals):
+        for k, f_val in a_vals.items():
             f_track_num, f_cc = (int(x) for x in k)
             for f_plugin_uid in \
             TRACK_PANEL.tracks[f_track_num].get_plugin_uids():
@@ -609,13 +605,12 @@ class MainWindow(QScrollArea):
     def prepare_to_quit(self):
         WAVE_EDITOR.sample_graph.scene.clear()
 
-def global_update_peak_meters(a_val):
-    for f_val in a_val.split("|"):
-        f_list = f_val.split(":")
-        f_index = int(f_list[0])
+def global_update_peak_meters(a_peaks):
+    """ a_peaks:  A pydaw_ui_messages.UI_PEAK_DTYPE array """
+    for f_index, f_left, f_right in a_peaks.tolist():
         if f_index in ALL_PEAK_METERS:
             for f_pkm in ALL_PEAK_METERS[f_index]:
-                f_pkm.set_value(f_list[1:])
+                f_pkm.set_value((f_left, f_right))
         else:
             print("{} not in ALL_PEAK_METERS".format(f_index))
 
@@ -208,9 +208,15 @@ void g_dn_song_get(t_dawnext*, int);
 t_dn_routing_graph * g_dn_routing_graph_get(t_dawnext *);
 void v_dn_routing_graph_free(t_dn_routing_graph*);
 t_dn_region * g_dn_region_get(t_dawnext*);
+t_dn_region * g_dn_region_get_from_string(t_dawnext*, const char*, int);
+t_dn_region * g_dn_region_get_from_array(t_dawnext*, t_2d_char_array*);
 t_dn_atm_region * g_dn_atm_region_get(t_dawnext*);
+t_dn_atm_region * g_dn_atm_region_get_from_string(const char*, int);
+t_dn_atm_region * g_dn_atm_region_get_from_array(t_2d_char_array*);
 void v_dn_atm_region_free(t_dn_atm_region*);
 void g_dn_item_get(t_dawnext*, int);
+void g_dn_item_get_from_string(t_dawnext*, int, const char*, int);
+void g_dn_item_get_from_array(t_dawnext*, int, t_2d_char_array*);
 
 t_dawnext * g_dawnext_get();
 int i_dn_get_region_index_from_name(t_dawnext *, int);
@@ -453,40 +459,95 @@ void v_dn_paif_set_control(t_dawnext * self,
 
 }
 
-void v_dn_osc_send(t_osc_send_data * a_buffers)
+/* Send the peak meters and playback cursor as one binary message,
+ * returns 0 if the UI can only receive text */
+int i_dn_osc_send_binary()
 {
-    int f_i;
+    char f_buf[(sizeof(int) * 4) + (sizeof(t_ui_peak) * DN_TRACK_COUNT) +
+        sizeof(double)];
+    t_ui_peak f_peaks[DN_TRACK_COUNT];
     t_pkm_peak_meter * f_pkm;
+    int f_i;
+    int f_count = 0;
+    int f_pos;
 
-    a_buffers->f_tmp1[0] = '\0';
-    a_buffers->f_tmp2[0] = '\0';
-
-    f_pkm = dawnext->track_pool[0]->peak_meter;
-    sprintf(a_buffers->f_tmp2, "%i:%f:%f", 0, f_pkm->value[0], f_pkm->value[1]);
-    v_pkm_reset(f_pkm);
-
-    for(f_i = 1; f_i < DN_TRACK_COUNT; ++f_i)
+    for(f_i = 0; f_i < DN_TRACK_COUNT; ++f_i)
     {
         f_pkm = dawnext->track_pool[f_i]->peak_meter;
-        if(!f_pkm->dirty)  //has ran since last v_pkm_reset())
+        //has ran since last v_pkm_reset(), the master is always sent
+        if(!f_i || !f_pkm->dirty)
         {
-            sprintf(a_buffers->f_tmp1, "|%i:%f:%f",
-                f_i, f_pkm->value[0], f_pkm->value[1]);
-            v_pkm_reset(f_pkm);
-            strcat(a_buffers->f_tmp2, a_buffers->f_tmp1);
+            f_peaks[f_count].track_num = f_i;
+            f_peaks[f_count].value[0] = f_pkm->value[0];
+            f_peaks[f_count].value[1] = f_pkm->value[1];
+            ++f_count;
         }
     }
 
-    v_queue_osc_message("peak", a_buffers->f_tmp2);
+    f_pos = i_ui_pack_header(f_buf, 0, MK_UI_MSG_PEAK, f_count);
+    memcpy(&f_buf[f_pos], f_peaks, sizeof(t_ui_peak) * f_count);
+    f_pos += sizeof(t_ui_peak) * f_count;
+
+    if(musikernel->playback_mode > 0)
+    {
+        f_pos = i_ui_pack_header(f_buf, f_pos, MK_UI_MSG_CURSOR, 1);
+        memcpy(&f_buf[f_pos], &dawnext->ts[0].ml_current_beat,
+            sizeof(double));
+        f_pos += sizeof(double);
+    }
+
+    if(!i_ui_send_binary("musikernel/dawnext", f_buf, f_pos))
+    {
+        return 0;
+    }
+
+    for(f_i = 0; f_i < f_count; ++f_i)
+    {
+        v_pkm_reset(dawnext->track_pool[f_peaks[f_i].track_num]->peak_meter);
+    }
+
+    return 1;
+}
+
+void v_dn_osc_send(t_osc_send_data * a_buffers)
+{
+    int f_i;
+    t_pkm_peak_meter * f_pkm;
 
     a_buffers->f_tmp1[0] = '\0';
     a_buffers->f_tmp2[0] = '\0';
 
-    if(musikernel->playback_mode > 0 && !musikernel->is_offline_rendering)
+    if(musikernel->is_offline_rendering || !i_dn_osc_send_binary())
     {
-        sprintf(a_buffers->f_msg, "%f",
-            dawnext->ts[0].ml_current_beat);
-        v_queue_osc_message("cur", a_buffers->f_msg);
+        f_pkm = dawnext->track_pool[0]->peak_meter;
+        sprintf(a_buffers->f_tmp2, "%i:%f:%f", 0,
+            f_pkm->value[0], f_pkm->value[1]);
+        v_pkm_reset(f_pkm);
+
+        for(f_i = 1; f_i < DN_TRACK_COUNT; ++f_i)
+        {
+            f_pkm = dawnext->track_pool[f_i]->peak_meter;
+            if(!f_pkm->dirty)  //has ran since last v_pkm_reset())
+            {
+                sprintf(a_buffers->f_tmp1, "|%i:%f:%f",
+                    f_i, f_pkm->value[0], f_pkm->value[1]);
+                v_pkm_reset(f_pkm);
+                strcat(a_buffers->f_tmp2, a_buffers->f_tmp1);
+            }
+        }
+
+        v_queue_osc_message("peak", a_buffers->f_tmp2);
+
+        a_buffers->f_tmp1[0] = '\0';
+        a_buffers->f_tmp2[0] = '\0';
+
+        if(musikernel->playback_mode > 0 &&
+            !musikernel->is_offline_rendering)
+        {
+            sprintf(a_buffers->f_msg, "%f",
+                dawnext->ts[0].ml_current_beat);
+            v_queue_osc_message("cur", a_buffers->f_msg);
+        }
     }
 
     if(musikernel->osc_queue_index > 0)
@@ -2018,6 +2079,30 @@ void v_dn_open_project(int a_first_load)
 }
 
 t_dn_atm_region * g_dn_atm_region_get(t_dawnext * self)
+{
+    char f_file[1024] = "\0";
+    sprintf(f_file, "%s%sautomation.txt", self->project_folder, PATH_SEP);
+
+    if(!i_pydaw_file_exists(f_file))
+    {
+        return NULL;
+    }
+
+    return g_dn_atm_region_get_from_array(g_get_2d_array_from_file(
+        f_file, PYDAW_XLARGE_STRING)); //TODO:  1MB big enough???
+}
+
+/* Parse automation.txt from the a_len bytes at a_data */
+t_dn_atm_region * g_dn_atm_region_get_from_string(
+    const char * a_data, int a_len)
+{
+    return g_dn_atm_region_get_from_array(g_get_2d_array_from_string(
+        a_data, a_len, PYDAW_XLARGE_STRING));
+}
+
+/* Parse the automation in f_current_string and free it */
+t_dn_atm_region * g_dn_atm_region_get_from_array(
+    t_2d_char_array * f_current_string)
 {
     int f_i2;
     t_dn_atm_region * f_result = NULL;
@@ -2026,147 +2111,138 @@ t_dn_atm_region * g_dn_atm_region_get(t_dawnext * self)
     t_dn_atm_point * f_point = NULL;
     t_dn_atm_point * last_point = NULL;
 
-    char f_file[1024] = "\0";
-    sprintf(f_file, "%s%sautomation.txt", self->project_folder, PATH_SEP);
+    lmalloc((void**)&f_result, sizeof(t_dn_atm_region));
 
-    if(i_pydaw_file_exists(f_file))
+    for(f_i2 = 0; f_i2 < MAX_PLUGIN_POOL_COUNT; ++f_i2)
     {
-        lmalloc((void**)&f_result, sizeof(t_dn_atm_region));
+        f_result->plugins[f_i2].port_count = 0;
+        f_result->plugins[f_i2].ports = NULL;
+    }
+
+    int f_pos = 0;
+    /* Port position in the array, since port num does not map
+     * to array index. */
+    int f_port_pos = 0;
+    int f_plugin_uid = -1;
 
-        for(f_i2 = 0; f_i2 < MAX_PLUGIN_POOL_COUNT; ++f_i2)
+    while(1)
+    {
+        v_iterate_2d_char_array(f_current_string);
+        if(f_current_string->eof)
         {
-            f_result->plugins[f_i2].port_count = 0;
-            f_result->plugins[f_i2].ports = NULL;
+            break;
         }
 
-        t_2d_char_array * f_current_string = g_get_2d_array_from_file(
-            f_file, PYDAW_XLARGE_STRING); //TODO:  1MB big enough???
-
-        int f_pos = 0;
-        /* Port position in the array, since port num does not map
-         * to array index. */
-        int f_port_pos = 0;
-        int f_plugin_uid = -1;
-
-        while(1)
+        if(f_current_string->current_str[0] == 'p')
         {
             v_iterate_2d_char_array(f_current_string);
-            if(f_current_string->eof)
-            {
-                break;
-            }
+            f_plugin_uid = atoi(f_current_string->current_str);
 
-            if(f_current_string->current_str[0] == 'p')
-            {
-                v_iterate_2d_char_array(f_current_string);
-                f_plugin_uid = atoi(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            int f_port_count = atoi(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_port_count = atoi(f_current_string->current_str);
+            //sanity check
+            assert(f_port_count >= 1 && f_port_count < 100000);
 
-                //sanity check
-                assert(f_port_count >= 1 && f_port_count < 100000);
+            current_plugin = &f_result->plugins[f_plugin_uid];
+            current_plugin->port_count = f_port_count;
 
-                current_plugin = &f_result->plugins[f_plugin_uid];
-                current_plugin->port_count = f_port_count;
+            lmalloc(
+                (void**)&current_plugin->ports,
+                sizeof(t_dn_atm_port) * f_port_count);
 
-                lmalloc(
-                    (void**)&current_plugin->ports,
-                    sizeof(t_dn_atm_port) * f_port_count);
+            for(f_i2 = 0; f_i2 < f_port_count; ++f_i2)
+            {
+                current_plugin->ports[f_i2].atm_pos = 0;
+                current_plugin->ports[f_i2].point_count = 0;
+                current_plugin->ports[f_i2].points = NULL;
+                current_plugin->ports[f_i2].port = -1;
+                current_plugin->ports[f_i2].last_val = 0.0f;
+            }
 
-                for(f_i2 = 0; f_i2 < f_port_count; ++f_i2)
-                {
-                    current_plugin->ports[f_i2].atm_pos = 0;
-                    current_plugin->ports[f_i2].point_count = 0;
-                    current_plugin->ports[f_i2].points = NULL;
-                    current_plugin->ports[f_i2].port = -1;
-                    current_plugin->ports[f_i2].last_val = 0.0f;
-                }
+            f_pos = 0;
+            f_port_pos = 0;
+        }
+        else if(f_current_string->current_str[0] == 'q')
+        {
+            v_iterate_2d_char_array(f_current_string);
+            int f_port_num = atoi(f_current_string->current_str);
 
-                f_pos = 0;
-                f_port_pos = 0;
-            }
-            else if(f_current_string->current_str[0] == 'q')
-            {
-                v_iterate_2d_char_array(f_current_string);
-                int f_port_num = atoi(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            int f_point_count = atoi(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_point_count = atoi(f_current_string->current_str);
-
-                //sanity check
-                assert(f_point_count >= 1 && f_point_count < 100000);
-                assert(f_port_pos < current_plugin->port_count);
-                current_port = &current_plugin->ports[f_port_pos];
-
-                current_port->port = f_port_num;
-                current_port->point_count = f_point_count;
-                lmalloc(
-                    (void**)&current_port->points,
-                    sizeof(t_dn_atm_point) * f_point_count);
-                ++f_port_pos;
-                f_pos = 0;
-            }
-            else
-            {
-                double f_beat = atof(f_current_string->current_str);
+            //sanity check
+            assert(f_point_count >= 1 && f_point_count < 100000);
+            assert(f_port_pos < current_plugin->port_count);
+            current_port = &current_plugin->ports[f_port_pos];
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_port = atoi(f_current_string->current_str);
+            current_port->port = f_port_num;
+            current_port->point_count = f_point_count;
+            lmalloc(
+                (void**)&current_port->points,
+                sizeof(t_dn_atm_point) * f_point_count);
+            ++f_port_pos;
+            f_pos = 0;
+        }
+        else
+        {
+            double f_beat = atof(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                float f_val = atof(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            int f_port = atoi(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_index = atoi(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            float f_val = atof(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_plugin = atoi(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            int f_index = atoi(f_current_string->current_str);
 
-                v_iterate_2d_char_array(f_current_string);
-                int f_break_after = atoi(f_current_string->current_str);
+            v_iterate_2d_char_array(f_current_string);
+            int f_plugin = atoi(f_current_string->current_str);
 
-                /* Automation curve, this isn't actually implemented yet
-                   , but I'm adding it to the file format to avoid having
-                   to do hackery later to preserve backwards compatibility
-                */
-                v_iterate_2d_char_array(f_current_string);
+            v_iterate_2d_char_array(f_current_string);
+            int f_break_after = atoi(f_current_string->current_str);
 
-                assert(f_port == current_port->port);
-                assert(f_pos < current_port->point_count);
-                assert(current_port->points);
-                assert(f_break_after == 0 || f_break_after == 1);
+            /* Automation curve, this isn't actually implemented yet
+               , but I'm adding it to the file format to avoid having
+               to do hackery later to preserve backwards compatibility
+            */
+            v_iterate_2d_char_array(f_current_string);
 
-                f_point = &current_port->points[f_pos];
+            assert(f_port == current_port->port);
+            assert(f_pos < current_port->point_count);
+            assert(current_port->points);
+            assert(f_break_after == 0 || f_break_after == 1);
 
-                f_point->beat = f_beat;
-                f_point->tick = (int)(
-                    (f_beat / MK_AUTOMATION_RESOLUTION) + 0.5f);
-                f_point->port = f_port;
-                f_point->val = f_val;
-                f_point->index = f_index;
-                f_point->plugin = f_plugin;
-                f_point->break_after = f_break_after;
+            f_point = &current_port->points[f_pos];
 
-                if(f_pos == current_port->point_count - 1)
-                {
-                    f_point->recip = 0.0f;
-                }
+            f_point->beat = f_beat;
+            f_point->tick = (int)(
+                (f_beat / MK_AUTOMATION_RESOLUTION) + 0.5f);
+            f_point->port = f_port;
+            f_point->val = f_val;
+            f_point->index = f_index;
+            f_point->plugin = f_plugin;
+            f_point->break_after = f_break_after;
 
-                if(f_pos > 0)
-                {
-                    last_point = &current_port->points[f_pos - 1];
-                    last_point->recip =
-                        1.0f / (f_point->beat - last_point->beat);
-                }
+            if(f_pos == current_port->point_count - 1)
+            {
+                f_point->recip = 0.0f;
+            }
 
-                ++f_pos;
+            if(f_pos > 0)
+            {
+                last_point = &current_port->points[f_pos - 1];
+                last_point->recip =
+                    1.0f / (f_point->beat - last_point->beat);
             }
-        }
 
-        g_free_2d_char_array(f_current_string);
+            ++f_pos;
+        }
     }
 
+    g_free_2d_char_array(f_current_string);
+
     return f_result;
 }
 
@@ -2200,6 +2276,26 @@ void v_dn_atm_region_free(t_dn_atm_region * self)
 }
 
 t_dn_region * g_dn_region_get(t_dawnext* self)
+{
+    char f_full_path[PYDAW_TINY_STRING];
+    sprintf(f_full_path, "%s%ssequencer.txt", self->project_folder, PATH_SEP);
+    //sprintf(f_full_path, "%s%i", self->region_folder, a_uid);
+
+    return g_dn_region_get_from_array(self,
+        g_get_2d_array_from_file(f_full_path, PYDAW_LARGE_STRING));
+}
+
+/* Parse sequencer.txt from the a_len bytes at a_data */
+t_dn_region * g_dn_region_get_from_string(
+    t_dawnext* self, const char * a_data, int a_len)
+{
+    return g_dn_region_get_from_array(self,
+        g_get_2d_array_from_string(a_data, a_len, PYDAW_LARGE_STRING));
+}
+
+/* Parse the sequencer in f_current_string and free it */
+t_dn_region * g_dn_region_get_from_array(
+    t_dawnext* self, t_2d_char_array * f_current_string)
 {
     t_dn_region * f_result;
     int f_item_counters[DN_TRACK_COUNT];
@@ -2217,14 +2313,6 @@ t_dn_region * g_dn_region_get(t_dawnext* self)
         f_item_counters[f_i] = 0;
     }
 
-
-    char f_full_path[PYDAW_TINY_STRING];
-    sprintf(f_full_path, "%s%ssequencer.txt", self->project_folder, PATH_SEP);
-    //sprintf(f_full_path, "%s%i", self->region_folder, a_uid);
-
-    t_2d_char_array * f_current_string =
-        g_get_2d_array_from_file(f_full_path, PYDAW_LARGE_STRING);
-
     f_i = 0;
     int f_ev_pos = 0;
 
@@ -2357,6 +2445,25 @@ void g_dn_item_free(t_dn_item * self)
 }
 
 void g_dn_item_get(t_dawnext* self, int a_uid)
+{
+    char f_full_path[2048];
+    sprintf(f_full_path, "%s%i", self->item_folder, a_uid);
+
+    g_dn_item_get_from_array(self, a_uid,
+        g_get_2d_array_from_file(f_full_path, PYDAW_LARGE_STRING));
+}
+
+/* Parse item a_uid from the a_len bytes at a_data */
+void g_dn_item_get_from_string(
+    t_dawnext* self, int a_uid, const char * a_data, int a_len)
+{
+    g_dn_item_get_from_array(self, a_uid,
+        g_get_2d_array_from_string(a_data, a_len, PYDAW_LARGE_STRING));
+}
+
+/* Parse item a_uid from f_current_string and free it */
+void g_dn_item_get_from_array(
+    t_dawnext* self, int a_uid, t_2d_char_array * f_current_string)
 {
     float f_sr = musikernel->thread_storage[0].sample_rate;
 
@@ -2367,12 +2474,6 @@ void g_dn_item_get(t_dawnext* self, int a_uid)
     f_result->uid = a_uid;
     f_result->events = NULL;
 
-    char f_full_path[2048];
-    sprintf(f_full_path, "%s%i", self->item_folder, a_uid);
-
-    t_2d_char_array * f_current_string = g_get_2d_array_from_file(f_full_path,
-            PYDAW_LARGE_STRING);
-
     int f_event_pos = 0;
 
     f_result->audio_items = g_pydaw_audio_items_get(
@@ -3224,7 +3325,10 @@ void v_dn_update_audio_inputs()
 }
 
 
-void v_dn_configure(const char* a_key, const char* a_value)
+/* a_data is the a_data_len bytes of the file that the message tells the
+ * engine to reload, or NULL to read it from disk */
+void v_dn_configure(const char* a_key, const char* a_value,
+        const char * a_data, int a_data_len)
 {
     t_dawnext * self = dawnext;
     printf("v_dn_configure:  key: \"%s\", value: \"%s\"\n", a_key, a_value);
@@ -3258,7 +3362,16 @@ void v_dn_configure(const char* a_key, const char* a_value)
         pthread_spin_lock(&musikernel->main_lock);
         pthread_spin_unlock(&musikernel->main_lock);
 
-        t_dn_region * f_result = g_dn_region_get(self);
+        t_dn_region * f_result;
+
+        if(a_data)
+        {
+            f_result = g_dn_region_get_from_string(self, a_data, a_data_len);
+        }
+        else
+        {
+            f_result = g_dn_region_get(self);
+        }
 
         t_dn_region * f_old_region = NULL;
         f_old_region = self->en_song->regions;
@@ -3274,7 +3387,15 @@ void v_dn_configure(const char* a_key, const char* a_value)
     else if(!strcmp(a_key, DN_CONFIGURE_KEY_SI)) //Save Item
     {
         pthread_spin_lock(&musikernel->main_lock);
-        g_dn_item_get(self, atoi(a_value));
+        if(a_data)
+        {
+            g_dn_item_get_from_string(
+                self, atoi(a_value), a_data, a_data_len);
+        }
+        else
+        {
+            g_dn_item_get(self, atoi(a_value));
+        }
         pthread_spin_unlock(&musikernel->main_lock);
     }
     else if(!strcmp(a_key, DN_CONFIGURE_KEY_SS))  //Save Song
@@ -3283,7 +3404,16 @@ void v_dn_configure(const char* a_key, const char* a_value)
     }
     else if(!strcmp(a_key, DN_CONFIGURE_KEY_SAVE_ATM))
     {
-        t_dn_atm_region * f_result = g_dn_atm_region_get(self);
+        t_dn_atm_region * f_result;
+
+        if(a_data)
+        {
+            f_result = g_dn_atm_region_get_from_string(a_data, a_data_len);
+        }
+        else
+        {
+            f_result = g_dn_atm_region_get(self);
+        }
 
         t_dn_atm_region * f_old_region = NULL;
         if(self->en_song->regions_atm)
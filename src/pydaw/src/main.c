@@ -107,12 +107,15 @@ int osc_debug_handler(const char *path, const char *types, lo_arg **argv, int
 #if defined(_WIN32)
 int main(int argc, char **argv);
 int v_configure(const char * path, const char * key, const char * value);
+int v_configure_bulk(const char * path, const char * a_buffer, int a_len);
 #endif
 
 int dawnext_main(int argc, char** argv);
 void print_help();
 int main(int argc, char** argv);
 int main_loop(int argc, char **argv);
+int i_configure_with_data(const char*, const char*, const char*,
+        const char*, int);
 inline void v_pydaw_run_main_loop(int sample_count,
         float **output, float *a_input_buffers);
 
@@ -1049,6 +1052,15 @@ NO_OPTIMIZATION int main_loop(int argc, char **argv)
 }
 
 int v_configure(const char * path, const char * key, const char * value)
+{
+    return i_configure_with_data(path, key, value, NULL, 0);
+}
+
+/* The same as v_configure(), a_data is the a_data_len bytes of the file
+ * that the message tells the engine to reload, or NULL to read the file
+ * from disk */
+int i_configure_with_data(const char * path, const char * key,
+        const char * value, const char * a_data, int a_data_len)
 {
     if(!READY)
     {
@@ -1077,7 +1089,7 @@ int v_configure(const char * path, const char * key, const char * value)
     }
     else if(!strcmp(path, "/musikernel/dawnext"))
     {
-        v_dn_configure(key, value);
+        v_dn_configure(key, value, a_data, a_data_len);
         return 0;
     }
     else if(!strcmp(path, "/musikernel/master"))
@@ -1089,6 +1101,73 @@ int v_configure(const char * path, const char * key, const char * value)
     return 1;
 }
 
+/* Process a buffer of configure messages packed by the UI, see
+ * pydaw_util.pydaw_pack_configure().  Each message is 3 native int32
+ * lengths followed by that many bytes of key, value and data, a data
+ * length of -1 means that the message has no data.  The data is the
+ * text of the file the message would otherwise read from disk.
+ * Returns the number of messages that were not handled */
+int v_configure_bulk(const char * path, const char * a_buffer, int a_len)
+{
+    char f_key[PYDAW_TINY_STRING];
+    char * f_value = NULL;
+    int f_value_size = 0;
+    int f_lens[3];
+    int f_pos = 0;
+    int f_result = 0;
+
+    while(f_pos + (int)sizeof(f_lens) <= a_len)
+    {
+        memcpy(f_lens, &a_buffer[f_pos], sizeof(f_lens));
+        f_pos += sizeof(f_lens);
+        /* Compare each length to what is left, a sum could overflow */
+        int f_left = a_len - f_pos;
+
+        if(f_lens[0] < 0 || f_lens[0] >= PYDAW_TINY_STRING ||
+            f_lens[0] > f_left || f_lens[1] < 0 ||
+            f_lens[1] > f_left - f_lens[0] || f_lens[2] < -1 ||
+            (f_lens[2] > 0 ? f_lens[2] : 0) >
+                f_left - f_lens[0] - f_lens[1])
+        {
+            printf("v_configure_bulk:  malformed buffer at %i\n", f_pos);
+            ++f_result;
+            break;
+        }
+
+        memcpy(f_key, &a_buffer[f_pos], f_lens[0]);
+        f_key[f_lens[0]] = '\0';
+        f_pos += f_lens[0];
+
+        if(f_lens[1] >= f_value_size)
+        {
+            f_value_size = f_lens[1] + 1;
+            f_value = (char*)realloc(f_value, f_value_size);
+        }
+        memcpy(f_value, &a_buffer[f_pos], f_lens[1]);
+        f_value[f_lens[1]] = '\0';
+        f_pos += f_lens[1];
+
+        const char * f_data = NULL;
+        int f_data_len = 0;
+
+        if(f_lens[2] >= 0)
+        {
+            f_data = &a_buffer[f_pos];
+            f_data_len = f_lens[2];
+            f_pos += f_lens[2];
+        }
+
+        if(i_configure_with_data(path, f_key, f_value, f_data, f_data_len))
+        {
+            ++f_result;
+        }
+    }
+
+    free(f_value);
+
+    return f_result;
+}
+
 #ifdef WITH_LIBLO
 
 void osc_error(int num, const char *msg, const char *path)
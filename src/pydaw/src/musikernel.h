@@ -348,29 +348,68 @@ void v_mk_set_tempo(t_mk_seq_event_list*, float);
 t_musikernel * musikernel = NULL;
 int ZERO = 0;
 
+/* Binary UI messages, see libpydaw/pydaw_ui_messages.py.  Each record is
+ * an int type and an int count followed by count payloads */
+#define MK_UI_MSG_PEAK 1  // t_ui_peak
+#define MK_UI_MSG_CURSOR 2  // double
+
+typedef struct
+{
+    int track_num;
+    float value[2];
+}t_ui_peak;
+
+int i_ui_pack_header(char * a_buf, int a_pos, int a_type, int a_count)
+{
+    int f_header[2] = {a_type, a_count};
+    memcpy(&a_buf[a_pos], f_header, sizeof(f_header));
+    return a_pos + sizeof(f_header);
+}
+
 #ifdef MK_DLL
 
 typedef void (*v_ui_send_callback)(char * a_path, char * a_msg);
+typedef void (*v_ui_send_binary_callback)(
+    char * a_path, char * a_data, int a_len);
 
 #if defined(_WIN32)
 
 #warning "You're building for Windows"
 void v_set_ui_callback(v_ui_send_callback a_callback);
+void v_set_ui_binary_callback(v_ui_send_binary_callback a_callback);
 
 #endif
 
 v_ui_send_callback UI_SEND_CALLBACK = NULL;
+v_ui_send_binary_callback UI_SEND_BINARY_CALLBACK = NULL;
 
 void v_set_ui_callback(v_ui_send_callback a_callback)
 {
     UI_SEND_CALLBACK = a_callback;
 }
 
+void v_set_ui_binary_callback(v_ui_send_binary_callback a_callback)
+{
+    UI_SEND_BINARY_CALLBACK = a_callback;
+}
+
 void v_ui_send(char * a_path, char * a_msg)
 {
     UI_SEND_CALLBACK(a_path, a_msg);
 }
 
+/* Returns 0 if the UI did not register a binary callback, the caller
+ * must then send the message as text */
+int i_ui_send_binary(char * a_path, char * a_data, int a_len)
+{
+    if(!UI_SEND_BINARY_CALLBACK)
+    {
+        return 0;
+    }
+    UI_SEND_BINARY_CALLBACK(a_path, a_data, a_len);
+    return 1;
+}
+
 #elif defined(WITH_LIBLO)
 
 void v_ui_send(char * a_path, char * a_msg)
@@ -378,6 +417,11 @@ void v_ui_send(char * a_path, char * a_msg)
     lo_send(musikernel->uiTarget, a_path, "s", a_msg);
 }
 
+int i_ui_send_binary(char * a_path, char * a_data, int a_len)
+{
+    return 0;
+}
+
 #else
 
 void v_ui_send(char * a_path, char * a_msg)
@@ -385,6 +429,11 @@ void v_ui_send(char * a_path, char * a_msg)
 
 }
 
+int i_ui_send_binary(char * a_path, char * a_data, int a_len)
+{
+    return 0;
+}
+
 #endif
 
 void v_pytrack_routing_set(t_pytrack_routing * self, int a_output, int a_type)
@@ -320,6 +320,19 @@ t_2d_char_array * g_get_2d_array_from_file(const char * a_file, int a_size)
     return f_result;
 }
 
+/* The same as g_get_2d_array_from_file(), but from the a_len bytes at
+ * a_data, the text of a file that the UI sent instead of the engine
+ * reading it back from disk */
+t_2d_char_array * g_get_2d_array_from_string(
+    const char * a_data, int a_len, int a_size)
+{
+    t_2d_char_array * f_result = g_get_2d_array(a_size);
+    assert(a_len >= 0 && a_len < a_size);
+    memcpy(f_result->array, a_data, a_len);
+    f_result->array[a_len] = '\0';
+    return f_result;
+}
+
 /* Return the next string from the array*/
 void v_iterate_2d_char_array(t_2d_char_array* a_array)
 {
@@ -413,27 +413,65 @@ inline void v_pydaw_run_wave_editor(int sample_count,
         musikernel->sample_count);
 }
 
-void v_wn_osc_send(t_osc_send_data * a_buffers)
+/* Send the peak meter and playback cursor as one binary message,
+ * returns 0 if the UI can only receive text */
+int i_wn_osc_send_binary(float a_frac)
 {
-    int f_i;
-
-    f_i = 0;
+    char f_buf[(sizeof(int) * 4) + sizeof(t_ui_peak) + sizeof(double)];
     t_pkm_peak_meter * f_pkm = wavenext->track_pool[0]->peak_meter;
-    sprintf(a_buffers->f_tmp1, "%i:%f:%f",
-        f_i, f_pkm->value[0], f_pkm->value[1]);
+    t_ui_peak f_peak = {0, {f_pkm->value[0], f_pkm->value[1]}};
+    double f_frac = a_frac;
+    int f_pos;
+
+    f_pos = i_ui_pack_header(f_buf, 0, MK_UI_MSG_PEAK, 1);
+    memcpy(&f_buf[f_pos], &f_peak, sizeof(t_ui_peak));
+    f_pos += sizeof(t_ui_peak);
+
+    if(musikernel->playback_mode == 1)
+    {
+        f_pos = i_ui_pack_header(f_buf, f_pos, MK_UI_MSG_CURSOR, 1);
+        memcpy(&f_buf[f_pos], &f_frac, sizeof(double));
+        f_pos += sizeof(double);
+    }
+
+    if(!i_ui_send_binary("musikernel/wavenext", f_buf, f_pos))
+    {
+        return 0;
+    }
+
     v_pkm_reset(f_pkm);
 
-    v_queue_osc_message("peak", a_buffers->f_tmp1);
+    return 1;
+}
+
+void v_wn_osc_send(t_osc_send_data * a_buffers)
+{
+    int f_i;
+    float f_frac = 0.0f;
 
     if(musikernel->playback_mode == 1)
     {
-        float f_frac =
+        f_frac =
         (float)(wavenext->ab_audio_item->sample_read_heads[
             0].whole_number)
         / (float)(wavenext->ab_audio_item->wav_pool_item->length);
+    }
 
-        sprintf(a_buffers->f_msg, "%f", f_frac);
-        v_queue_osc_message("wec", a_buffers->f_msg);
+    if(musikernel->is_offline_rendering || !i_wn_osc_send_binary(f_frac))
+    {
+        f_i = 0;
+        t_pkm_peak_meter * f_pkm = wavenext->track_pool[0]->peak_meter;
+        sprintf(a_buffers->f_tmp1, "%i:%f:%f",
+            f_i, f_pkm->value[0], f_pkm->value[1]);
+        v_pkm_reset(f_pkm);
+
+        v_queue_osc_message("peak", a_buffers->f_tmp1);
+
+        if(musikernel->playback_mode == 1)
+        {
+            sprintf(a_buffers->f_msg, "%f", f_frac);
+            v_queue_osc_message("wec", a_buffers->f_msg);
+        }
     }
 
     if(musikernel->osc_queue_index > 0)